@@ -1,14 +1,13 @@
-from Transmit.driver_config import UsbDriver
 from Transmit.tx_single_tone import Transmit
 from Transmit.receiver_display import ReceiverPlot
-from Transmit.transceiver import SDRSession
-import threading
+from Transmit.async_control import RadioController
+import asyncio
 
 #from Transmit.driver_test import test_connection
 '''
 Summary:
-The SDRSession class uses a Manager to share the SDR object between processes.
-The start_transmitter method transmits a single tone indefinitely.
+The FullDuplexEngine class runs TX and RX together in a worker process that owns the radio,
+moving samples through shared memory.
 The ReceiverPlot class is used to receive and plot the signal.
 The Transmit class is used to configure and transmit the tone.
 The UsbDriver class handles the connection to the ADALM-Pluto device.
@@ -21,29 +20,21 @@ sweep both at the same time if possible
 
 '''
 
-def jam_L1_and_L2():
+async def jam_L1_and_L2():
     print("jamming L1 & L2")
-    sdr_session_one = UsbDriver()
-    sdr_session_two = UsbDriver()
+    # Each radio takes TX ownership of its own Pluto, lowest serial first
+    async with RadioController() as controller:
+        session_one = await controller.open_radio()
+        session_two = await controller.open_radio()
 
-    sdr_one = sdr_session_one.establish_AD9364_usb_connection()
-    sdr_two = sdr_session_two.establish_AD9364_usb_connection()
-
-    session_one = Transmit(sdr_one)
-    session_two = Transmit(sdr_two)
-
-    thread1 = threading.Thread(target=session_one.power_sweep_single_tone, args=(1575e6, -50, 0, 10, 5))
-    thread2 = threading.Thread(target=session_two.power_sweep_single_tone, args=(1227e6, -50, 0, 10, 5))
-
-    thread1.start()
-    thread2.start()
-
-    thread1.join()
-    thread2.join()
+        await asyncio.gather(
+            session_one.power_sweep(1575e6, -50, 0, 10, 5),
+            session_two.power_sweep(1227e6, -50, 0, 10, 5),
+        )
 
 def main():
     print("running")
-    #jam_L1_and_L2()
+    #asyncio.run(jam_L1_and_L2())
 
     session = Transmit()
     session.chirp_linear_sweep_constant_gain(-50)
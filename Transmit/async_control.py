@@ -0,0 +1,160 @@
+"""
+asyncio control API for driving one or more Plutos from a single event loop.
+
+The blocking libiio calls behind Transmit, ReceiverPlot and DeviceConfig run on
+one bounded thread pool shared by every radio, so ten radios do not need ten
+threads per operation. Control operations on a radio are serialized with an
+asyncio.Lock; stop() bypasses it so it can always interrupt a running sweep.
+
+Cancelling a task that awaits a long operation (a sweep, a timed transmit or a
+receive) stops the operation on the radio and waits for the worker thread to
+return before the CancelledError propagates, so nothing keeps transmitting in
+the background.
+
+    async def main():
+        async with RadioController() as controller:
+            l1 = await controller.open_radio()
+            l2 = await controller.open_radio()
+            await asyncio.gather(l1.power_sweep(1575e6, -50, 0, 10, 5),
+                                 l2.power_sweep(1227e6, -50, 0, 10, 5))
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional
+import numpy as np
+
+from Transmit.receiver_display import ReceiverPlot
+from Transmit.scheduler import TxStep
+from Transmit.tx_single_tone import Transmit
+
+class AsyncRadio:
+    def __init__(self, transmit: Transmit, executor: ThreadPoolExecutor) -> None:
+        self.transmit = transmit
+        self.sdr = transmit.sdr
+        self._executor = executor
+        self._lock = asyncio.Lock()
+        self._receiver = None
+
+    async def retune(self, **settings) -> dict:
+        '''
+        Apply attribute changes (tx_lo=..., tx_hardwaregain_chan0=...), skipping unchanged ones.
+        '''
+        async with self._lock:
+            return await self._run(self.transmit.config.apply, settings)
+
+    async def transmit_tone(self, freq: float, gain: float=-10, duration: Optional[float]=None) -> None:
+        '''
+        Start a cyclic tone. With a duration, wait for it and take the transmitter off air.
+        '''
+        async with self._lock:
+            await self._run(self.transmit.scheduler.run, [TxStep(freq, gain, 0)], 1, False)
+        if duration is not None:
+            try:
+                await asyncio.sleep(duration)
+            finally:
+                await self._off_air()
+
+    async def power_sweep(self, freq: float, start_power: int=-50, stop_power: int=10, step_power: int=10,
+                          step_duration: float=5) -> None:
+        await self._cancellable(self.transmit.power_sweep_single_tone, freq, start_power, stop_power,
+                                step_power, step_duration)
+
+    async def freq_sweep(self, gain: float, start_freq: float=1050e6, stop_freq: float=1650e6,
+                         step_freq: float=50e6, step_duration: float=5) -> None:
+        await self._cancellable(self.transmit.freq_sweep_constant_gain, gain, start_freq, stop_freq,
+                                step_freq, step_duration)
+
+    async def run_steps(self, steps: Iterable[TxStep], repeat: Optional[int]=1) -> List[dict]:
+        return await self._cancellable(self.transmit.scheduler.run, list(steps), repeat)
+
+    async def receive(self, num_buffers: int=1, rx_lo: Optional[float]=None, rf_bandwidth: float=20e6) -> np.ndarray:
+        '''
+        Capture num_buffers consecutive RX buffers and return them concatenated.
+        '''
+        async with self._lock:
+            if rx_lo is not None:
+                await self._run(self.transmit.config.apply, {'rx_lo': int(rx_lo), 'rx_rf_bandwidth': int(rf_bandwidth)})
+            receiver = self._receiver_plot(rx_lo, rf_bandwidth)
+            stream = receiver.stream(num_buffers=max(2, num_buffers))
+            stream.start()
+            try:
+                buffers = []
+                for _ in range(num_buffers):
+                    samples = await self._run(stream.read)
+                    if samples is None:
+                        break
+                    buffers.append(samples.copy())
+            finally:
+                await self._run(stream.stop)
+        return np.concatenate(buffers) if buffers else np.empty(0, dtype=np.complex128)
+
+    async def stop(self) -> None:
+        # Only sets events, so it runs on the loop instead of waiting for a worker the jobs may all hold
+        self.transmit.stop()
+
+    async def close(self) -> None:
+        await self.stop()
+        await self._off_air()
+        if self._receiver is not None:
+            self._receiver.close()
+        self.transmit.close()
+
+    # Private #
+    def _receiver_plot(self, rx_lo: Optional[float], rf_bandwidth: float) -> ReceiverPlot:
+        if self._receiver is None:
+            self._receiver = ReceiverPlot(rx_lo or self.sdr.rx_lo, rf_bandwidth, self.sdr)
+        return self._receiver
+
+    async def _off_air(self) -> None:
+        # Buffer teardown is device I/O, so it waits its turn behind the running operation
+        async with self._lock:
+            await self._run(self.sdr.tx_destroy_buffer)
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+
+    async def _cancellable(self, func, *args):
+        async with self._lock:
+            future = asyncio.ensure_future(self._run(func, *args))
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # The thread cannot be interrupted, ask the operation to stop and wait for it
+                self.transmit.stop()
+                await asyncio.gather(future, return_exceptions=True)
+                raise
+
+class RadioController:
+    def __init__(self, max_workers: int=8, sample_rate: float=10e6) -> None:
+        self.sample_rate = sample_rate
+        self.radios: List[AsyncRadio] = []
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pluto")
+
+    async def __aenter__(self) -> "RadioController":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def open_radio(self, uri: Optional[str]=None, sdr=None) -> AsyncRadio:
+        '''
+        Open a radio through the session pool (or wrap an existing sdr). Without a URI
+        each call gets the next radio that has no TX owner yet.
+        '''
+        loop = asyncio.get_running_loop()
+        build = functools.partial(Transmit, sdr, self.sample_rate, uri=uri)
+        transmit = await loop.run_in_executor(self._executor, build)
+        radio = AsyncRadio(transmit, self._executor)
+        self.radios.append(radio)
+        return radio
+
+    async def stop_all(self) -> None:
+        await asyncio.gather(*(radio.stop() for radio in self.radios), return_exceptions=True)
+
+    async def close(self) -> None:
+        await asyncio.gather(*(radio.close() for radio in self.radios), return_exceptions=True)
+        self.radios = []
+        self._executor.shutdown(wait=True)
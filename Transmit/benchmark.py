@@ -0,0 +1,227 @@
+"""
+Performance benchmarks for the synthesis, upload, retune and receive paths.
+
+Runs against the simulated Pluto by default and against a real radio with
+--hardware or a --uri naming one. Results are written as JSON and compared
+with the stored baseline for the kind of device that was used (sim or
+hardware); any metric that is worse than the baseline by more than the
+threshold is reported as a regression and the run exits non-zero.
+
+    python -m Transmit.benchmark                          # simulator, compare with baseline
+    python -m Transmit.benchmark --update-baseline        # record a new baseline
+    python -m Transmit.benchmark --hardware --threshold 0.1
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Callable, Optional
+import numpy as np
+
+from Transmit.driver_config import UsbDriver
+from Transmit.sample_format import encode, tx_iq16
+from Transmit.sim_pluto import is_sim_uri
+from Transmit.receiver_display import ReceiverPlot
+from Transmit.tx_single_tone import Transmit, WaveformCache
+
+DEFAULT_SIM_URI = 'sim:realtime=0'
+BASELINE_DIR = 'benchmarks'
+
+# Bytes per sample over USB, 16-bit I and Q
+WIRE_BYTES_PER_SAMPLE = 4
+
+def _metric(value: float, unit: str, better: str) -> dict:
+    return {'value': value, 'unit': unit, 'better': better}
+
+def _time_call(func: Callable[[], object], repeat: int) -> list:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def _peak_memory(func: Callable[[], object]) -> int:
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+class Benchmark:
+    def __init__(self, sdr, sample_rate: float=10e6, repeat: int=5, rx_seconds: float=2.0) -> None:
+        self.sdr = sdr
+        self.sample_rate = sample_rate
+        self.repeat = repeat
+        self.rx_seconds = rx_seconds
+        self.results = {}
+
+    def run(self) -> dict:
+        self.bench_synthesis()
+        self.bench_upload()
+        self.bench_retune()
+        self.bench_receive()
+        return self.results
+
+    def bench_synthesis(self) -> None:
+        '''
+        Cold synthesis time and peak memory of the buffers each Transmit method builds.
+        '''
+        num_samples = int(self.sample_rate * 1)
+        waveforms = {
+            'transmit_single_tone': lambda tx: tx._cyclic_tone(1090e6 + 1.25e6),
+            'freq_sweep_constant_gain': lambda tx: tx._cyclic_tone(1575e6 + 0.3e6),
+            'power_sweep_single_tone': lambda tx: tx._cyclic_tone(1575e6 + 0.7e6),
+            'chirp_linear_sweep_constant_gain': lambda tx: tx._tone(1e7, num_samples),
+        }
+        for name, build in waveforms.items():
+            # A fresh cache per run so every call measures synthesis, not a lookup
+            def cold() -> None:
+                build(Transmit(self.sdr, self.sample_rate, WaveformCache()))
+            timings = _time_call(cold, self.repeat)
+            self.results[f'synthesis.{name}.time'] = _metric(min(timings), 's', 'lower')
+            self.results[f'synthesis.{name}.peak_memory'] = _metric(_peak_memory(cold), 'bytes', 'lower')
+
+    def bench_upload(self) -> None:
+        num_samples = int(self.sample_rate * 0.1)
+        buffer = np.exp(2j * np.pi * 1e6 * np.arange(num_samples) / self.sample_rate)
+        self.sdr.sample_rate = int(self.sample_rate)
+
+        for label, cyclic in (('cyclic', True), ('non_cyclic', False)):
+            self.sdr.tx_cyclic_buffer = cyclic
+            def upload() -> None:
+                self.sdr.tx(buffer)
+                self.sdr.tx_destroy_buffer()
+            timings = _time_call(upload, self.repeat)
+            rate = num_samples * WIRE_BYTES_PER_SAMPLE / statistics.median(timings)
+            self.results[f'upload.{label}.throughput'] = _metric(rate, 'B/s', 'higher')
+
+        # Pre-encoded int16 I/Q handed to the device without per-upload conversion
+        iq, _ = encode(buffer)
+        self.sdr.tx_cyclic_buffer = True
+        def upload_iq16() -> None:
+            tx_iq16(self.sdr, iq)
+            self.sdr.tx_destroy_buffer()
+        timings = _time_call(upload_iq16, self.repeat)
+        rate = iq.nbytes / statistics.median(timings)
+        self.results['upload.cyclic_iq16.throughput'] = _metric(rate, 'B/s', 'higher')
+        self.sdr.tx_cyclic_buffer = False
+
+    def bench_retune(self) -> None:
+        '''
+        Per-attribute write latency, alternating between two values so no write is a no-op.
+        '''
+        attributes = {
+            'tx_lo': (int(1575e6), int(1227e6)),
+            'tx_hardwaregain_chan0': (-10, -20),
+            'tx_rf_bandwidth': (int(10e6), int(20e6)),
+        }
+        for name, values in attributes.items():
+            timings = []
+            for i in range(max(self.repeat, 2) * 4):
+                start = time.perf_counter()
+                setattr(self.sdr, name, values[i % 2])
+                timings.append(time.perf_counter() - start)
+            timings.sort()
+            self.results[f'retune.{name}.median'] = _metric(statistics.median(timings), 's', 'lower')
+            self.results[f'retune.{name}.p95'] = _metric(timings[int(0.95 * (len(timings) - 1))], 's', 'lower')
+
+    def bench_receive(self) -> None:
+        receiver = ReceiverPlot(1575e6, 20e6, self.sdr)
+        with receiver.stream() as rx:
+            deadline = time.monotonic() + self.rx_seconds
+            for _ in rx:
+                if time.monotonic() >= deadline:
+                    break
+        stats = rx.stats()
+        self.results['receive.throughput'] = _metric(stats['sample_rate'], 'S/s', 'higher')
+        self.results['receive.overruns'] = _metric(stats['overruns'], 'count', 'lower')
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    '''
+    Return a description of every metric that regressed by more than threshold (a fraction).
+    '''
+    regressions = []
+    for name, metric in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        old = reference['value']
+        new = metric['value']
+        if metric['better'] == 'lower':
+            worse = new > old * (1 + threshold) if old else new > 0
+        else:
+            worse = new < old * (1 - threshold)
+        if worse:
+            regressions.append(f"{name}: {old:.6g} -> {new:.6g} {metric['unit']}")
+    return regressions
+
+def _default_baseline_path(hardware: bool) -> str:
+    return os.path.join(BASELINE_DIR, 'baseline_hw.json' if hardware else 'baseline_sim.json')
+
+def main(argv: Optional[list]=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--uri', default=None, help=f"device URI (default {DEFAULT_SIM_URI})")
+    parser.add_argument('--hardware', action='store_true', help="search for a physical Pluto instead of the simulator")
+    parser.add_argument('--sample-rate', type=float, default=10e6)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--rx-seconds', type=float, default=2.0)
+    parser.add_argument('--baseline', default=None, help="baseline JSON to compare against / update")
+    parser.add_argument('--output', default=None, help="write this run's results to a JSON file")
+    parser.add_argument('--threshold', type=float, default=0.2, help="allowed fractional regression (default 0.2)")
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    uri = None if args.hardware else (args.uri or DEFAULT_SIM_URI)
+    driver = UsbDriver(uri)
+    sdr = driver.establish_AD9364_usb_connection()
+    # Whatever was asked for, a real radio is compared with the hardware baseline
+    hardware = not is_sim_uri(driver.uri)
+    results = Benchmark(sdr, args.sample_rate, args.repeat, args.rx_seconds).run()
+
+    report = {
+        'timestamp': time.time(),
+        'uri': driver.uri or 'hardware',
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'results': results,
+    }
+    for name, metric in results.items():
+        print(f"{name:50s} {metric['value']:14.6g} {metric['unit']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    baseline_path = args.baseline or _default_baseline_path(hardware)
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(baseline_path) or '.', exist_ok=True)
+        with open(baseline_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {baseline_path}")
+        return 0
+
+    if not os.path.exists(baseline_path):
+        print(f"No baseline at {baseline_path}, run with --update-baseline to create one")
+        return 0
+
+    with open(baseline_path) as f:
+        baseline = json.load(f)['results']
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"\nNo regressions beyond {args.threshold:.0%} against {baseline_path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
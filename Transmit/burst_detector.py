@@ -0,0 +1,223 @@
+"""
+Triggered burst capture on the RX stream.
+
+BurstDetector runs a sliding-window energy detector over each RX buffer and
+keeps the most recent pre_trigger samples in a circular history. When the
+window energy crosses the threshold it starts an event: the history before the
+trigger, then post_trigger samples from the trigger on, which may span several
+buffers, are copied into one contiguous record. Only events are stored, the
+stream itself is not.
+
+The energy is the mean of |x|^2 over `window` samples, computed for every sample
+of a buffer at once from a cumulative sum restarted at each buffer over the
+previous buffer's tail. The threshold is either absolute (threshold_dbfs) or
+snr_db above a running noise floor, the exponential average of each quiet
+buffer's median energy.
+
+    detector = BurstDetector(sample_rate, snr_db=12, pre_trigger=2048, post_trigger=16384)
+    for samples in stream:
+        for event in detector.process(samples):
+            print(event.timestamp, event.peak_power_db, len(event.samples))
+"""
+
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+import numpy as np
+
+_TINY = 1e-30
+
+@dataclass
+class BurstEvent:
+    sample_index: int       # Stream sample the trigger fired on
+    timestamp: float        # Wall-clock time of the trigger sample
+    trigger_power_db: float
+    peak_power_db: float
+    noise_floor_db: float
+    pre_trigger: int        # Samples before the trigger in `samples`
+    samples: np.ndarray
+
+class BurstDetector:
+    def __init__(self, sample_rate: float, snr_db: float=10.0, threshold_dbfs: Optional[float]=None,
+                 window: int=64, pre_trigger: int=4096, post_trigger: int=16384, holdoff: int=0,
+                 noise_alpha: float=0.05) -> None:
+        self.sample_rate = float(sample_rate)
+        self.snr_db = float(snr_db)
+        self.threshold_dbfs = threshold_dbfs
+        self.window = int(window)
+        self.pre_trigger = int(pre_trigger)
+        self.post_trigger = int(post_trigger)
+        self.holdoff = int(holdoff)
+        self.noise_alpha = float(noise_alpha)
+
+        self.noise_floor = None
+        self.samples_seen = 0
+        self.events_detected = 0
+
+        self._history = np.zeros(self.pre_trigger, dtype=np.complex64)
+        self._history_fill = 0
+        self._history_pos = 0
+        self._power_tail = np.zeros(self.window - 1, dtype=np.float64)
+        self._power = np.empty(0, dtype=np.float64)
+        self._sums = np.empty(0, dtype=np.float64)
+        self._energy = np.empty(0, dtype=np.float64)
+        self._event = None
+        self._resume = 0  # First stream sample allowed to trigger
+
+    def reset(self) -> None:
+        '''
+        Forget the history and any event in progress, after an RX overrun for example.
+        '''
+        self._history_fill = 0
+        self._history_pos = 0
+        self._power_tail[:] = 0
+        self._event = None
+        self._resume = self.samples_seen
+
+    def threshold(self) -> Optional[float]:
+        '''
+        Current trigger level as a linear mean power, None until a noise floor is known.
+        '''
+        if self.threshold_dbfs is not None:
+            return 10 ** (self.threshold_dbfs / 10)
+        if self.noise_floor is None:
+            return None
+        return self.noise_floor * 10 ** (self.snr_db / 10)
+
+    def process(self, samples: np.ndarray, timestamp: Optional[float]=None) -> List[BurstEvent]:
+        '''
+        Run the detector over the next buffer and return the events it completed.
+        timestamp is the wall-clock time of the buffer's first sample, now minus its duration by default.
+        '''
+        length = len(samples)
+        if length == 0:
+            return []
+        if timestamp is None:
+            timestamp = time.time() - length / self.sample_rate
+        start_index = self.samples_seen
+        energy = self._sliding_energy(samples)
+        threshold = self.threshold()
+
+        events = []
+        position = 0
+        busy = self._event is not None
+        while position < length:
+            if self._event is not None:
+                position = self._continue_event(samples, position, events)
+                continue
+            first = max(position, self._resume - start_index)
+            if threshold is None or first >= length:
+                break
+            above = np.flatnonzero(energy[first:] > threshold)
+            if not above.size:
+                break
+            trigger = first + int(above[0])
+            self._start_event(samples, trigger, start_index + trigger, timestamp + trigger / self.sample_rate,
+                              energy[trigger])
+            busy = True
+            position = trigger
+
+        if not busy:
+            # Only quiet buffers move the noise floor, so bursts do not raise their own threshold
+            median = float(np.median(energy))
+            self.noise_floor = median if self.noise_floor is None else \
+                self.noise_floor + self.noise_alpha * (median - self.noise_floor)
+
+        self._remember(samples)
+        self.samples_seen += length
+        return events
+
+    # Private #
+    def _sliding_energy(self, samples: np.ndarray) -> np.ndarray:
+        # Mean |x|^2 over the window ending at each sample, continuing the previous buffer's tail
+        length = len(samples)
+        tail = self.window - 1
+        if len(self._power) < tail + length:
+            self._power = np.empty(tail + length, dtype=np.float64)
+            self._sums = np.empty(tail + length + 1, dtype=np.float64)
+            self._energy = np.empty(length, dtype=np.float64)
+        power = self._power[:tail + length]
+        sums = self._sums[:tail + length + 1]
+        energy = self._energy[:length]
+
+        power[:tail] = self._power_tail
+        np.multiply(samples.real, samples.real, out=power[tail:])
+        energy[:] = samples.imag
+        energy *= energy
+        power[tail:] += energy
+        self._power_tail[:] = power[length:]
+
+        sums[0] = 0
+        np.cumsum(power, out=sums[1:])
+        np.subtract(sums[self.window:], sums[:-self.window], out=energy)
+        energy *= 1 / self.window
+        return energy
+
+    def _start_event(self, samples: np.ndarray, trigger: int, sample_index: int, timestamp: float,
+                     trigger_power: float) -> None:
+        # Pre-trigger part: history from earlier buffers, then this buffer up to the trigger
+        from_buffer = min(trigger, self.pre_trigger)
+        from_history = min(self.pre_trigger - from_buffer, self._history_fill)
+        pre = from_history + from_buffer
+        record = np.empty(pre + self.post_trigger, dtype=np.complex64)
+        if from_history:
+            self._copy_history(record[:from_history])
+        record[from_history:pre] = samples[trigger - from_buffer:trigger]
+        self._event = {
+            'record': record,
+            'filled': pre,
+            'pre': pre,
+            'sample_index': sample_index,
+            'timestamp': timestamp,
+            'trigger_power': trigger_power,
+            'noise_floor': self.noise_floor,
+        }
+
+    def _continue_event(self, samples: np.ndarray, position: int, events: List[BurstEvent]) -> int:
+        event = self._event
+        record = event['record']
+        count = min(len(record) - event['filled'], len(samples) - position)
+        record[event['filled']:event['filled'] + count] = samples[position:position + count]
+        event['filled'] += count
+        position += count
+        if event['filled'] == len(record):
+            events.append(self._finish_event(event))
+            self._event = None
+            self._resume = event['sample_index'] + self.post_trigger + self.holdoff
+        return position
+
+    def _finish_event(self, event: dict) -> BurstEvent:
+        record = event['record']
+        power = record.real * record.real + record.imag * record.imag
+        noise = event['noise_floor']
+        self.events_detected += 1
+        return BurstEvent(
+            sample_index=event['sample_index'],
+            timestamp=event['timestamp'],
+            trigger_power_db=float(10 * np.log10(event['trigger_power'] + _TINY)),
+            peak_power_db=float(10 * np.log10(float(power.max(initial=0)) + _TINY)),
+            noise_floor_db=float(10 * np.log10(noise + _TINY)) if noise is not None else float('nan'),
+            pre_trigger=event['pre'],
+            samples=record,
+        )
+
+    def _remember(self, samples: np.ndarray) -> None:
+        # Keep the newest pre_trigger samples in the circular history
+        size = self.pre_trigger
+        if size == 0:
+            return
+        data = samples[-size:]
+        count = len(data)
+        first = min(count, size - self._history_pos)
+        self._history[self._history_pos:self._history_pos + first] = data[:first]
+        self._history[:count - first] = data[first:]
+        self._history_pos = (self._history_pos + count) % size
+        self._history_fill = min(size, self._history_fill + count)
+
+    def _copy_history(self, out: np.ndarray) -> None:
+        # The newest len(out) history samples, oldest first
+        count = len(out)
+        start = (self._history_pos - count) % self.pre_trigger
+        first = min(count, self.pre_trigger - start)
+        out[:first] = self._history[start:start + first]
+        out[first:] = self._history[:count - first]
@@ -0,0 +1,118 @@
+"""
+FFT polyphase channelizer.
+
+Splits a wideband stream into num_channels equally spaced subchannels, each
+decimated by num_channels, in one pass. Channel k is centred at
+center_freq + k * sample_rate / num_channels, with the upper half of the channel
+indices wrapping to negative offsets in the usual FFT order (see channel_freqs).
+
+The prototype low-pass filter is split into num_channels polyphase branches of
+taps_per_channel taps. Input is commutated into blocks of num_channels samples,
+each branch filters its column across blocks, and one inverse FFT per block
+turns the branch outputs into one sample for every channel. The cost is about
+taps_per_channel multiply-adds per input sample plus one FFT per block, however
+many channels there are.
+
+The last taps_per_channel - 1 blocks and any samples short of a whole block are
+kept between calls, so consecutive RX buffers channelize as one continuous
+stream.
+
+    channelizer = PolyphaseChannelizer(64, sample_rate, rx_lo)
+    for samples in stream:
+        channels = channelizer.process(samples)     # (64, len(samples) // 64)
+"""
+
+from typing import Optional
+import numpy as np
+import scipy.fft
+import scipy.signal
+
+class PolyphaseChannelizer:
+    def __init__(self, num_channels: int, sample_rate: float=1.0, center_freq: float=0, taps_per_channel: int=12,
+                 prototype: Optional[np.ndarray]=None) -> None:
+        self.num_channels = int(num_channels)
+        self.sample_rate = float(sample_rate)
+        self.center_freq = float(center_freq)
+        if prototype is None:
+            # Cutoff at half the channel spacing, unity gain at DC
+            prototype = scipy.signal.firwin(self.num_channels * taps_per_channel, 1 / self.num_channels,
+                                            window=('kaiser', 8.0))
+        prototype = np.asarray(prototype, dtype=np.float32)
+        self.taps_per_channel = -(-len(prototype) // self.num_channels)
+        padded = np.zeros(self.taps_per_channel * self.num_channels, dtype=np.float32)
+        padded[:len(prototype)] = prototype
+        # Row p holds taps p*M .. p*M + M-1, one column per polyphase branch
+        self.branches = padded.reshape(self.taps_per_channel, self.num_channels)
+
+        self.output_rate = self.sample_rate / self.num_channels
+        self.channel_freqs = self.center_freq + scipy.fft.fftfreq(self.num_channels, 1 / self.sample_rate)
+
+        history = self.taps_per_channel - 1
+        self._blocks = np.zeros((history, self.num_channels), dtype=np.complex64)
+        self._history = history
+        self._pending = np.empty(self.num_channels, dtype=np.complex64)
+        self._pending_count = 0
+        self._filtered = np.empty((0, self.num_channels), dtype=np.complex64)
+        self._product = np.empty((0, self.num_channels), dtype=np.complex64)
+
+    def reset(self) -> None:
+        self._blocks[:self._history] = 0
+        self._pending_count = 0
+
+    def channel_index(self, freq: float) -> int:
+        return int(np.argmin(np.abs(self.channel_freqs - freq)))
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        '''
+        Channelize the next buffer. Returns (num_channels, num_outputs), channel k in row k.
+        '''
+        M = self.num_channels
+        total = self._pending_count + len(samples)
+        if total < M:
+            # Not a whole block yet, keep the samples for the next call
+            self._pending[self._pending_count:total] = samples
+            self._pending_count = total
+            return np.empty((M, 0), dtype=np.complex64)
+        num_blocks = total // M
+        blocks = self._stage(num_blocks)
+        rows = blocks[self._history:]
+
+        # Fill the new block rows from the pending samples and this buffer
+        flat = rows.reshape(-1)
+        flat[:self._pending_count] = self._pending[:self._pending_count]
+        used = num_blocks * M - self._pending_count
+        flat[self._pending_count:] = samples[:used]
+        leftover = len(samples) - used
+        self._pending[:leftover] = samples[used:]
+        self._pending_count = leftover
+
+        # Commutator order: the newest sample of each block goes to branch 0
+        rows[:] = rows[:, ::-1]
+
+        # Branch filters, vectorized over every block and branch at once
+        filtered = self._filtered[:num_blocks]
+        product = self._product[:num_blocks]
+        np.multiply(blocks[self._history:self._history + num_blocks], self.branches[0], out=filtered)
+        for p in range(1, self.taps_per_channel):
+            start = self._history - p
+            np.multiply(blocks[start:start + num_blocks], self.branches[p], out=product)
+            filtered += product
+
+        # History for the next buffer is the last blocks of this one
+        self._blocks[:self._history] = blocks[num_blocks:num_blocks + self._history]
+
+        # An unscaled inverse DFT across branches yields one sample per channel
+        channels = scipy.fft.ifft(filtered, axis=1, norm='forward')
+        return channels.T
+
+    # Private #
+    def _stage(self, num_blocks: int) -> np.ndarray:
+        # History rows followed by room for num_blocks new rows, kept across calls
+        needed = self._history + num_blocks
+        if len(self._blocks) < needed:
+            blocks = np.empty((needed, self.num_channels), dtype=np.complex64)
+            blocks[:self._history] = self._blocks[:self._history]
+            self._blocks = blocks
+            self._filtered = np.empty((num_blocks, self.num_channels), dtype=np.complex64)
+            self._product = np.empty((num_blocks, self.num_channels), dtype=np.complex64)
+        return self._blocks[:needed]
@@ -0,0 +1,132 @@
+"""
+Shadow-state configuration layer for Pluto attributes.
+
+Every attribute write is a USB round trip, and LO or sample-rate writes make
+the AD936x recalibrate. DeviceConfig remembers the last value written to each
+attribute, diffs a requested profile against that shadow copy and only writes
+what actually changed. Writes go out in a fixed order: clocking first, then
+filters, LOs, gain mode and gains. A TX gain reduction is applied before the
+LO moves and an increase only after, so the radio never puts out more power
+than either the old or the new setting on the wrong frequency.
+
+The shadow is only as good as the assumption that nothing else writes to the
+device; call invalidate() after touching the sdr directly.
+"""
+
+import threading
+import weakref
+from typing import Dict, Optional, Union
+
+# Attributes in the order they are safe to write
+APPLY_ORDER = [
+    'sample_rate',
+    'tx_rf_bandwidth',
+    'rx_rf_bandwidth',
+    'tx_lo',
+    'rx_lo',
+    'gain_control_mode_chan0',
+    'rx_hardwaregain_chan0',
+    'tx_hardwaregain_chan0',
+    'rx_buffer_size',
+    'tx_cyclic_buffer',
+]
+
+PROFILES = {
+    'gps_l1': {'tx_lo': int(1575.42e6), 'tx_rf_bandwidth': int(20e6), 'sample_rate': int(10e6)},
+    'gps_l2': {'tx_lo': int(1227.6e6), 'tx_rf_bandwidth': int(20e6), 'sample_rate': int(10e6)},
+    'adsb': {'tx_lo': int(1090e6), 'tx_rf_bandwidth': int(20e6), 'sample_rate': int(10e6)},
+}
+
+_UNSET = object()
+
+class DeviceConfig:
+    _instances = weakref.WeakKeyDictionary()
+    _instances_lock = threading.Lock()
+
+    def __init__(self, sdr, profiles: Optional[Dict[str, dict]]=None) -> None:
+        # Weak, so the entry for_device() keeps under the sdr does not keep the sdr itself alive
+        self._sdr = weakref.ref(sdr)
+        self.profiles = dict(PROFILES)
+        if profiles:
+            self.profiles.update(profiles)
+        self.writes = 0
+        self.skipped = 0
+        self._shadow = {}
+        self._lock = threading.Lock()
+
+    @property
+    def sdr(self):
+        sdr = self._sdr()
+        if sdr is None:
+            raise ReferenceError("The device of this DeviceConfig has been closed")
+        return sdr
+
+    @classmethod
+    def for_device(cls, sdr) -> "DeviceConfig":
+        '''
+        Shared DeviceConfig for an sdr, so every user of the device sees the same shadow.
+        '''
+        with cls._instances_lock:
+            config = cls._instances.get(sdr)
+            if config is None:
+                config = cls(sdr)
+                cls._instances[sdr] = config
+            return config
+
+    def apply(self, profile: Union[str, dict], **overrides) -> dict:
+        '''
+        Bring the device to `profile` (a dict of attributes or the name of a stored profile),
+        writing only the attributes that differ from the shadow state.
+
+        Returns {'written': [...], 'skipped': [...]} for this call.
+        '''
+        settings = dict(self.profiles[profile]) if isinstance(profile, str) else dict(profile)
+        settings.update(overrides)
+        unknown = [name for name in settings if name not in APPLY_ORDER]
+        order = APPLY_ORDER + sorted(unknown)
+
+        written = []
+        with self._lock:
+            changed = {name: value for name, value in settings.items() if self._shadow.get(name, _UNSET) != value}
+            skipped = [name for name in settings if name not in changed]
+
+            gain = changed.get('tx_hardwaregain_chan0', _UNSET)
+            current_gain = self._shadow.get('tx_hardwaregain_chan0', _UNSET)
+            if gain is not _UNSET and current_gain is not _UNSET and gain < current_gain:
+                # Turn the power down before anything moves
+                order = ['tx_hardwaregain_chan0'] + [name for name in order if name != 'tx_hardwaregain_chan0']
+
+            for name in order:
+                if name not in changed:
+                    continue
+                setattr(self.sdr, name, changed[name])
+                self._shadow[name] = changed[name]
+                written.append(name)
+
+            self.writes += len(written)
+            self.skipped += len(skipped)
+        return {'written': written, 'skipped': skipped}
+
+    def set(self, name: str, value) -> bool:
+        '''
+        Write a single attribute if it changed. Returns True when a write was issued.
+        '''
+        return bool(self.apply({name: value})['written'])
+
+    def add_profile(self, name: str, settings: dict) -> None:
+        self.profiles[name] = dict(settings)
+
+    def invalidate(self, *names: str) -> None:
+        '''
+        Forget the shadow value of the given attributes, or all of them, so the next apply writes them.
+        '''
+        with self._lock:
+            if names:
+                for name in names:
+                    self._shadow.pop(name, None)
+            else:
+                self._shadow.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'writes': self.writes, 'skipped': self.skipped, 'shadow': dict(self._shadow)}
@@ -1,66 +1,223 @@
 """
-This class provides functionality to control USB drivers 
-on the host PC and check COM ports until a working one is found.
+This class provides functionality to control USB drivers
+on the host PC and find a working ADALM-Pluto connection.
 
-This class iterates through available COM ports and attempts to 
-establish a connection with the ADALM-Pluto device. The USB connection 
-path is identified using the format 'usb:bus.port.device', where:
+The USB connection path is identified using the format
+'usb:bus.port.device', where:
 - 'usb' specifies that the device is connected via USB.
 - 'bus' is the USB bus number.
 - 'port' is the USB port number on the bus.
 - 'device' is the device number on the port.
 
-For example, 'usb:1.7.5' uniquely identifies the USB connection 
-path for the ADALM-Pluto device on your system. 
-This information is useful for ensuring that the correct 
+For example, 'usb:1.7.5' uniquely identifies the USB connection
+path for the ADALM-Pluto device on your system.
+This information is useful for ensuring that the correct
 device is being accessed, especially when multiple USB devices are connected.
 
-The class will continue to check COM ports until a working one is 
-found, allowing for robust and flexible device management.
+Discovery enumerates the IIO contexts once with libiio's scan, then probes
+every candidate URI concurrently with a per-probe timeout. The URI and serial
+of the last device that connected are cached on disk and tried on their own
+first, so a bench with an unchanged setup connects without a scan at all.
+The hardcoded USB paths are only used when the scan is unavailable. Probes
+still running at the timeout are abandoned, but their threads cannot be
+killed, so a probe stuck inside libiio can delay interpreter exit.
+
+Passing a URI pins the driver to that one device. URIs starting with 'sim:'
+select the hardware-free SimulatedPluto, so the rest of the project can run
+where pyadi-iio or a radio is not available.
 """
 
-import adi
-from typing import Optional
+from __future__ import annotations
+
+import json
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List, Optional, Tuple
+
+from Transmit.sim_pluto import SimulatedPluto, is_sim_uri
+
+try:
+    import adi
+except ImportError:
+    adi = None
+
+try:
+    import iio
+except ImportError:
+    iio = None
 
 # Check pluto COM port with 'iio_info -s'
 
+DEVICE_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'adalm_pluto', 'last_device.json')
+
+FALLBACK_USB_PATHS = ['usb:1.15.5', 'usb:1.8.5', 'usb:1.10.5', 'usb:1.12.5', 'usb:1.3.5', 'usb:1.4.5', 'usb:1.5.5', 'usb:1.7.5']
+
+_SERIAL_PATTERN = re.compile(r'serial=(\w+)')
+
 class UsbDriver:
-    def __init__(self) -> None:
-        self.usb_paths = ['usb:1.15.5', 'usb:1.8.5', 'usb:1.10.5', 'usb:1.12.5', 'usb:1.3.5','usb:1.4.5', 'usb:1.5.5', 'usb:1.7.5', 'usb.1.7.5']
+    def __init__(self, uri: Optional[str]=None, serial: Optional[str]=None, probe_timeout: float=3.0,
+                 cache_path: Optional[str]=DEVICE_CACHE_PATH) -> None:
+        self.uri = uri
+        self.serial = serial
+        self.probe_timeout = probe_timeout
+        self.cache_path = cache_path
+        self.usb_paths = [uri] if uri is not None else list(FALLBACK_USB_PATHS)
         self.sdr = None
 
     def establish_default_usb_connection(self) -> adi.Pluto:
-        for path in self.usb_paths:
-            try:
-                self.sdr = adi.Pluto(path)
-                print(f"Pluto Object Create. Connected to {path}")
-                self.sdr.rx_enabled_channels = [0]
-                return self.sdr
-            except Exception as e:
-                print(f"Failed to connect to {path}: {e}")
-        #print("No device found on any USB path.")
-        raise Exception('FATAL: No Device Found on COM port')
-    
+        return self._establish('Pluto', "Pluto Object Create.")
+
     def establish_AD9361_usb_connection(self) -> adi.Pluto:
-        for path in self.usb_paths:
+        return self._establish('ad9361', "\nAD9361 Device Found.")
+
+    def establish_AD9364_usb_connection(self) -> adi.Pluto:
+        return self._establish('ad9364', "\nAD9364 Device Found.")
+
+    @staticmethod
+    def can_discover() -> bool:
+        '''
+        Whether pylibiio is available to scan and probe devices without opening them.
+        '''
+        return iio is not None
+
+    def discover(self) -> List[Tuple[str, Optional[str]]]:
+        '''
+        Probe every candidate concurrently and return (uri, serial) for each device that answered,
+        in candidate order.
+        '''
+        candidates = self._candidates()
+        found = {}
+        executor = ThreadPoolExecutor(max_workers=max(1, len(candidates)))
+        try:
+            futures = {executor.submit(self._probe, uri): uri for uri in candidates}
+            done, _ = wait(futures, timeout=self.probe_timeout)
+            for future in done:
+                if future.exception() is None:
+                    found[futures[future]] = future.result()
+        finally:
+            # Probes that hit the timeout are abandoned rather than waited on, see _find_devices
+            executor.shutdown(wait=False, cancel_futures=True)
+        return [(uri, found[uri]) for uri in candidates if uri in found]
+
+    def forget_cached_device(self) -> None:
+        if self.cache_path and os.path.exists(self.cache_path):
+            os.remove(self.cache_path)
+
+    # Private #
+    def _establish(self, device_class: str, found_message: str) -> adi.Pluto:
+        for path, serial in self._find_devices():
             try:
-                self.sdr = adi.ad9361(path)
-                print(f"\nAD9361 Device Found. Connected to {path}")
+                self.sdr = self._open(device_class, path)
+                print(f"{found_message} Connected to {path}")
                 self.sdr.rx_enabled_channels = [0]
+                self.uri = path
+                self.serial = serial
+                self._save_cache(path, serial)
                 return self.sdr
             except Exception as e:
                 print(f"Failed to connect to {path}: {e}.... Checking next COM Port")
-        #print("No device found on any USB path.")
         raise Exception('FATAL: No Device Found on COM port')
 
-    def establish_AD9364_usb_connection(self) -> adi.Pluto:
-        for path in self.usb_paths:
+    def _open(self, device_class: str, path: str):
+        if is_sim_uri(path):
+            return SimulatedPluto.from_uri(path)
+        if adi is None:
+            raise ImportError("pyadi-iio is required to connect to a physical device")
+        return getattr(adi, device_class)(path)
+
+    def _find_devices(self):
+        '''
+        Yield (uri, serial) pairs worth opening, the cached device first.
+        '''
+        if self.uri is not None and (is_sim_uri(self.uri) or iio is None):
+            yield self.uri, self.serial
+            return
+
+        cached = self._load_cache()
+        if cached is not None and self.uri is None and self.serial in (None, cached[1]):
             try:
-                self.sdr = adi.ad9364(path)
-                print(f"\nAD9364 Device Found. Connected to {path}")
-                self.sdr.rx_enabled_channels = [0]
-                return self.sdr
+                serial = self._probe(cached[0])
+                if self.serial in (None, serial):
+                    yield cached[0], serial
             except Exception as e:
-                print(f"Failed to connect to {path}: {e}.... Checking next COM Port")
-        #print("No device found on any USB path.")
-        raise Exception('FATAL: No Device Found on COM port') 
\ No newline at end of file
+                print(f"Last known device {cached[0]} did not respond: {e}")
+
+        if iio is None:
+            # No way to probe cheaply, fall back to trying each path in turn
+            for path in self.usb_paths:
+                yield path, self.serial
+            return
+
+        candidates = self._candidates()
+        executor = ThreadPoolExecutor(max_workers=max(1, len(candidates)))
+        futures = {executor.submit(self._probe, uri): uri for uri in candidates}
+        pending = set(futures)
+        budget = self.probe_timeout
+        try:
+            # Fastest responder first, the rest are only tried if opening it fails. The timeout
+            # only counts time spent waiting on probes, not time the caller spends opening a device
+            while pending and budget > 0:
+                started = time.monotonic()
+                done, pending = wait(pending, timeout=budget, return_when=FIRST_COMPLETED)
+                budget -= time.monotonic() - started
+                for future in sorted(done, key=lambda f: candidates.index(futures[f])):
+                    if future.exception() is not None:
+                        continue
+                    serial = future.result()
+                    if self.serial in (None, serial):
+                        yield futures[future], serial
+            if pending:
+                print(f"Device probes still running after {self.probe_timeout} s, giving up on them")
+        finally:
+            # Do not block on probes that are stuck on an unresponsive path. Their threads cannot be
+            # killed though, so a probe stuck inside libiio can still delay interpreter exit
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _candidates(self) -> List[str]:
+        if self.uri is not None:
+            return [self.uri]
+        if iio is not None:
+            try:
+                scanned = list(iio.scan_contexts().keys())
+                if scanned:
+                    return scanned
+            except Exception as e:
+                print(f"IIO context scan failed: {e}")
+        return list(self.usb_paths)
+
+    def _probe(self, uri: str) -> Optional[str]:
+        '''
+        Open a bare IIO context to check the device answers and read its serial.
+        '''
+        if is_sim_uri(uri):
+            return SimulatedPluto.from_uri(uri).serial
+        if iio is None:
+            raise ImportError("pylibiio is required to probe devices")
+        ctx = iio.Context(uri)
+        serial = ctx.attrs.get('hw_serial')
+        if serial is None:
+            match = _SERIAL_PATTERN.search(ctx.description or '')
+            serial = match.group(1) if match else None
+        return serial
+
+    def _load_cache(self) -> Optional[Tuple[str, Optional[str]]]:
+        if not self.cache_path:
+            return None
+        try:
+            with open(self.cache_path) as f:
+                entry = json.load(f)
+            return entry['uri'], entry.get('serial')
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _save_cache(self, uri: str, serial: Optional[str]) -> None:
+        if not self.cache_path or is_sim_uri(uri):
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(self.cache_path, 'w') as f:
+                json.dump({'uri': uri, 'serial': serial}, f)
+        except OSError as e:
+            print(f"Could not cache device {uri}: {e}")
@@ -0,0 +1,286 @@
+"""
+Latency and throughput instrumentation for device access.
+
+instrument(sdr) wraps a device in an InstrumentedDevice proxy. The proxy times
+every public attribute write and every tx(), tx_iq16() and rx() call into
+per-operation latency histograms, counts bytes moved and errors, and forwards
+everything else to the device untouched. Transmit and ReceiverPlot wrap the
+device they use, and there is one proxy per device, so both report into the
+same series.
+
+Metrics go to DEFAULT_METRICS, which is disabled unless PLUTO_METRICS=1 is set
+in the environment or DEFAULT_METRICS.enabled is set to True. While disabled
+the proxy makes one flag check per call before passing it through.
+
+    with profile(transmit.sdr) as metrics:      # collect one run, enabled or not
+        transmit.transmit_single_tone(1090e6)
+    metrics.write_json('run.json')
+    DEFAULT_METRICS.write_prometheus('/var/lib/node_exporter/pluto.prom')
+
+Synthesis time is recorded too, as the 'synthesis' operation on the waveform
+cache misses that actually build a buffer.
+"""
+
+import bisect
+import contextlib
+import json
+import os
+import threading
+import time
+import weakref
+from typing import Dict, Iterator, Optional, Tuple
+import numpy as np
+
+from Transmit.sample_format import tx_iq16
+
+# Histogram upper bounds in seconds, 1-2.5-5 steps from 10 us to 10 s
+LATENCY_BUCKETS = tuple(scale * 10.0**exponent for exponent in range(-5, 1) for scale in (1, 2.5, 5)) + (10.0,)
+
+# On the wire the AD936x moves 16-bit I and Q per sample
+BYTES_PER_SAMPLE = 4
+
+class LatencyHistogram:
+    def __init__(self, buckets: Tuple[float, ...]=LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        '''
+        Upper bound of the bucket holding the q-quantile, the histogram's resolution.
+        '''
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return self.max
+
+    def snapshot(self) -> dict:
+        return {
+            'count': self.count,
+            'sum_s': self.sum,
+            'mean_s': self.sum / self.count if self.count else 0.0,
+            'max_s': self.max,
+            'p50_s': self.quantile(0.5),
+            'p99_s': self.quantile(0.99),
+            'buckets': {f"{bound:g}": count for bound, count in zip(self.buckets, self.counts)},
+            'overflow': self.counts[-1],
+        }
+
+class DeviceMetrics:
+    def __init__(self, enabled: bool=True) -> None:
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._latency: Dict[tuple, LatencyHistogram] = {}
+        self._bytes: Dict[tuple, int] = {}
+        self._errors: Dict[tuple, int] = {}
+        self._start_time = time.time()
+
+    def observe(self, device: str, op: str, seconds: float, nbytes: int=0, attr: str='') -> None:
+        key = (device, op, attr)
+        with self._lock:
+            histogram = self._latency.get(key)
+            if histogram is None:
+                histogram = self._latency[key] = LatencyHistogram()
+            histogram.observe(seconds)
+            if nbytes:
+                self._bytes[key] = self._bytes.get(key, 0) + nbytes
+
+    def error(self, device: str, op: str, attr: str='') -> None:
+        key = (device, op, attr)
+        with self._lock:
+            self._errors[key] = self._errors.get(key, 0) + 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._latency.clear()
+            self._bytes.clear()
+            self._errors.clear()
+            self._start_time = time.time()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            keys = sorted(set(self._latency) | set(self._errors))
+            operations = []
+            for device, op, attr in keys:
+                histogram = self._latency.get((device, op, attr))
+                operations.append({
+                    'device': device,
+                    'op': op,
+                    'attr': attr,
+                    'latency': histogram.snapshot() if histogram else None,
+                    'bytes': self._bytes.get((device, op, attr), 0),
+                    'errors': self._errors.get((device, op, attr), 0),
+                })
+            return {'start_time': self._start_time, 'snapshot_time': time.time(), 'operations': operations}
+
+    def write_json(self, path: str) -> None:
+        self._write_atomic(path, json.dumps(self.snapshot(), indent=2))
+
+    def to_prometheus(self) -> str:
+        lines = ['# HELP pluto_op_latency_seconds Latency of device operations',
+                 '# TYPE pluto_op_latency_seconds histogram']
+        with self._lock:
+            latency = sorted(self._latency.items())
+            transferred = sorted(self._bytes.items())
+            errors = sorted(self._errors.items())
+        for key, histogram in latency:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'pluto_op_latency_seconds_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+            lines.append(f'pluto_op_latency_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f'pluto_op_latency_seconds_sum{{{labels}}} {histogram.sum:.9f}')
+            lines.append(f'pluto_op_latency_seconds_count{{{labels}}} {histogram.count}')
+
+        lines += ['# HELP pluto_bytes_total Bytes moved to or from the device',
+                  '# TYPE pluto_bytes_total counter']
+        lines += [f'pluto_bytes_total{{{self._labels(key)}}} {value}' for key, value in transferred]
+        lines += ['# HELP pluto_errors_total Device operations that raised',
+                  '# TYPE pluto_errors_total counter']
+        lines += [f'pluto_errors_total{{{self._labels(key)}}} {value}' for key, value in errors]
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str) -> None:
+        self._write_atomic(path, self.to_prometheus())
+
+    # Private #
+    @staticmethod
+    def _labels(key: tuple) -> str:
+        device, op, attr = key
+        labels = f'device="{device}",op="{op}"'
+        return labels + f',attr="{attr}"' if attr else labels
+
+    @staticmethod
+    def _write_atomic(path: str, text: str) -> None:
+        # Scrapers (node_exporter textfile collector) must never see a half-written file
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w') as f:
+            f.write(text)
+        os.replace(temp_path, path)
+
+DEFAULT_METRICS = DeviceMetrics(enabled=os.environ.get('PLUTO_METRICS', '') not in ('', '0'))
+
+class InstrumentedDevice:
+    # Proxies are held weakly too, since each one references its device and would keep the key alive
+    _proxies = weakref.WeakKeyDictionary()
+    _proxies_lock = threading.Lock()
+
+    def __init__(self, device, metrics: DeviceMetrics=DEFAULT_METRICS) -> None:
+        object.__setattr__(self, '_device', device)
+        object.__setattr__(self, '_metrics', metrics)
+        object.__setattr__(self, '_profiles', [])
+        object.__setattr__(self, '_name', str(getattr(device, 'uri', None) or type(device).__name__))
+
+    def __getattr__(self, name):
+        return getattr(self._device, name)
+
+    def __setattr__(self, name, value) -> None:
+        if name.startswith('_') or not (self._metrics.enabled or self._profiles):
+            setattr(self._device, name, value)
+            return
+        self._timed('write', setattr, (self._device, name, value), attr=name)
+
+    def __repr__(self) -> str:
+        return f"InstrumentedDevice({self._device!r})"
+
+    @property
+    def device(self):
+        return self._device
+
+    def tx(self, data_np) -> None:
+        if not (self._metrics.enabled or self._profiles):
+            return self._device.tx(data_np)
+        return self._timed('tx', self._device.tx, (data_np,), nbytes=len(data_np) * BYTES_PER_SAMPLE)
+
+    def tx_iq16(self, iq: np.ndarray) -> None:
+        if not (self._metrics.enabled or self._profiles):
+            return tx_iq16(self._device, iq)
+        return self._timed('tx', tx_iq16, (self._device, iq), nbytes=iq.nbytes)
+
+    def rx(self) -> np.ndarray:
+        if not (self._metrics.enabled or self._profiles):
+            return self._device.rx()
+        return self._timed('rx', self._device.rx, ())
+
+    # Private #
+    @contextlib.contextmanager
+    def _span(self, op: str) -> Iterator[None]:
+        # Times a block of host-side work (synthesis) under the device's name
+        if not (self._metrics.enabled or self._profiles):
+            yield
+            return
+        sinks = [self._metrics] + self._profiles if self._metrics.enabled else self._profiles
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            for sink in sinks:
+                sink.error(self._name, op)
+            raise
+        elapsed = time.perf_counter() - start
+        for sink in sinks:
+            sink.observe(self._name, op, elapsed)
+
+    def _timed(self, op: str, func, args: tuple, nbytes: int=0, attr: str=''):
+        sinks = [self._metrics] + self._profiles if self._metrics.enabled else self._profiles
+        start = time.perf_counter()
+        try:
+            result = func(*args)
+        except BaseException:
+            for sink in sinks:
+                sink.error(self._name, op, attr)
+            raise
+        elapsed = time.perf_counter() - start
+        if op == 'rx' and result is not None:
+            nbytes = len(result) * BYTES_PER_SAMPLE
+        for sink in sinks:
+            sink.observe(self._name, op, elapsed, nbytes, attr)
+        return result
+
+def instrument(sdr):
+    '''
+    The shared InstrumentedDevice for an sdr, created on first use.
+    '''
+    if isinstance(sdr, InstrumentedDevice):
+        return sdr
+    with InstrumentedDevice._proxies_lock:
+        ref = InstrumentedDevice._proxies.get(sdr)
+        proxy = ref() if ref is not None else None
+        if proxy is None:
+            proxy = InstrumentedDevice(sdr)
+            InstrumentedDevice._proxies[sdr] = weakref.ref(proxy)
+        return proxy
+
+@contextlib.contextmanager
+def profile(sdr, metrics: Optional[DeviceMetrics]=None) -> Iterator[DeviceMetrics]:
+    '''
+    Collect the metrics of one run into a fresh DeviceMetrics, whether or not DEFAULT_METRICS is enabled.
+    '''
+    proxy = instrument(sdr)
+    metrics = DeviceMetrics() if metrics is None else metrics
+    proxy._profiles.append(metrics)
+    try:
+        yield metrics
+    finally:
+        proxy._profiles.remove(metrics)
+
+def span(sdr, op: str):
+    '''
+    Context manager timing host-side work, synthesis for example, as `op` on the sdr's series.
+    '''
+    return instrument(sdr)._span(op)
@@ -0,0 +1,238 @@
+"""
+Streaming Welch PSD and power measurements on the RX path.
+
+WelchPSD consumes consecutive RX buffers and produces Welch estimates: Hann
+windowed segments with a configurable overlap, averaged over `average`
+segments per estimate. Segments run across buffer boundaries, the tail of one
+buffer is carried into the next. Segments are taken as a strided view of a
+staging buffer, and the window, frame and power workspaces are allocated once
+and reused, in single precision. Every FFT of a buffer happens in one
+vectorized call.
+
+MeasurementEngine turns estimates into band power, peak frequency, noise floor
+and SNR, for one stream or for a stack of buffers at once (batch()).
+
+    engine = MeasurementEngine(sample_rate, center_freq, signal_band=(1090e6 - 1e6, 1090e6 + 1e6))
+    for samples in stream:
+        for m in engine.process(samples):
+            print(m.peak_freq, m.snr_db)
+
+Powers are in dB relative to full scale of the samples given (dBFS), PSDs in dBFS/Hz.
+"""
+
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+import numpy as np
+import scipy.fft
+
+# Bins each side of the peak counted as signal when no signal band is given
+PEAK_HALF_WIDTH = 2
+
+_TINY = 1e-30
+
+@dataclass
+class Measurement:
+    timestamp: float
+    peak_freq: float
+    peak_power_db: float
+    band_power_db: float
+    noise_floor_db_hz: float
+    snr_db: float
+    psd: np.ndarray
+
+class WelchPSD:
+    def __init__(self, sample_rate: float, nperseg: int=1024, overlap: float=0.5, average: int=16,
+                 center_freq: float=0) -> None:
+        if not 0 <= overlap < 1:
+            raise ValueError(f"overlap must be in [0, 1), got {overlap}")
+        self.sample_rate = float(sample_rate)
+        self.nperseg = int(nperseg)
+        self.step = max(1, int(round(self.nperseg * (1 - overlap))))
+        self.average = int(average)
+        self.center_freq = float(center_freq)
+
+        self.window = np.hanning(self.nperseg).astype(np.float32)
+        # Density scaling, so a bin holds power per Hz
+        self.scale = 1.0 / (self.sample_rate * float(np.sum(self.window.astype(np.float64) ** 2)))
+        self.freqs = self.center_freq + scipy.fft.fftshift(scipy.fft.fftfreq(self.nperseg, 1 / self.sample_rate))
+        self.bin_width = self.sample_rate / self.nperseg
+
+        self._stage = np.empty(0, dtype=np.complex64)
+        self._carry = 0
+        self._frames = np.empty((0, self.nperseg), dtype=np.complex64)
+        self._power = np.empty((0, self.nperseg), dtype=np.float32)
+        self._scratch = np.empty((0, self.nperseg), dtype=np.float32)
+        self._accum = np.zeros(self.nperseg, dtype=np.float64)
+        self._accum_count = 0
+        self.segments_processed = 0
+
+    def reset(self) -> None:
+        self._carry = 0
+        self._accum[:] = 0
+        self._accum_count = 0
+
+    def update(self, samples: np.ndarray) -> List[np.ndarray]:
+        '''
+        Feed the next buffer and return the PSD estimates it completed, fftshifted to match freqs.
+        '''
+        total = self._carry + len(samples)
+        if len(self._stage) < total:
+            stage = np.empty(total, dtype=np.complex64)
+            stage[:self._carry] = self._stage[:self._carry]
+            self._stage = stage
+        self._stage[self._carry:total] = samples
+
+        if total < self.nperseg:
+            self._carry = total
+            return []
+        num_segments = (total - self.nperseg) // self.step + 1
+        power = self._segment_power(self._stage[:total], num_segments)
+
+        # Keep the samples the next segment still needs
+        consumed = num_segments * self.step
+        self._carry = total - consumed
+        self._stage[:self._carry] = self._stage[consumed:total]
+
+        estimates = []
+        index = 0
+        while index < num_segments:
+            take = min(self.average - self._accum_count, num_segments - index)
+            self._accum += power[index:index + take].sum(axis=0, dtype=np.float64)
+            self._accum_count += take
+            index += take
+            if self._accum_count == self.average:
+                estimates.append(scipy.fft.fftshift(self._accum) * (self.scale / self.average))
+                self._accum[:] = 0
+                self._accum_count = 0
+        return estimates
+
+    def batch(self, buffers: np.ndarray) -> np.ndarray:
+        '''
+        One Welch estimate per row of a (num_buffers, buffer_size) stack, averaged over every segment in the row.
+        '''
+        buffers = np.ascontiguousarray(buffers, dtype=np.complex64)
+        num_buffers, buffer_size = buffers.shape
+        if buffer_size < self.nperseg:
+            raise ValueError(f"Buffers of {buffer_size} samples are shorter than nperseg ({self.nperseg})")
+        per_buffer = (buffer_size - self.nperseg) // self.step + 1
+        itemsize = buffers.itemsize
+        segments = np.lib.stride_tricks.as_strided(
+            buffers, shape=(num_buffers, per_buffer, self.nperseg),
+            strides=(buffer_size * itemsize, self.step * itemsize, itemsize), writeable=False)
+        power = self._segment_power(segments, num_buffers * per_buffer)
+        psd = power.reshape(num_buffers, per_buffer, self.nperseg).mean(axis=1, dtype=np.float64)
+        psd *= self.scale
+        return scipy.fft.fftshift(psd, axes=-1)
+
+    # Private #
+    def _workspace(self, num_segments: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if len(self._frames) < num_segments:
+            self._frames = np.empty((num_segments, self.nperseg), dtype=np.complex64)
+            self._power = np.empty((num_segments, self.nperseg), dtype=np.float32)
+            self._scratch = np.empty((num_segments, self.nperseg), dtype=np.float32)
+        return self._frames[:num_segments], self._power[:num_segments], self._scratch[:num_segments]
+
+    def _segment_power(self, data: np.ndarray, num_segments: int) -> np.ndarray:
+        # |FFT|^2 of every windowed segment of data, one row per segment
+        frames, power, scratch = self._workspace(num_segments)
+        if data.ndim == 1:
+            itemsize = data.itemsize
+            segments = np.lib.stride_tricks.as_strided(data, shape=(num_segments, self.nperseg),
+                                                       strides=(self.step * itemsize, itemsize), writeable=False)
+        else:
+            segments = data
+        np.multiply(segments, self.window, out=frames.reshape(segments.shape))
+        spectrum = scipy.fft.fft(frames, axis=1, overwrite_x=True)
+        np.square(spectrum.real, out=power)
+        np.square(spectrum.imag, out=scratch)
+        power += scratch
+        self.segments_processed += num_segments
+        return power
+
+class MeasurementEngine:
+    def __init__(self, sample_rate: float, center_freq: float=0, nperseg: int=1024, overlap: float=0.5,
+                 average: int=16, signal_band: Optional[Tuple[float, float]]=None) -> None:
+        self.welch = WelchPSD(sample_rate, nperseg, overlap, average, center_freq)
+        self.signal_band = signal_band
+        self._band_mask = None
+        if signal_band is not None:
+            low, high = sorted(signal_band)
+            self._band_mask = (self.welch.freqs >= low) & (self.welch.freqs <= high)
+            if not self._band_mask.any():
+                raise ValueError(f"Signal band {signal_band} holds no PSD bins")
+
+    @property
+    def freqs(self) -> np.ndarray:
+        return self.welch.freqs
+
+    def process(self, samples: np.ndarray, timestamp: Optional[float]=None) -> List[Measurement]:
+        timestamp = time.time() if timestamp is None else timestamp
+        estimates = self.welch.update(samples)
+        if not estimates:
+            return []
+        results = self.measure(np.stack(estimates))
+        return [Measurement(timestamp, *(float(results[name][i]) for name in
+                                         ('peak_freq', 'peak_power_db', 'band_power_db', 'noise_floor_db_hz', 'snr_db')),
+                            psd=psd)
+                for i, psd in enumerate(estimates)]
+
+    def batch(self, buffers: np.ndarray) -> dict:
+        '''
+        Measurements for each row of a (num_buffers, buffer_size) stack, as arrays keyed by name.
+        '''
+        psd = self.welch.batch(buffers)
+        results = self.measure(psd)
+        results['psd'] = psd
+        return results
+
+    def measure(self, psd: np.ndarray) -> dict:
+        '''
+        Peak, band power, noise floor and SNR of one PSD or a (num_estimates, bins) stack.
+
+        The noise floor is the median bin, which tones barely move. SNR compares the power
+        in the signal band (signal_band, or a few bins around the peak) after removing the
+        noise floor's share to the noise floor's power over that same bandwidth.
+        '''
+        psd = np.atleast_2d(psd)
+        rows = np.arange(len(psd))
+        bin_width = self.welch.bin_width
+        freqs = self.welch.freqs
+
+        peak = np.argmax(psd, axis=1)
+        peak_freq = freqs[peak] + self._interpolate_peak(psd, peak, rows) * bin_width
+        noise_density = np.median(psd, axis=1)
+
+        if self._band_mask is not None:
+            band_power = psd[:, self._band_mask].sum(axis=1) * bin_width
+            band_bins = np.count_nonzero(self._band_mask)
+        else:
+            cumulative = np.cumsum(psd, axis=1)
+            high = np.minimum(peak + PEAK_HALF_WIDTH, psd.shape[1] - 1)
+            low = np.maximum(peak - PEAK_HALF_WIDTH, 0)
+            band_power = (cumulative[rows, high] - cumulative[rows, low] + psd[rows, low]) * bin_width
+            band_bins = high - low + 1
+
+        noise_in_band = noise_density * band_bins * bin_width
+        signal = np.maximum(band_power - noise_in_band, _TINY)
+        return {
+            'peak_freq': peak_freq,
+            'peak_power_db': 10 * np.log10(psd[rows, peak] * bin_width + _TINY),
+            'band_power_db': 10 * np.log10(band_power + _TINY),
+            'noise_floor_db_hz': 10 * np.log10(noise_density + _TINY),
+            'snr_db': 10 * np.log10(signal / (noise_in_band + _TINY)),
+        }
+
+    # Private #
+    @staticmethod
+    def _interpolate_peak(psd: np.ndarray, peak: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        # Parabola through the peak and its neighbours in dB, offset in bins
+        left = np.maximum(peak - 1, 0)
+        right = np.minimum(peak + 1, psd.shape[1] - 1)
+        a = 10 * np.log10(psd[rows, left] + _TINY)
+        b = 10 * np.log10(psd[rows, peak] + _TINY)
+        c = 10 * np.log10(psd[rows, right] + _TINY)
+        denominator = a - 2 * b + c
+        offset = np.zeros(len(rows))
+        np.divide(0.5 * (a - c), denominator, out=offset, where=denominator != 0)
+        return np.clip(offset, -0.5, 0.5)
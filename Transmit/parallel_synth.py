@@ -0,0 +1,66 @@
+"""
+Multi-core chunked waveform synthesis.
+
+Long TX buffers are split into fixed ENCODE_CHUNK-sized pieces and each piece
+is synthesized and encoded straight into its slice of one preallocated output,
+on a thread pool. numpy releases the GIL inside its ufunc loops, so the pieces
+run on separate cores. Each worker keeps its own chunk-sized scratch arrays,
+so peak memory is the output plus a few chunks per worker however long the
+buffer is.
+
+Piece boundaries depend only on the chunk size, never on the number of
+workers, and every piece is computed from its own exactly known start (a
+sample index, or a phase planned ahead by WaveformBuilder.plan()). Output is
+therefore bit-for-bit the same as rendering the same pieces one after
+another, which is what max_workers=1 does. It is not bit-for-bit the same as
+output split at other boundaries: WaveformBuilder.chunks(n) wraps the phase at
+different samples and can differ from build() by rounding, around 1e-11.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Sequence
+import numpy as np
+
+class SynthesisPool:
+    def __init__(self, max_workers: int=None) -> None:
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._local = threading.local()
+
+    def map(self, func: Callable, items: Sequence) -> List:
+        '''
+        func(item) for every item, in parallel when there is more than one. Results keep the item order.
+        '''
+        if self.max_workers == 1 or len(items) < 2:
+            return [func(item) for item in items]
+        return list(self._pool().map(func, items))
+
+    def scratch(self, name: str, length: int, dtype) -> np.ndarray:
+        '''
+        Per-thread scratch array of at least `length` elements, reused across calls.
+        '''
+        buffers = getattr(self._local, 'buffers', None)
+        if buffers is None:
+            buffers = self._local.buffers = {}
+        buffer = buffers.get(name)
+        if buffer is None or len(buffer) < length or buffer.dtype != dtype:
+            buffer = buffers[name] = np.empty(length, dtype=dtype)
+        return buffer[:length]
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    # Private #
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="synth")
+            return self._executor
+
+DEFAULT_SYNTH_POOL = SynthesisPool()
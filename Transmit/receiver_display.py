@@ -1,29 +1,185 @@
-import adi
+from __future__ import annotations
+
+import time
 import typing
 import matplotlib.pyplot as plt
 import numpy as np
 
-from Transmit.driver_config import UsbDriver 
+try:
+    import adi
+except ImportError:
+    adi = None
+
+from Transmit.burst_detector import BurstDetector, BurstEvent
+from Transmit.device_state import DeviceConfig
+from Transmit.instrumentation import instrument
+from Transmit.measurement import Measurement, MeasurementEngine
+from Transmit.recording import CaptureRecorder
+from Transmit.rx_pipeline import RxPipeline
+from Transmit.rx_tuner import RxTuner, apply_rx_tuning
+from Transmit.session_pool import DEFAULT_SESSION_POOL
+from Transmit.rx_stream import RxStream
+from Transmit.spectrum_view import SpectrumView
 
 class ReceiverPlot:
-    def __init__(self, rx_lo, rf_bandwidth, sdr: adi.Pluto=None, buffer_size=1024) -> None:
+    def __init__(self, rx_lo, rf_bandwidth, sdr: adi.Pluto=None, buffer_size: typing.Optional[int]=None,
+                 uri: typing.Optional[str]=None, tuning_objective: str='throughput',
+                 apply_tuning: typing.Optional[bool]=None) -> None:
         self.rx_lo = int(rx_lo)
         self.rf_bandwidth = int(rf_bandwidth)
         
+        self._pooled = sdr is None
         if sdr == None:
-            session = UsbDriver()
-            self.sdr = session.establish_AD9364_usb_connection()
-        else:
-            self.sdr = sdr
+            sdr = DEFAULT_SESSION_POOL.acquire('rx', self, uri=uri)
+        self.sdr = instrument(sdr)
+
+        # A device passed in may be shared and already streaming, so it is only reconfigured on request.
+        # Otherwise an explicit buffer_size wins over the tuned setting for this sample rate (see rx_tuner)
+        self.rx_tuning = None
+        if apply_tuning is None:
+            apply_tuning = self._pooled
+        if apply_tuning:
+            if buffer_size is None:
+                self.rx_tuning = apply_rx_tuning(self.sdr, tuning_objective)
+                buffer_size = self.rx_tuning['rx_buffer_size'] if self.rx_tuning else 1024
+            if self.rx_tuning is None:
+                DeviceConfig.for_device(self.sdr).apply({'rx_buffer_size': int(buffer_size)})
+        elif buffer_size is None:
+            buffer_size = getattr(self.sdr, 'rx_buffer_size', 1024)
+        self.buffer_size = buffer_size
+
+    def __enter__(self) -> "ReceiverPlot":
+        return self
 
-        self.buffer_size = buffer_size        
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._pooled:
+            DEFAULT_SESSION_POOL.release(self)
+            self._pooled = False
+
+    def tune_rx(self, duration: float=1.0, objective: str='throughput') -> dict:
+        """
+        Measure RX buffer settings at the current sample rate, save the best per objective and apply `objective`'s.
+        """
+        best = RxTuner(self.sdr, duration=duration).run()
+        self.rx_tuning = apply_rx_tuning(self.sdr, objective)
+        if self.rx_tuning is not None:
+            self.buffer_size = self.rx_tuning['rx_buffer_size']
+        return best
 
     # Private #
+    def _tune(self) -> None:
+        # Through the shared shadow state, so later apply() calls on this device still see what is set
+        DeviceConfig.for_device(self.sdr).apply({'rx_lo': self.rx_lo, 'rx_rf_bandwidth': self.rf_bandwidth})
+
     def _receive_samples(self) -> np.ndarray:
         rx_samples = self.sdr.rx()
-        return np.array(rx_samples)
+        return np.asarray(rx_samples)
+
+    def stream(self, num_buffers: int=16) -> RxStream:
+        """
+        Continuous receive. Use as a context manager and iterate for zero-copy buffer views.
+
+            with receiver.stream() as rx:
+                for samples in rx:
+                    ...
+        """
+        buffer_size = getattr(self.sdr, 'rx_buffer_size', self.buffer_size)
+        return RxStream(self.sdr, buffer_size, num_buffers)
+
+    def record(self, path: str, duration: float, description: str='',
+               pipeline: typing.Optional[RxPipeline]=None) -> CaptureRecorder:
+        """
+        Record `duration` seconds around rx_lo to path.sigmf-data with a path.sigmf-meta sidecar.
+        RX buffers are copied straight into the memory-mapped file, overruns start a new capture segment.
+        With a pipeline, its decimated output is recorded instead of the raw samples.
+        """
+        self._tune()
+        sample_rate = getattr(self.sdr, 'sample_rate', self.rf_bandwidth)
+        gain = getattr(self.sdr, 'rx_hardwaregain_chan0', None)
+        center_freq, bandwidth = self.rx_lo, self.rf_bandwidth
+        if pipeline is not None:
+            sample_rate = pipeline.output_rate(sample_rate)
+            center_freq = pipeline.output_center(self.rx_lo)
+            bandwidth = min(bandwidth, sample_rate)
+        recorder = CaptureRecorder(path, int(duration * sample_rate), sample_rate, center_freq, bandwidth,
+                                   gain, description=description)
+        with recorder, self.stream() as rx:
+            overruns = 0
+            for samples in rx:
+                if pipeline is not None:
+                    samples = pipeline.process(samples)
+                recorder.write(samples, gap=rx.overruns != overruns)
+                overruns = rx.overruns
+                if recorder.full:
+                    break
+        print(f"Recorded {recorder.samples_written} samples to {recorder.base_path}")
+        return recorder
+
+    def measure(self, num_measurements: int=10, signal_band: typing.Optional[tuple]=None, nperseg: int=1024,
+                average: int=16, pipeline: typing.Optional[RxPipeline]=None) -> typing.List[Measurement]:
+        """
+        Welch PSD measurements around rx_lo: peak frequency, band power, noise floor and SNR.
+        With a pipeline, the measurements are made on its decimated output.
+        """
+        self._tune()
+        sample_rate = getattr(self.sdr, 'sample_rate', self.rf_bandwidth)
+        center_freq = self.rx_lo
+        if pipeline is not None:
+            sample_rate = pipeline.output_rate(sample_rate)
+            center_freq = pipeline.output_center(self.rx_lo)
+        engine = MeasurementEngine(sample_rate, center_freq, nperseg, average=average, signal_band=signal_band)
+        measurements = []
+        with self.stream() as rx:
+            for samples in rx:
+                if pipeline is not None:
+                    samples = pipeline.process(samples)
+                measurements += engine.process(samples)
+                if len(measurements) >= num_measurements:
+                    break
+        for m in measurements[:num_measurements]:
+            print(f"Peak {m.peak_freq/1e6:.4f} MHz at {m.peak_power_db:.1f} dBFS, "
+                  f"noise floor {m.noise_floor_db_hz:.1f} dBFS/Hz, SNR {m.snr_db:.1f} dB")
+        return measurements[:num_measurements]
+
+    def capture_bursts(self, num_events: int=10, snr_db: float=10.0, pre_trigger: int=4096,
+                       post_trigger: int=16384, timeout: typing.Optional[float]=None) -> typing.List[BurstEvent]:
+        """
+        Wait for bursts around rx_lo and return each one with its pre-trigger history.
+        Stops after num_events events or `timeout` seconds.
+        """
+        self._tune()
+        sample_rate = getattr(self.sdr, 'sample_rate', self.rf_bandwidth)
+        detector = BurstDetector(sample_rate, snr_db, pre_trigger=pre_trigger, post_trigger=post_trigger)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        events = []
+        with self.stream() as rx:
+            overruns = 0
+            for samples in rx:
+                if rx.overruns != overruns:
+                    # Samples were lost, the history no longer joins up with this buffer
+                    detector.reset()
+                    overruns = rx.overruns
+                for event in detector.process(samples):
+                    print(f"Burst at {event.timestamp:.6f}: {event.peak_power_db:.1f} dBFS peak, "
+                          f"{event.trigger_power_db - event.noise_floor_db:.1f} dB over the noise floor")
+                    events.append(event)
+                if len(events) >= num_events or (deadline is not None and time.monotonic() >= deadline):
+                    break
+        return events[:num_events]
+
+    def plot_receiver(self, fft_size: int=1024, average: int=8) -> None:
+        """
+        Live spectrum and waterfall around rx_lo. Blocks until the window is closed.
+        """
+        self._tune()
+        sample_rate = getattr(self.sdr, 'sample_rate', self.rf_bandwidth)
+        view = SpectrumView(self.stream(), sample_rate, self.rx_lo, fft_size=fft_size, average=average)
+        view.show()
 
-    def plot_receiver(self) -> None:
+    def plot_iq(self) -> None:
         plt.figure()
         rx_samples = self._receive_samples()
         plt.plot(np.real(rx_samples), label='I')
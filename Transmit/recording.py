@@ -0,0 +1,153 @@
+"""
+Capture recording and replay with SigMF-style metadata.
+
+CaptureRecorder preallocates a memory-mapped data file and copies each RX
+buffer straight into it, so a capture never has to fit in RAM. Closing the
+recorder trims the file to what was written and writes a JSON sidecar in the
+SigMF layout: sample rate, LO, bandwidth and gain under 'global', and one
+'captures' segment per contiguous run of samples with its wall-clock start
+time. A new segment is started whenever the caller reports a gap, such as an
+RX overrun.
+
+CaptureReader maps an existing recording read-only and hands out np.memmap
+slices, so only the pages that are touched get loaded.
+
+    capture.sigmf-data   raw cf32_le samples
+    capture.sigmf-meta   JSON sidecar
+"""
+
+import datetime
+import json
+import os
+import time
+from typing import Iterator, Optional
+import numpy as np
+
+SIGMF_VERSION = '1.0.0'
+DATA_SUFFIX = '.sigmf-data'
+META_SUFFIX = '.sigmf-meta'
+
+# The AD936x ADC is 12 bits, so rx() values span +-2^11
+RX_FULL_SCALE = 2**11
+
+_DATATYPES = {np.dtype(np.complex64): 'cf32_le', np.dtype(np.complex128): 'cf64_le'}
+
+def _base_path(path: str) -> str:
+    for suffix in (DATA_SUFFIX, META_SUFFIX):
+        if path.endswith(suffix):
+            return path[:-len(suffix)]
+    return path
+
+def _iso_time(timestamp: float) -> str:
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).isoformat().replace('+00:00', 'Z')
+
+class CaptureRecorder:
+    def __init__(self, path: str, max_samples: int, sample_rate: float, center_freq: float, bandwidth: float=None,
+                 gain: float=None, full_scale: float=RX_FULL_SCALE, dtype=np.complex64, description: str='') -> None:
+        self.base_path = _base_path(path)
+        self.max_samples = int(max_samples)
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in _DATATYPES:
+            raise ValueError(f"Unsupported capture dtype {self.dtype}, use complex64 or complex128")
+        self.metadata = {
+            'core:datatype': _DATATYPES[self.dtype],
+            'core:version': SIGMF_VERSION,
+            'core:sample_rate': float(sample_rate),
+            'core:hw': 'ADALM-Pluto',
+            'core:description': description,
+            'pluto:center_freq': float(center_freq),
+            'pluto:bandwidth': None if bandwidth is None else float(bandwidth),
+            'pluto:gain': gain,
+            'pluto:full_scale': float(full_scale),
+        }
+        self.captures = []
+        self.samples_written = 0
+        self._data = np.memmap(self.base_path + DATA_SUFFIX, dtype=self.dtype, mode='w+', shape=(self.max_samples,))
+        self._start_time = None
+        self._new_segment = True
+
+    def __enter__(self) -> "CaptureRecorder":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @property
+    def full(self) -> bool:
+        return self.samples_written >= self.max_samples
+
+    def write(self, samples: np.ndarray, timestamp: Optional[float]=None, gap: bool=False) -> int:
+        '''
+        Append samples, returning how many fit. `gap` marks a discontinuity before them.
+        '''
+        if self._data is None:
+            raise ValueError("Recorder is closed")
+        timestamp = time.time() if timestamp is None else timestamp
+        if self._start_time is None:
+            self._start_time = timestamp
+        count = min(len(samples), self.max_samples - self.samples_written)
+        if count <= 0:
+            return 0
+
+        if gap or self._new_segment:
+            self.captures.append({
+                'core:sample_start': self.samples_written,
+                'core:datetime': _iso_time(timestamp),
+                'core:frequency': self.metadata['pluto:center_freq'],
+            })
+            self._new_segment = False
+        self._data[self.samples_written:self.samples_written + count] = samples[:count]
+        self.samples_written += count
+        return count
+
+    def close(self) -> None:
+        if self._data is None:
+            return
+        self._data.flush()
+        self._data = None  # Drops the only reference, which unmaps the file before it is truncated
+        # Give back the preallocated space that was never written
+        os.truncate(self.base_path + DATA_SUFFIX, self.samples_written * self.dtype.itemsize)
+
+        self.metadata['pluto:start_time'] = None if self._start_time is None else _iso_time(self._start_time)
+        self.metadata['pluto:stop_time'] = _iso_time(time.time())
+        meta = {'global': self.metadata, 'captures': self.captures, 'annotations': []}
+        with open(self.base_path + META_SUFFIX, 'w') as f:
+            json.dump(meta, f, indent=2)
+
+class CaptureReader:
+    def __init__(self, path: str) -> None:
+        self.base_path = _base_path(path)
+        with open(self.base_path + META_SUFFIX) as f:
+            meta = json.load(f)
+        self.metadata = meta['global']
+        self.captures = meta.get('captures', [])
+        datatypes = {name: dtype for dtype, name in _DATATYPES.items()}
+        self.dtype = datatypes[self.metadata['core:datatype']]
+        data_path = self.base_path + DATA_SUFFIX
+        if os.path.getsize(data_path) == 0:
+            # np.memmap cannot map an empty file
+            self.samples = np.empty(0, dtype=self.dtype)
+        else:
+            self.samples = np.memmap(data_path, dtype=self.dtype, mode='r')
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    @property
+    def sample_rate(self) -> float:
+        return self.metadata['core:sample_rate']
+
+    @property
+    def center_freq(self) -> float:
+        return self.metadata['pluto:center_freq']
+
+    @property
+    def full_scale(self) -> float:
+        return self.metadata.get('pluto:full_scale', RX_FULL_SCALE)
+
+    def read(self, start: int, count: int) -> np.ndarray:
+        return self.samples[start:start + count]
+
+    def chunks(self, chunk_size: int) -> Iterator[np.ndarray]:
+        for start in range(0, len(self.samples), chunk_size):
+            yield self.samples[start:start + chunk_size]
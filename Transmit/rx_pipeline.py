@@ -0,0 +1,254 @@
+"""
+Stateful multistage RX processing.
+
+RxPipeline chains stages over consecutive rx() buffers: frequency shift, DC
+removal and CIC, half-band or general FIR decimators. Every stage keeps its own
+state (NCO phase, DC estimate, filter history, decimation phase) between
+buffers, so the output is what one long buffer would have produced, however
+the stream is split, with no edge artefacts. Only the NCO can differ, in the
+last bit of a float32, because its phase is wrapped at each buffer. Stages work in complex64 on preallocated workspaces. What a stage
+returns is a view of its workspace that stays valid until its next call, the
+same contract as RxStream.read().
+
+    pipeline = RxPipeline([FrequencyShift(2e6, sample_rate), DCRemover(),
+                           CICDecimator(8), HalfBandDecimator(), FirDecimator(2, cutoff=0.4)])
+    for samples in stream:
+        narrow = pipeline.process(samples)      # sample_rate / 32
+"""
+
+from typing import Iterable, Iterator, List, Optional
+import numpy as np
+import scipy.signal
+
+def _grow(buffer: np.ndarray, length: int, dtype=np.complex64) -> np.ndarray:
+    # Workspaces only ever grow, so steady-state buffers allocate nothing
+    return buffer if len(buffer) >= length else np.empty(length, dtype=dtype)
+
+class FrequencyShift:
+    '''
+    Move the signal at `offset` Hz from the LO down to 0 Hz with a phase-continuous NCO.
+    '''
+    decimation = 1
+
+    def __init__(self, offset: float, sample_rate: float) -> None:
+        self.offset = float(offset)
+        self.sample_rate = float(sample_rate)
+        self._step = -self.offset / self.sample_rate  # Cycles per sample
+        self._phase = 0.0
+        self._index = np.empty(0, dtype=np.float64)
+        self._angle = np.empty(0, dtype=np.float64)
+        self._out = np.empty(0, dtype=np.complex64)
+
+    def reset(self) -> None:
+        self._phase = 0.0
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        length = len(samples)
+        if len(self._index) < length:
+            self._index = np.arange(length, dtype=np.float64)
+            self._angle = np.empty(length, dtype=np.float64)
+        self._out = _grow(self._out, length)
+        angle = self._angle[:length]
+        out = self._out[:length]
+
+        # Phase relative to the buffer start, so precision does not decay over long runs
+        np.multiply(self._index[:length], self._step, out=angle)
+        angle += self._phase
+        angle *= 2 * np.pi
+        np.cos(angle, out=out.real, casting='same_kind')
+        np.sin(angle, out=out.imag, casting='same_kind')
+        out *= samples
+        self._phase = (self._phase + length * self._step) % 1.0
+        return out
+
+class DCRemover:
+    '''
+    Subtract a running DC estimate, a one-pole average updated every sample: dc += alpha * (x - dc).
+    The filter state carries across buffers, the estimate starts at the first sample.
+    '''
+    decimation = 1
+
+    def __init__(self, alpha: float=1e-4) -> None:
+        self.alpha = float(alpha)
+        self.dc = None
+        self._b = np.array([self.alpha], dtype=np.float32)
+        self._a = np.array([1.0, self.alpha - 1.0], dtype=np.float32)
+        self._state = np.zeros(1, dtype=np.complex64)
+        self._out = np.empty(0, dtype=np.complex64)
+
+    def reset(self) -> None:
+        self.dc = None
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        length = len(samples)
+        self._out = _grow(self._out, length)
+        out = self._out[:length]
+        if length == 0:
+            return out
+        if self.dc is None:
+            # As if the estimate had been settled on the first sample
+            self._state[0] = (1 - self.alpha) * np.complex64(samples[0])
+        dc, self._state = scipy.signal.lfilter(self._b, self._a, samples.astype(np.complex64, copy=False),
+                                               zi=self._state)
+        self.dc = complex(dc[-1])
+        np.subtract(samples, dc, out=out, casting='same_kind')
+        return out
+
+class FirDecimator:
+    '''
+    Decimating FIR that only computes the samples it keeps. Zero taps are skipped,
+    which is what makes a half-band filter about twice as cheap.
+    '''
+    def __init__(self, decimation: int, taps: Optional[np.ndarray]=None, cutoff: float=0.8, num_taps: int=None) -> None:
+        self.decimation = int(decimation)
+        if taps is None:
+            # cutoff is the fraction of the output Nyquist band kept
+            num_taps = num_taps or 16 * self.decimation + 1
+            taps = scipy.signal.firwin(num_taps, cutoff / self.decimation)
+        self.taps = np.asarray(taps, dtype=np.float32)
+        self._nonzero = [(k, self.taps[k]) for k in np.flatnonzero(self.taps)]
+        self._history = len(self.taps) - 1
+        self._stage = np.zeros(self._history, dtype=np.complex64)
+        self._offset = 0
+        self._out = np.empty(0, dtype=np.complex64)
+        self._product = np.empty(0, dtype=np.complex64)
+
+    def reset(self) -> None:
+        self._stage[:self._history] = 0
+        self._offset = 0
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        length = len(samples)
+        history = self._history
+        self._stage = self._grow_stage(history + length)
+        stage = self._stage[:history + length]
+        stage[history:] = samples
+
+        # Output m sits on input sample offset + m*D, whose newest tap is stage[history + offset + m*D]
+        D = self.decimation
+        num_out = max(0, -(-(length - self._offset) // D))
+        if num_out == 0:
+            # Too short to reach the next kept sample, only the history moves on
+            self._offset = (self._offset - length) % D
+            stage[:history] = stage[length:length + history]
+            return self._out[:0]
+        self._out = _grow(self._out, num_out)
+        self._product = _grow(self._product, num_out)
+        out = self._out[:num_out]
+        product = self._product[:num_out]
+        out[:] = 0
+        for k, tap in self._nonzero:
+            start = history + self._offset - k
+            np.multiply(stage[start:start + (num_out - 1) * D + 1:D], tap, out=product)
+            out += product
+
+        self._offset = (self._offset - length) % D
+        stage[:history] = stage[length:length + history]
+        return out
+
+    # Private #
+    def _grow_stage(self, length: int) -> np.ndarray:
+        if len(self._stage) >= length:
+            return self._stage
+        stage = np.empty(length, dtype=np.complex64)
+        stage[:self._history] = self._stage[:self._history]
+        return stage
+
+class HalfBandDecimator(FirDecimator):
+    def __init__(self, num_taps: int=31) -> None:
+        if num_taps % 4 != 3:
+            raise ValueError("A half-band filter needs 4k+3 taps so every other tap is zero")
+        taps = scipy.signal.firwin(num_taps, 0.5)
+        # Force the structural zeros to exactly zero so they are skipped
+        centre = num_taps // 2
+        taps[(np.arange(num_taps) - centre) % 2 == 0] = 0
+        taps[centre] = 0.5
+        super().__init__(2, taps / taps.sum())
+
+class CICDecimator:
+    '''
+    `stages` cascaded moving sums of `decimation` samples, then decimation, normalized to unity DC gain.
+
+    Each moving sum is a running sum restarted at every buffer over the stage's own history,
+    so the integrators cannot grow without bound the way a free-running CIC integrator does
+    in floating point.
+    '''
+    def __init__(self, decimation: int, stages: int=3) -> None:
+        self.decimation = int(decimation)
+        self.stages = int(stages)
+        self.gain = float(self.decimation) ** self.stages
+        history = self.decimation - 1
+        self._history = [np.zeros(history, dtype=np.complex128) for _ in range(self.stages)]
+        self._offset = 0
+        self._stage = np.empty(0, dtype=np.complex128)
+        self._sums = np.empty(0, dtype=np.complex128)
+        self._work = np.empty(0, dtype=np.complex128)
+        self._out = np.empty(0, dtype=np.complex64)
+
+    def reset(self) -> None:
+        for history in self._history:
+            history[:] = 0
+        self._offset = 0
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        R = self.decimation
+        length = len(samples)
+        history = R - 1
+        self._stage = _grow(self._stage, history + length, np.complex128)
+        self._sums = _grow(self._sums, history + length + 1, np.complex128)
+        self._work = _grow(self._work, length, np.complex128)
+        stage = self._stage[:history + length]
+        sums = self._sums[:history + length + 1]
+        work = self._work[:length]
+
+        work[:] = samples
+        for state in self._history:
+            stage[:history] = state
+            stage[history:] = work
+            state[:] = stage[length:]
+            # Moving sum of R samples as a difference of a cumulative sum
+            sums[0] = 0
+            np.cumsum(stage, out=sums[1:])
+            np.subtract(sums[R:], sums[:-R], out=work)
+
+        num_out = max(0, -(-(length - self._offset) // R))
+        self._out = _grow(self._out, num_out)
+        out = self._out[:num_out]
+        np.multiply(work[self._offset::R], 1 / self.gain, out=out, casting='same_kind')
+        self._offset = (self._offset - length) % R
+        return out
+
+class RxPipeline:
+    def __init__(self, stages: Iterable=()) -> None:
+        self.stages: List = list(stages)
+
+    @property
+    def decimation(self) -> int:
+        total = 1
+        for stage in self.stages:
+            total *= getattr(stage, 'decimation', 1)
+        return total
+
+    def output_rate(self, sample_rate: float) -> float:
+        return sample_rate / self.decimation
+
+    def output_center(self, center_freq: float) -> float:
+        '''
+        Frequency that ends up at 0 Hz, after any FrequencyShift stages.
+        '''
+        return center_freq + sum(stage.offset for stage in self.stages if isinstance(stage, FrequencyShift))
+
+    def reset(self) -> None:
+        for stage in self.stages:
+            stage.reset()
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        for stage in self.stages:
+            samples = stage.process(samples)
+        return samples
+
+    def run(self, buffers: Iterable[np.ndarray]) -> Iterator[np.ndarray]:
+        for samples in buffers:
+            output = self.process(samples)
+            if len(output):
+                yield output
@@ -0,0 +1,155 @@
+"""
+Continuous receive engine for the ADALM-Pluto.
+
+A dedicated reader thread calls sdr.rx() back to back and copies each buffer
+into a preallocated ring of numpy arrays, so no memory is allocated per buffer
+on our side. Consumers pull views straight out of the ring. A view stays valid
+until the consumer asks for the next buffer, the reader never writes into a slot
+that is still lent out.
+
+If the consumer falls behind and the ring fills up, incoming buffers are dropped
+and counted as overruns (one per buffer, plus the samples lost in
+dropped_samples) rather than overwriting data the consumer has not seen.
+"""
+
+import threading
+import time
+from typing import Iterator, Optional
+import numpy as np
+
+class RxStream:
+    def __init__(self, sdr, buffer_size: int, num_buffers: int=16, dtype=np.complex128) -> None:
+        if num_buffers < 2:
+            raise ValueError("RxStream needs at least 2 ring buffers")
+        self.sdr = sdr
+        self.buffer_size = int(buffer_size)
+        self.num_buffers = int(num_buffers)
+
+        self._ring = np.empty((self.num_buffers, self.buffer_size), dtype=dtype)
+        self._lengths = np.zeros(self.num_buffers, dtype=np.int64)
+        self._write_count = 0
+        self._read_count = 0
+        self._lent = False
+
+        self._cond = threading.Condition()
+        self._running = False
+        self._error = None
+        self._thread = None
+
+        self.buffers_received = 0
+        self.samples_received = 0
+        self.overruns = 0
+        self.dropped_samples = 0
+        self.truncated_buffers = 0
+        self._start_time = None
+        self._stop_time = None
+
+    def __enter__(self) -> "RxStream":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        while True:
+            samples = self.read()
+            if samples is None:
+                return
+            yield samples
+
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self._error = None
+        self._start_time = time.monotonic()
+        self._stop_time = None
+        self._thread = threading.Thread(target=self._reader, name="RxStream", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+        if self._stop_time is None:
+            self._stop_time = time.monotonic()
+
+    def read(self, timeout: Optional[float]=None) -> Optional[np.ndarray]:
+        '''
+        Return a view of the next received buffer, or None once the stream has stopped
+        and drained. The view is only valid until the next call to read().
+        '''
+        with self._cond:
+            if self._lent:
+                # Hand the previous slot back to the reader
+                self._read_count += 1
+                self._lent = False
+                self._cond.notify_all()
+
+            ready = self._cond.wait_for(lambda: self._write_count > self._read_count or not self._running, timeout)
+            if self._write_count == self._read_count:
+                if self._error is not None:
+                    raise self._error
+                if not ready:
+                    raise TimeoutError("No RX buffer received before timeout")
+                return None
+
+            slot = self._read_count % self.num_buffers
+            self._lent = True
+            return self._ring[slot, :self._lengths[slot]]
+
+    def stats(self) -> dict:
+        end = self._stop_time if self._stop_time is not None else time.monotonic()
+        elapsed = end - self._start_time if self._start_time is not None else 0.0
+        with self._cond:
+            queued = self._write_count - self._read_count
+        return {
+            'buffers_received': self.buffers_received,
+            'samples_received': self.samples_received,
+            'queued_buffers': queued,
+            'overruns': self.overruns,
+            'dropped_samples': self.dropped_samples,
+            'truncated_buffers': self.truncated_buffers,
+            'elapsed_s': elapsed,
+            'sample_rate': self.samples_received / elapsed if elapsed else 0.0,
+        }
+
+    # Private #
+    def _reader(self) -> None:
+        try:
+            while self._running:
+                data = self.sdr.rx()
+
+                with self._cond:
+                    if not self._running:
+                        break
+                    if self._write_count - self._read_count >= self.num_buffers:
+                        # Ring is full, the consumer still owns every slot
+                        self.overruns += 1
+                        self.dropped_samples += len(data)
+                        continue
+                    slot = self._write_count % self.num_buffers
+
+                # The slot is unpublished until write_count moves, so copy outside the lock
+                length = min(len(data), self.buffer_size)
+                if length < len(data):
+                    self.truncated_buffers += 1
+                np.copyto(self._ring[slot, :length], data[:length])
+                self._lengths[slot] = length
+
+                with self._cond:
+                    self._write_count += 1
+                    self.buffers_received += 1
+                    self.samples_received += length
+                    self._cond.notify_all()
+        except Exception as e:
+            self._error = e
+        finally:
+            with self._cond:
+                self._running = False
+                self._stop_time = time.monotonic()
+                self._cond.notify_all()
@@ -0,0 +1,182 @@
+"""
+RX buffer-size and kernel-buffer tuning.
+
+The right rx_buffer_size and kernel buffer count depend on the sample rate,
+the USB link and the host. Small buffers keep latency low but cost a libiio
+round trip per few hundred microseconds of signal. Large buffers sustain the
+rate but hand over data late. RxTuner sweeps both settings, drains the device
+with back-to-back rx() calls for each combination and measures:
+
+- achieved sample rate over the run
+- gaps: intervals between returns longer than the kernel queue can cover
+  (kernel_buffers * buffer duration), where samples must have been dropped
+- per-call latency (median and p99)
+
+The best combination for an objective is saved per sample rate in
+~/.cache/adalm_pluto/rx_tuning.json. apply_rx_tuning() reads it back, and
+ReceiverPlot calls it on connect.
+
+Objectives:
+- 'throughput': fewest gaps and highest achieved rate, then the most headroom
+  (queue capacity minus p99 call latency) against stalls on the host
+- 'latency': least buffered signal (buffer size x kernel buffers) that still
+  sustains the sample rate with no gaps
+"""
+
+import json
+import os
+import time
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+
+from Transmit.device_state import DeviceConfig
+
+RX_TUNING_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'adalm_pluto', 'rx_tuning.json')
+
+OBJECTIVES = ('throughput', 'latency')
+
+DEFAULT_BUFFER_SIZES = tuple(2**n for n in range(10, 21, 2))
+DEFAULT_KERNEL_BUFFERS = (1, 2, 4, 8)
+
+# Share of the nominal sample rate a setting has to reach to count as sustained
+SUSTAINED_FRACTION = 0.98
+
+def _tuning_key(sample_rate: float, objective: str) -> str:
+    return f"{int(sample_rate)}:{objective}"
+
+def load_rx_tuning(sample_rate: float, objective: str='throughput', path: str=RX_TUNING_PATH) -> Optional[dict]:
+    try:
+        with open(path) as f:
+            return json.load(f).get(_tuning_key(sample_rate, objective))
+    except (OSError, ValueError):
+        return None
+
+def save_rx_tuning(sample_rate: float, objective: str, result: dict, path: str=RX_TUNING_PATH) -> None:
+    try:
+        with open(path) as f:
+            table = json.load(f)
+    except (OSError, ValueError):
+        table = {}
+    table[_tuning_key(sample_rate, objective)] = result
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(table, f, indent=2)
+    os.replace(temp_path, path)
+
+def set_kernel_buffers(sdr, count: int) -> None:
+    # The kernel buffer count only takes effect on a fresh RX buffer
+    sdr.rx_destroy_buffer()
+    rxadc = getattr(sdr, '_rxadc', None)
+    if rxadc is not None:
+        rxadc.set_kernel_buffers_count(int(count))
+
+def apply_rx_tuning(sdr, objective: str='throughput', path: str=RX_TUNING_PATH) -> Optional[dict]:
+    '''
+    Apply the saved best setting for the device's current sample rate. Returns it, or None if nothing is saved.
+    '''
+    sample_rate = getattr(sdr, 'sample_rate', None)
+    if sample_rate is None:
+        return None
+    tuning = load_rx_tuning(sample_rate, objective, path)
+    if tuning is None:
+        return None
+    set_kernel_buffers(sdr, tuning['kernel_buffers'])
+    DeviceConfig.for_device(sdr).apply({'rx_buffer_size': int(tuning['rx_buffer_size'])})
+    return tuning
+
+class RxTuner:
+    def __init__(self, sdr, buffer_sizes: Sequence[int]=DEFAULT_BUFFER_SIZES,
+                 kernel_buffers: Sequence[int]=DEFAULT_KERNEL_BUFFERS, duration: float=1.0,
+                 path: str=RX_TUNING_PATH) -> None:
+        self.sdr = sdr
+        self.buffer_sizes = list(buffer_sizes)
+        self.kernel_buffers = list(kernel_buffers)
+        self.duration = float(duration)
+        self.path = path
+        self.results: List[dict] = []
+
+    def measure(self, buffer_size: int, kernel_buffers: int) -> dict:
+        sample_rate = float(self.sdr.sample_rate)
+        set_kernel_buffers(self.sdr, kernel_buffers)
+        self.sdr.rx_buffer_size = int(buffer_size)
+        self.sdr.rx()  # Creates the buffer, not part of the measurement
+
+        queue_capacity = kernel_buffers * buffer_size / sample_rate
+        latencies = []
+        samples = 0
+        gaps = 0
+        start = last = time.perf_counter()
+        while last - start < self.duration:
+            received = len(self.sdr.rx())
+            now = time.perf_counter()
+            latencies.append(now - last)
+            if now - last > queue_capacity:
+                gaps += 1
+            samples += received
+            last = now
+        elapsed = last - start
+
+        latencies = np.array(latencies)
+        rate = samples / elapsed if elapsed else 0.0
+        return {
+            'rx_buffer_size': int(buffer_size),
+            'kernel_buffers': int(kernel_buffers),
+            'sample_rate': sample_rate,
+            'achieved_rate': rate,
+            'sustained': rate >= SUSTAINED_FRACTION * sample_rate and gaps == 0,
+            'gaps': gaps,
+            'calls': len(latencies),
+            'latency_median_s': float(np.median(latencies)),
+            'latency_p99_s': float(np.percentile(latencies, 99)),
+            'buffered_s': queue_capacity,
+        }
+
+    def run(self, objectives: Sequence[str]=OBJECTIVES, save: bool=True, verbose: bool=True) -> Dict[str, dict]:
+        '''
+        Measure every combination, then pick and optionally save the best one per objective.
+        '''
+        original_size = getattr(self.sdr, 'rx_buffer_size', None)
+        self.results = []
+        try:
+            for kernel_buffers in self.kernel_buffers:
+                for buffer_size in self.buffer_sizes:
+                    result = self.measure(buffer_size, kernel_buffers)
+                    self.results.append(result)
+                    if verbose:
+                        print(f"rx_buffer_size {buffer_size:>8} x {kernel_buffers} kernel buffers: "
+                              f"{result['achieved_rate']/1e6:7.3f} MS/s, {result['gaps']} gaps, "
+                              f"median call {result['latency_median_s']*1e3:.3f} ms")
+        finally:
+            self.sdr.rx_destroy_buffer()
+            if original_size is not None:
+                self.sdr.rx_buffer_size = original_size
+            DeviceConfig.for_device(self.sdr).invalidate('rx_buffer_size')
+
+        best = {}
+        for objective in objectives:
+            choice = self.best(objective)
+            if choice is None:
+                continue
+            best[objective] = choice
+            if save:
+                save_rx_tuning(choice['sample_rate'], objective, dict(choice, tuned_at=time.time()), self.path)
+            if verbose:
+                print(f"Best for {objective}: rx_buffer_size {choice['rx_buffer_size']}, "
+                      f"{choice['kernel_buffers']} kernel buffers")
+        return best
+
+    def best(self, objective: str) -> Optional[dict]:
+        if objective not in OBJECTIVES:
+            raise ValueError(f"Unknown objective '{objective}', expected one of {OBJECTIVES}")
+        if not self.results:
+            return None
+        sustained = [r for r in self.results if r['sustained']]
+        if objective == 'throughput':
+            # Rates within 0.1% of each other count as equal, measurement noise is larger than that
+            resolution = 1e-3 * self.results[0]['sample_rate']
+            return min(self.results, key=lambda r: (r['gaps'], -round(r['achieved_rate'] / resolution),
+                                                    r['latency_p99_s'] - r['buffered_s']))
+        if not sustained:
+            return None
+        return min(sustained, key=lambda r: (r['buffered_s'], r['latency_median_s']))
@@ -0,0 +1,148 @@
+"""
+Deadline scheduler for timed transmit sequences.
+
+The sweeps used to sleep for the dwell after each blocking tx() and buffer
+destroy, so upload and reconfiguration time was added to every step and a long
+sequence drifted further and further behind. TxScheduler instead plans every
+step against an absolute time.monotonic() deadline: step n starts at
+t0 + dwell[0] + ... + dwell[n-1] however long the previous step took to set
+up. While a step is dwelling, the next step's waveform is prepared on a worker
+thread so only the retune and upload sit between deadlines.
+
+Each step runs with a cyclic buffer so the output stays up for the whole
+dwell. A step whose waveform is the buffer already loaded (a gain-only change
+in a power sweep, for example) does not re-upload it.
+
+The planned start of every step and the moment its output actually went live
+are recorded in `timings`. stop() cancels a running sequence and takes the
+transmitter off air.
+"""
+
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional, Union
+import numpy as np
+
+@dataclass
+class TxStep:
+    freq: float
+    gain: float
+    dwell: float
+    # None transmits the default tone for freq, a callable is built ahead of the deadline.
+    # complex128 waveforms in +-1 are encoded to the device format, int16/complex64 are sent as-is
+    waveform: Optional[Union[np.ndarray, Callable[[], np.ndarray]]] = None
+    bandwidth: Optional[float] = None
+
+class TxScheduler:
+    def __init__(self, transmit) -> None:
+        self.transmit = transmit
+        self.timings: List[dict] = []
+        self._stop = threading.Event()
+        self._loaded = None
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run(self, steps: Iterable[TxStep], repeat: Optional[int]=1, verbose: bool=True) -> List[dict]:
+        '''
+        Run the step list `repeat` times (None repeats until stop() is called) and return the timings.
+        '''
+        steps = list(steps)
+        if not steps:
+            return self.timings
+        self._stop.clear()
+        self.timings = []
+        self._loaded = None
+
+        def sequence():
+            count = 0
+            while repeat is None or count < repeat:
+                yield from steps
+                count += 1
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            schedule = sequence()
+            step = next(schedule)
+            prepared = executor.submit(self._prepare, step)
+            start = time.monotonic()
+            deadline = start
+
+            for index in itertools.count():
+                if self._wait_until(deadline):
+                    break
+
+                actual = time.monotonic()
+                self._apply(step, prepared.result())
+                live = time.monotonic()
+                self.timings.append({
+                    'step': index,
+                    'freq': step.freq,
+                    'gain': step.gain,
+                    'planned': deadline - start,
+                    'actual': live - start,
+                    'error': live - deadline,
+                    'setup': live - actual,
+                })
+                if verbose:
+                    print(f"Step {index}: {step.freq/1e6} MHz at {step.gain} dB for {step.dwell} seconds "
+                          f"(start error {1e3 * (live - deadline):.2f} ms, setup {1e3 * (live - actual):.2f} ms)")
+
+                # Absolute deadlines, setup time is absorbed by the dwell instead of adding to it
+                deadline += step.dwell
+                step = next(schedule, None)
+                if step is None:
+                    self._wait_until(deadline)
+                    break
+                prepared = executor.submit(self._prepare, step)
+        finally:
+            executor.shutdown(wait=True)
+
+        if self._stop.is_set():
+            # Cancelled, do not leave the last cyclic buffer on air
+            self.transmit.sdr.tx_destroy_buffer()
+            self._loaded = None
+        return self.timings
+
+    def jitter(self) -> dict:
+        errors = np.array([abs(t['error']) for t in self.timings]) if self.timings else np.zeros(1)
+        return {'steps': len(self.timings), 'mean_abs_error': float(errors.mean()), 'max_abs_error': float(errors.max())}
+
+    # Private #
+    def _wait_until(self, deadline: float) -> bool:
+        # Returns True if stopped while waiting
+        remaining = deadline - time.monotonic()
+        if remaining > 0:
+            return self._stop.wait(remaining)
+        return self._stop.is_set()
+
+    def _prepare(self, step: TxStep) -> np.ndarray:
+        if step.waveform is None:
+            return self.transmit._cyclic_tone(step.freq)
+        waveform = step.waveform() if callable(step.waveform) else step.waveform
+        if waveform.dtype == np.complex128:
+            return self.transmit._encode(waveform)
+        return waveform
+
+    def _apply(self, step: TxStep, waveform: np.ndarray) -> None:
+        settings = {
+            'tx_cyclic_buffer': True,
+            'sample_rate': int(self.transmit.sample_rate),
+            'tx_lo': int(step.freq),
+            'tx_hardwaregain_chan0': step.gain,
+        }
+        if step.bandwidth is not None:
+            settings['tx_rf_bandwidth'] = int(step.bandwidth)
+
+        reload = waveform is not self._loaded
+        if reload:
+            # pyadi-iio refuses to change tx_cyclic_buffer while a buffer exists, a streaming one included
+            self.transmit.sdr.tx_destroy_buffer()
+            self._loaded = None
+        self.transmit.config.apply(settings)
+        if reload:
+            self.transmit._send(waveform)
+            self._loaded = waveform
@@ -0,0 +1,166 @@
+"""
+Process-wide pool of open Pluto connections.
+
+Transmit and ReceiverPlot used to open a fresh connection each time they were
+created without an sdr. The pool hands out connections by serial number or
+URI instead, reusing a device that is already open. Each device has at most
+one TX owner and one RX owner at a time, so a Transmit and a ReceiverPlot can
+share a radio while two transmitters asking for "any device" are given two
+different radios, picked in serial-number order so multi-radio rigs come up
+the same way every time. Owners are held weakly: a role is given back by
+release(), or when its owner is garbage collected.
+
+Every device still open when the interpreter exits has its buffers destroyed.
+"""
+
+import atexit
+import threading
+import weakref
+from typing import Dict, List, Optional
+
+from Transmit.driver_config import UsbDriver
+
+ROLES = ('tx', 'rx')
+
+class DeviceSession:
+    def __init__(self, key: str, uri: str, serial: Optional[str], sdr) -> None:
+        self.key = key
+        self.uri = uri
+        self.serial = serial
+        self.sdr = sdr
+        # Per role, a reference to the owner: weak for explicit owners, so collection releases the role
+        self.owners = {role: None for role in ROLES}
+
+    def owner(self, role: str) -> Optional[object]:
+        ref = self.owners[role]
+        return ref() if ref is not None else None
+
+    def is_free(self, role: str) -> bool:
+        return self.owner(role) is None
+
+    def is_idle(self) -> bool:
+        return all(self.is_free(role) for role in ROLES)
+
+class SessionPool:
+    def __init__(self, device_class: str='ad9364') -> None:
+        self.device_class = device_class
+        self._sessions: Dict[str, DeviceSession] = {}
+        self._lock = threading.RLock()
+
+    def acquire(self, role: str='tx', owner: object=None, serial: Optional[str]=None, uri: Optional[str]=None):
+        '''
+        Return an open device with `role` ('tx' or 'rx') reserved for `owner`.
+
+        With a serial or URI that exact device is used, and it is an error if another owner
+        already holds the role. Otherwise the first device in serial order with the role free
+        is reused, or a new one is opened. The role is held until release(owner) or until the
+        owner is garbage collected. Without an owner it is held until close_all().
+        '''
+        if role not in ROLES:
+            raise ValueError(f"role must be one of {ROLES}, got '{role}'")
+
+        with self._lock:
+            session = self._find(serial, uri)
+            if session is None and serial is None and uri is None:
+                session = next((s for s in self._sorted_sessions() if s.is_free(role)), None)
+            if session is None:
+                session = self._open(serial, uri, role)
+
+            current = session.owner(role)
+            if current is not None and (owner is None or current is not owner):
+                raise RuntimeError(f"{role.upper()} on device {session.key} is already owned by {current!r}")
+            if current is None:
+                session.owners[role] = self._reference(session, role, owner)
+            return session.sdr
+
+    def __enter__(self) -> "SessionPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close_all()
+
+    def release(self, owner: object, close_idle: bool=False) -> None:
+        with self._lock:
+            for session in list(self._sessions.values()):
+                for role in ROLES:
+                    if session.owner(role) is owner:
+                        session.owners[role] = None
+                if close_idle and session.is_idle():
+                    self._close(session)
+
+    def sessions(self) -> List[DeviceSession]:
+        with self._lock:
+            return self._sorted_sessions()
+
+    def close_all(self) -> None:
+        with self._lock:
+            for session in list(self._sessions.values()):
+                self._close(session)
+
+    # Private #
+    def _reference(self, session: DeviceSession, role: str, owner: Optional[object]):
+        if owner is None:
+            token = object()
+            return lambda: token
+        ref = weakref.ref(owner)
+        weakref.finalize(owner, self._expire, session, role, ref)
+        return ref
+
+    def _expire(self, session: DeviceSession, role: str, ref) -> None:
+        # The owner was collected without release(), free its role unless it has been taken over since
+        with self._lock:
+            if session.owners[role] is ref:
+                session.owners[role] = None
+
+    def _sorted_sessions(self) -> List[DeviceSession]:
+        return sorted(self._sessions.values(), key=lambda s: s.key)
+
+    def _find(self, serial: Optional[str], uri: Optional[str]) -> Optional[DeviceSession]:
+        for session in self._sessions.values():
+            if serial is not None and session.serial == serial:
+                return session
+            if uri is not None and session.uri == uri:
+                return session
+        return None
+
+    def _open(self, serial: Optional[str], uri: Optional[str], role: str) -> DeviceSession:
+        skip = set()
+        if uri is None and not UsbDriver.can_discover():
+            # Discovery needs pylibiio, without it scan the USB paths for one that is not open yet
+            skip = {s.uri for s in self._sessions.values()}
+        elif uri is None:
+            # Pick the lowest serial that is not open yet so the assignment is repeatable
+            open_serials = {s.serial for s in self._sessions.values()}
+            candidates = sorted((found_serial or '', found_uri)
+                                for found_uri, found_serial in UsbDriver(serial=serial).discover()
+                                if found_serial not in open_serials and serial in (None, found_serial))
+            if candidates:
+                uri = candidates[0][1]
+            elif self._sessions and serial is None:
+                raise RuntimeError(f"No unopened device available and every open device has {role.upper()} owned")
+
+        driver = UsbDriver(uri, serial)
+        driver.usb_paths = [path for path in driver.usb_paths if path not in skip]
+        sdr = getattr(driver, f"establish_{self._establish_name()}_usb_connection")()
+        key = driver.serial or driver.uri
+        if key in self._sessions:
+            # Discovery was unavailable and the driver found a device we already hold
+            return self._sessions[key]
+        session = DeviceSession(key, driver.uri, driver.serial, sdr)
+        self._sessions[key] = session
+        return session
+
+    def _establish_name(self) -> str:
+        return {'Pluto': 'default', 'ad9361': 'AD9361', 'ad9364': 'AD9364'}[self.device_class]
+
+    def _close(self, session: DeviceSession) -> None:
+        for method in ('tx_destroy_buffer', 'rx_destroy_buffer'):
+            try:
+                getattr(session.sdr, method)()
+            except Exception as e:
+                print(f"Failed to {method} on {session.key}: {e}")
+        self._sessions.pop(session.key, None)
+        session.sdr = None
+
+DEFAULT_SESSION_POOL = SessionPool()
+atexit.register(DEFAULT_SESSION_POOL.close_all)
@@ -0,0 +1,222 @@
+"""
+Hardware-free stand-in for an ADALM-Pluto.
+
+SimulatedPluto implements the attributes and methods this project uses on
+adi.Pluto / adi.ad9364 so Transmit, ReceiverPlot and the benchmarks can run on
+machines with no radio attached. UsbDriver returns one whenever it is given a
+URI starting with 'sim:'. Options can be appended to the URI, for example
+
+    sim:loopback=1,noise=0.01,attr_latency=0.002,usb_throughput=20e6
+
+Timing models:
+- attr_latency: seconds each public attribute write takes (an IIO round trip)
+- usb_throughput: bytes per second moved by tx() and rx(), None for unlimited
+- realtime: pace rx() and non-cyclic tx() at the configured sample rate
+
+With loopback enabled, rx() returns whatever was last passed to tx() or
+tx_iq16(), converted from DAC units (+-2^14 full scale) to +-1 and scaled by
+the TX gain, with complex Gaussian noise added.
+"""
+
+import threading
+import time
+from typing import Optional
+import numpy as np
+
+from Transmit.sample_format import FULL_SCALE
+
+SIM_URI_PREFIX = 'sim:'
+
+# On the wire the AD936x moves 16-bit I and Q per sample
+BYTES_PER_SAMPLE = 4
+
+def is_sim_uri(uri: Optional[str]) -> bool:
+    return uri is not None and uri.startswith(SIM_URI_PREFIX)
+
+def parse_sim_uri(uri: str) -> dict:
+    '''
+    Turn 'sim:key=value,key=value' into keyword arguments for SimulatedPluto.
+    '''
+    options = {}
+    for item in uri[len(SIM_URI_PREFIX):].split(','):
+        if not item:
+            continue
+        key, _, value = item.partition('=')
+        key = key.strip()
+        value = value.strip()
+        if key in ('loopback', 'realtime'):
+            options[key] = value.lower() not in ('0', 'false', 'no', 'off')
+        elif key == 'serial':
+            options[key] = value
+        elif key == 'seed':
+            options[key] = int(value)
+        elif key in ('noise', 'attr_latency', 'usb_throughput'):
+            options[key] = None if value.lower() == 'none' else float(value)
+        else:
+            raise ValueError(f"Unknown simulator option '{key}' in {uri}")
+    return options
+
+class _SimRxAdc:
+    def __init__(self) -> None:
+        self.kernel_buffers_count = 4
+
+    def set_kernel_buffers_count(self, count: int) -> None:
+        self.kernel_buffers_count = int(count)
+
+class SimulatedPluto:
+    def __init__(self, uri: str=SIM_URI_PREFIX, attr_latency: float=0.0, usb_throughput: Optional[float]=None,
+                 loopback: bool=False, noise: float=1e-3, realtime: bool=True, serial: str='sim-0000',
+                 seed: Optional[int]=None) -> None:
+        self._uri = uri
+        self._attr_latency = attr_latency
+        self._usb_throughput = usb_throughput
+        self._loopback = loopback
+        self._noise = noise
+        self._realtime = realtime
+        self._serial = serial
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+        self._rxadc = _SimRxAdc()
+        self._tx_buffer = None
+        self._tx_position = 0
+        self._rx_deadline = None
+
+        self._attribute_writes = 0
+        self._tx_calls = 0
+        self._rx_calls = 0
+        self._bytes_sent = 0
+        self._bytes_received = 0
+
+        # Power-on defaults, written directly so they do not count as IIO writes
+        defaults = {
+            'tx_lo': int(2.4e9),
+            'rx_lo': int(2.4e9),
+            'sample_rate': int(30.72e6),
+            'tx_rf_bandwidth': int(18e6),
+            'rx_rf_bandwidth': int(18e6),
+            'tx_hardwaregain_chan0': -10,
+            'rx_hardwaregain_chan0': 0,
+            'gain_control_mode_chan0': 'slow_attack',
+            'tx_cyclic_buffer': False,
+            'tx_buffer_size': 1024,
+            'rx_buffer_size': 1024,
+            'tx_enabled_channels': [0],
+            'rx_enabled_channels': [0],
+        }
+        self.__dict__.update(defaults)
+
+    @classmethod
+    def from_uri(cls, uri: str) -> "SimulatedPluto":
+        return cls(uri, **parse_sim_uri(uri))
+
+    def __setattr__(self, name, value) -> None:
+        if not name.startswith('_'):
+            if self._attr_latency:
+                time.sleep(self._attr_latency)
+            object.__setattr__(self, '_attribute_writes', self._attribute_writes + 1)
+        object.__setattr__(self, name, value)
+
+    def __repr__(self) -> str:
+        return f"SimulatedPluto('{self._uri}')"
+
+    @property
+    def uri(self) -> str:
+        return self._uri
+
+    @property
+    def serial(self) -> str:
+        return self._serial
+
+    def tx(self, data_np) -> None:
+        self._submit(np.asarray(data_np))
+
+    def tx_iq16(self, iq: np.ndarray) -> None:
+        # Interleaved int16 I/Q, kept as a complex view for the loopback without rescaling
+        self._submit(iq.reshape(-1, 2).astype(np.float32).view(np.complex64).reshape(-1))
+
+    def rx(self) -> np.ndarray:
+        num_samples = int(self.rx_buffer_size)
+        if self._realtime:
+            self._pace_rx(num_samples)
+        delay = self._usb_delay(num_samples)
+        if delay:
+            time.sleep(delay)
+
+        samples = np.empty(num_samples, dtype=np.complex128)
+        if self._noise:
+            samples.real = self._rng.standard_normal(num_samples)
+            samples.imag = self._rng.standard_normal(num_samples)
+            samples *= self._noise / np.sqrt(2)
+        else:
+            samples[:] = 0
+
+        if self._loopback:
+            with self._lock:
+                tx_buffer = self._tx_buffer
+                position = self._tx_position
+                if tx_buffer is not None and len(tx_buffer):
+                    self._tx_position = (position + num_samples) % len(tx_buffer)
+            if tx_buffer is not None and len(tx_buffer):
+                index = (position + np.arange(num_samples)) % len(tx_buffer)
+                gain = 10 ** (float(self.tx_hardwaregain_chan0) / 20) / FULL_SCALE
+                samples += tx_buffer[index] * gain
+
+        with self._lock:
+            self._rx_calls += 1
+            self._bytes_received += num_samples * BYTES_PER_SAMPLE
+        return samples
+
+    def tx_destroy_buffer(self) -> None:
+        with self._lock:
+            self._tx_buffer = None
+            self._tx_position = 0
+
+    def rx_destroy_buffer(self) -> None:
+        self._rx_deadline = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'attribute_writes': self._attribute_writes,
+                'tx_calls': self._tx_calls,
+                'rx_calls': self._rx_calls,
+                'bytes_sent': self._bytes_sent,
+                'bytes_received': self._bytes_received,
+            }
+
+    # Private #
+    def _submit(self, data: np.ndarray) -> None:
+        with self._lock:
+            if self._tx_buffer is not None and self.tx_cyclic_buffer:
+                raise Exception("TX buffer has been submitted in cyclic mode. "
+                                "To push more data the tx buffer must be destroyed first.")
+            self._tx_buffer = data
+            self._tx_position = 0
+            self._tx_calls += 1
+            self._bytes_sent += len(data) * BYTES_PER_SAMPLE
+
+        delay = self._usb_delay(len(data))
+        if self._realtime and not self.tx_cyclic_buffer:
+            delay = max(delay, len(data) / self.sample_rate)
+        if delay:
+            time.sleep(delay)
+        if not self.tx_cyclic_buffer:
+            # A one-shot buffer has been played out once it returns
+            with self._lock:
+                self._tx_buffer = None
+
+    def _usb_delay(self, num_samples: int) -> float:
+        if not self._usb_throughput:
+            return 0.0
+        return num_samples * BYTES_PER_SAMPLE / self._usb_throughput
+
+    def _pace_rx(self, num_samples: int) -> None:
+        # Absolute deadlines so slow consumers see back-to-back buffers, like a full kernel queue
+        now = time.monotonic()
+        if self._rx_deadline is None or self._rx_deadline < now - 1.0:
+            self._rx_deadline = now
+        self._rx_deadline += num_samples / self.sample_rate
+        wait = self._rx_deadline - now
+        if wait > 0:
+            time.sleep(wait)
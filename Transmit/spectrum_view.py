@@ -0,0 +1,152 @@
+"""
+Live spectrum and waterfall display for a running RxStream.
+
+Acquisition, processing and drawing are decoupled. The RxStream reader thread
+keeps pulling buffers from the device, a processing thread turns them into
+averaged PSD frames, and the matplotlib timer only redraws the most recent
+frame. A slow GUI therefore drops display frames instead of stalling receive.
+
+Each PSD frame is averaged over several FFTs and then reduced to the display
+resolution (peak hold per display bin, so narrow tones are not averaged away)
+before it reaches matplotlib. Redraws use artist blitting so only the trace and
+waterfall image are repainted.
+"""
+
+import threading
+from typing import Optional
+import matplotlib.pyplot as plt
+import numpy as np
+import scipy.fft
+from matplotlib.animation import FuncAnimation
+
+from Transmit.rx_stream import RxStream
+
+DISPLAY_BINS = 512
+
+class SpectrumView:
+    def __init__(self, stream: RxStream, sample_rate: float, center_freq: float=0, fft_size: int=1024,
+                 display_bins: Optional[int]=None, average: int=8, waterfall_rows: int=200,
+                 db_range: tuple=(-120, 0), fps: int=30) -> None:
+        # Never more bins on screen than the FFT has
+        display_bins = min(DISPLAY_BINS if display_bins is None else display_bins, fft_size)
+        if fft_size % display_bins:
+            raise ValueError(f"display_bins ({display_bins}) must evenly divide fft_size ({fft_size})")
+        self.stream = stream
+        self.sample_rate = float(sample_rate)
+        self.center_freq = float(center_freq)
+        self.fft_size = int(fft_size)
+        self.display_bins = int(display_bins)
+        self.average = int(average)
+        self.waterfall_rows = int(waterfall_rows)
+        self.db_range = db_range
+        self.fps = fps
+
+        # Window and scaling are computed once and reused for every frame
+        self._window = np.hanning(self.fft_size).astype(np.float32)
+        self._scale = 1.0 / (self.sample_rate * np.sum(self._window ** 2))
+        self._freq_axis = self.center_freq + scipy.fft.fftshift(scipy.fft.fftfreq(self.display_bins, 1 / self.sample_rate))
+
+        self._accum = np.zeros(self.fft_size, dtype=np.float64)
+        self._accum_count = 0
+        self._latest = np.full(self.display_bins, self.db_range[0], dtype=np.float64)
+        self._waterfall = np.full((self.waterfall_rows, self.display_bins), self.db_range[0], dtype=np.float64)
+        self._waterfall_display = self._waterfall.copy()
+        self._waterfall_row = 0
+        self._frame_lock = threading.Lock()
+        self._new_frame = False
+
+        self.frames_computed = 0
+        self.frames_drawn = 0
+        self._thread = None
+        self._running = False
+
+    def start(self) -> None:
+        self.stream.start()
+        self._running = True
+        self._thread = threading.Thread(target=self._process, name="SpectrumView", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        self.stream.stop()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def show(self) -> None:
+        '''
+        Open the live view and block until the window is closed.
+        '''
+        self.start()
+        try:
+            fig, (ax_psd, ax_wf) = plt.subplots(2, 1, sharex=True, figsize=(10, 8))
+            freqs_mhz = self._freq_axis / 1e6
+            (self._line,) = ax_psd.plot(freqs_mhz, self._latest, animated=True)
+            ax_psd.set_ylim(*self.db_range)
+            ax_psd.set_ylabel('PSD (dB/Hz)')
+            ax_psd.set_title('Received Spectrum')
+            ax_psd.grid(True)
+
+            self._image = ax_wf.imshow(self._waterfall_display, aspect='auto', origin='upper', animated=True,
+                                       extent=(freqs_mhz[0], freqs_mhz[-1], self.waterfall_rows, 0),
+                                       vmin=self.db_range[0], vmax=self.db_range[1], cmap='viridis')
+            ax_wf.set_xlabel('Frequency (MHz)')
+            ax_wf.set_ylabel('Frame')
+
+            self._animation = FuncAnimation(fig, self._draw, interval=1000 / self.fps, blit=True,
+                                            cache_frame_data=False)
+            plt.show()
+        finally:
+            self.stop()
+
+    def latest_frame(self) -> np.ndarray:
+        with self._frame_lock:
+            return self._latest.copy()
+
+    # Private #
+    def _process(self) -> None:
+        for samples in self.stream:
+            if not self._running:
+                break
+            num_ffts = len(samples) // self.fft_size
+            if num_ffts == 0:
+                continue
+
+            frames = samples[:num_ffts * self.fft_size].reshape(num_ffts, self.fft_size) * self._window
+            spectrum = scipy.fft.fft(frames, axis=1, overwrite_x=True)
+            power = spectrum.real ** 2
+            power += spectrum.imag ** 2
+            self._accum += power.sum(axis=0)
+            self._accum_count += num_ffts
+
+            if self._accum_count >= self.average:
+                self._publish()
+
+    def _publish(self) -> None:
+        psd = scipy.fft.fftshift(self._accum) * (self._scale / self._accum_count)
+        self._accum[:] = 0
+        self._accum_count = 0
+
+        # Peak hold down to the display resolution before converting to dB
+        reduced = psd.reshape(self.display_bins, -1).max(axis=1)
+        frame = 10 * np.log10(reduced + 1e-20)
+
+        with self._frame_lock:
+            self._latest[:] = frame
+            self._waterfall[self._waterfall_row] = frame
+            self._waterfall_row = (self._waterfall_row + 1) % self.waterfall_rows
+            self._new_frame = True
+            self.frames_computed += 1
+
+    def _draw(self, _frame) -> tuple:
+        with self._frame_lock:
+            if self._new_frame:
+                self._line.set_ydata(self._latest)
+                # Newest row on top, copied into the display buffer without reallocating
+                row = self._waterfall_row
+                self._waterfall_display[:row] = self._waterfall[:row][::-1]
+                self._waterfall_display[row:] = self._waterfall[row:][::-1]
+                self._image.set_data(self._waterfall_display)
+                self._new_frame = False
+                self.frames_drawn += 1
+        return self._line, self._image
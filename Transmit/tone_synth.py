@@ -0,0 +1,105 @@
+"""
+Minimal-period synthesis of cyclic tones.
+
+With tx_cyclic_buffer enabled the Pluto repeats the uploaded buffer forever, so
+a tone only needs to contain a whole number of cycles to wrap without a phase
+jump. A tone at `freq` sampled at `sample_rate` advances freq/sample_rate cycles
+per sample. Reducing that ratio to p/q gives a buffer of q samples holding
+exactly p cycles, which is usually a few kilobytes instead of the one second
+of samples the Transmit methods used to upload.
+
+When the exact period is longer than the device allows, the closest length in
+range is picked and the tone is snapped to the nearest frequency that does wrap
+cleanly on that length. The resulting frequency error is reported.
+"""
+
+from fractions import Fraction
+from math import gcd
+from typing import Tuple
+import numpy as np
+
+# Buffer constraints for the AD936x TX DMA. Buffers are moved in bursts, so
+# lengths are kept to a multiple of 4 samples, and very short cyclic buffers
+# are padded up to avoid underrunning the DMA at high sample rates.
+TX_BUFFER_MIN = 1024
+TX_BUFFER_MAX = 2**20
+TX_BUFFER_MULTIPLE = 4
+
+# Frequencies are resolved to 1 mHz before finding the period
+FREQ_RESOLUTION = 1000
+
+def plan_cyclic_tone(freq: float, sample_rate: float, min_samples: int=TX_BUFFER_MIN,
+                     max_samples: int=TX_BUFFER_MAX, multiple: int=TX_BUFFER_MULTIPLE,
+                     max_error_hz: float=1.0) -> Tuple[int, int, float]:
+    '''
+    Find the shortest buffer length that holds a whole number of cycles of the tone.
+
+    Returns (num_samples, cycles, freq_error_hz). freq_error_hz is zero when an exact
+    period fits within the buffer constraints, otherwise it is the offset between the
+    requested tone and the one that wraps on num_samples.
+    '''
+    if min_samples > max_samples:
+        raise ValueError(f"min_samples ({min_samples}) is larger than max_samples ({max_samples})")
+
+    ratio = Fraction(freq).limit_denominator(FREQ_RESOLUTION) / Fraction(sample_rate).limit_denominator(FREQ_RESOLUTION)
+    ratio -= ratio.numerator // ratio.denominator  # Only the offset within one sample rate matters
+    period = ratio.denominator
+
+    # Smallest multiple of the period that also satisfies the length granularity
+    step = period * multiple // gcd(period, multiple)
+    num_samples = step * max(1, -(-min_samples // step))
+    if num_samples <= max_samples:
+        cycles = ratio.numerator * (num_samples // period)
+        return num_samples, cycles, 0.0
+
+    # No exact period in range, take the shortest length within the error bound
+    first = -(-min_samples // multiple) * multiple
+    lengths = np.arange(first, max_samples + 1, multiple, dtype=np.int64)
+    if lengths.size == 0:
+        raise ValueError("No buffer length satisfies the TX buffer constraints")
+    target = float(ratio)
+    cycles = np.round(target * lengths)
+    errors = np.abs(cycles / lengths - target) * sample_rate
+
+    within = np.flatnonzero(errors <= max_error_hz)
+    best = within[0] if within.size else int(np.argmin(errors))
+    return int(lengths[best]), int(cycles[best]), float(errors[best])
+
+def synthesize_cyclic_tone(num_samples: int, cycles: int, dtype=np.complex128) -> np.ndarray:
+    '''
+    Build a tone of exactly `cycles` periods over `num_samples`.
+
+    The phase index is reduced modulo num_samples in integer arithmetic so the last
+    sample lines up with the first regardless of the buffer length.
+    '''
+    out = np.empty(num_samples, dtype=dtype)
+    render_cyclic_tone(0, num_samples, cycles, out)
+    return out
+
+def render_cyclic_tone(start: int, num_samples: int, cycles: int, out: np.ndarray) -> None:
+    '''
+    Samples start..start+len(out) of synthesize_cyclic_tone(num_samples, cycles), written in place.
+    '''
+    n = np.arange(start, start + len(out), dtype=np.int64)
+    n *= cycles % num_samples
+    n %= num_samples
+    angle = n.astype(np.float64)
+    angle *= 2 * np.pi / num_samples
+    np.cos(angle, out=out.real, casting='same_kind')
+    np.sin(angle, out=out.imag, casting='same_kind')
+
+def render_tone(start: int, cycles_per_sample: float, out: np.ndarray, angle: np.ndarray) -> None:
+    '''
+    Samples start..start+len(out) of exp(2j*pi*cycles_per_sample*n), written in place.
+
+    The phase is reduced to one cycle before the cos/sin, so late samples of a long
+    buffer are as accurate as early ones. Each sample depends only on its index, which
+    is what lets chunks be rendered in any order or in parallel with identical results.
+    '''
+    angle = angle[:len(out)]
+    angle[:] = np.arange(start, start + len(out), dtype=np.float64)
+    angle *= cycles_per_sample
+    np.remainder(angle, 1.0, out=angle)
+    angle *= 2 * np.pi
+    np.cos(angle, out=out.real, casting='same_kind')
+    np.sin(angle, out=out.imag, casting='same_kind')
@@ -1,27 +1,355 @@
-import adi
-import numpy as np
-import matplotlib.pyplot as plt
-import time
+"""
+Full-duplex TX/RX engine.
+
+A worker process owns the radio. Inside it one thread feeds TX and another
+drains RX; libiio releases the GIL while it moves data, so the two run side by
+side. Samples cross the process boundary through SharedRing buffers in
+multiprocessing.shared_memory rather than being pickled, and the parent
+process keeps its own GIL for heavy RX processing that would otherwise stall
+the TX feed.
+
+    engine = FullDuplexEngine('usb:1.7.5', tx_lo=1090e6, rx_lo=1090e6)
+    engine.start()
+    engine.write_tx(chunk)                 # non-cyclic streaming TX
+    for samples in engine.rx_buffers():    # zero-copy views into shared memory
+        ...
+    engine.stop()
+    print(engine.stats())
+
+The device is opened in the worker by URI since an adi object cannot be shared
+across processes. Pass tx_waveform to load a cyclic buffer once instead of
+streaming TX chunks.
+"""
+
 import multiprocessing
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Iterator, Optional
+import numpy as np
 
 from Transmit.driver_config import UsbDriver
-from Transmit.tx_single_tone import Transmit
-from Transmit.receiver_display import ReceiverPlot
-
-class SDRSession:
-    def __init__(self):
-        session = UsbDriver()
-        self.sdr = session.establish_AD9364_usb_connection()
-        
-        transmitter_process = multiprocessing.Process(target=self.start_transmitter, args=(self.sdr, 1090e6))
- 
-        time.sleep(1)
-        reception = ReceiverPlot(1090e6, 20e6, self.sdr) 
-        reception.plot_receiver()
-    
-    def start_transmitter(self, freq):
-        transmission = Transmit(self.sdr)
-        transmission.transmit_single_tone(freq)
 
+# Header fields of a SharedRing, each an int64 written by exactly one side
+_WRITE_COUNT = 0
+_READ_COUNT = 1
+_DROPPED = 2
+_UNDERRUNS = 3
+_HEADER_FIELDS = 8
+
+class SharedRing:
+    """
+    Single-producer single-consumer ring of fixed-size sample slots in shared memory.
+
+    The producer fills a slot and then advances the write count, the consumer reads
+    a slot and then advances the read count. Either side can attach from another
+    process with SharedRing.attach(ring.spec()).
+    """
+    def __init__(self, num_slots: int, slot_size: int, dtype=np.complex64, name: Optional[str]=None) -> None:
+        self.num_slots = int(num_slots)
+        self.slot_size = int(slot_size)
+        self.dtype = np.dtype(dtype)
+        header_bytes = 8 * (_HEADER_FIELDS + self.num_slots)
+        data_bytes = self.num_slots * self.slot_size * self.dtype.itemsize
+        self._owner = name is None
+        if self._owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=header_bytes + data_bytes)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+
+        self.header = np.ndarray(_HEADER_FIELDS, dtype=np.int64, buffer=self._shm.buf)
+        self.lengths = np.ndarray(self.num_slots, dtype=np.int64, buffer=self._shm.buf, offset=8 * _HEADER_FIELDS)
+        self.slots = np.ndarray((self.num_slots, self.slot_size), dtype=self.dtype, buffer=self._shm.buf,
+                                offset=header_bytes)
+        if self._owner:
+            self.header[:] = 0
+            self.lengths[:] = 0
+
+    @classmethod
+    def attach(cls, spec: tuple) -> "SharedRing":
+        name, num_slots, slot_size, dtype = spec
+        return cls(num_slots, slot_size, dtype, name=name)
+
+    def spec(self) -> tuple:
+        return (self._shm.name, self.num_slots, self.slot_size, self.dtype.str)
+
+    def queued(self) -> int:
+        return int(self.header[_WRITE_COUNT] - self.header[_READ_COUNT])
+
+    # Producer side
+    def acquire_write(self) -> Optional[np.ndarray]:
+        if self.queued() >= self.num_slots:
+            return None
+        return self.slots[self.header[_WRITE_COUNT] % self.num_slots]
+
+    def commit_write(self, length: int) -> None:
+        self.lengths[self.header[_WRITE_COUNT] % self.num_slots] = length
+        self.header[_WRITE_COUNT] += 1
+
+    def push(self, samples: np.ndarray) -> bool:
+        slot = self.acquire_write()
+        if slot is None:
+            self.header[_DROPPED] += 1
+            return False
+        length = min(len(samples), self.slot_size)
+        slot[:length] = samples[:length]
+        self.commit_write(length)
+        return True
+
+    # Consumer side
+    def acquire_read(self) -> Optional[np.ndarray]:
+        if self.queued() <= 0:
+            return None
+        index = self.header[_READ_COUNT] % self.num_slots
+        return self.slots[index, :self.lengths[index]]
+
+    def release_read(self) -> None:
+        self.header[_READ_COUNT] += 1
+
+    def close(self) -> None:
+        # Drop our views before closing the mapping
+        self.header = self.lengths = self.slots = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+def _device_worker(uri: Optional[str], settings: dict, tx_spec: tuple, rx_spec: tuple, tx_waveform,
+                   stop_event, ready_event, error_queue) -> None:
+    # Any failure is sent back to the parent and stops the engine, so nothing waits on a dead worker
+    def fail(error: BaseException) -> None:
+        error_queue.put(f"{type(error).__name__}: {error}")
+        stop_event.set()
+
+    tx_ring = rx_ring = sdr = None
+    try:
+        sdr = UsbDriver(uri).establish_AD9364_usb_connection()
+        for name, value in settings.items():
+            setattr(sdr, name, value)
+
+        tx_ring = SharedRing.attach(tx_spec)
+        rx_ring = SharedRing.attach(rx_spec)
+        if tx_waveform is not None:
+            sdr.tx_cyclic_buffer = True
+            sdr.tx(tx_waveform)
+        else:
+            sdr.tx_cyclic_buffer = False
+
+        def feed_tx() -> None:
+            starved = False
+            try:
+                while not stop_event.is_set():
+                    samples = tx_ring.acquire_read()
+                    if samples is None:
+                        if tx_ring.header[_WRITE_COUNT] and not starved:
+                            # Count each stretch of starvation once, not every poll
+                            tx_ring.header[_UNDERRUNS] += 1
+                            starved = True
+                        time.sleep(0.0005)
+                        continue
+                    starved = False
+                    sdr.tx(samples)
+                    tx_ring.release_read()
+            except Exception as error:
+                fail(error)
+
+        def drain_rx() -> None:
+            try:
+                while not stop_event.is_set():
+                    rx_ring.push(sdr.rx())
+            except Exception as error:
+                fail(error)
+
+        workers = [threading.Thread(target=drain_rx, name="rx_drain", daemon=True)]
+        if tx_waveform is None:
+            workers.append(threading.Thread(target=feed_tx, name="tx_feed", daemon=True))
+        for worker in workers:
+            worker.start()
+        ready_event.set()
+
+        stop_event.wait()
+        for worker in workers:
+            worker.join(timeout=5)
+    except Exception as error:
+        fail(error)
+    finally:
+        if sdr is not None:
+            try:
+                sdr.tx_destroy_buffer()
+            except Exception:
+                pass
+        if tx_ring is not None:
+            tx_ring.close()
+        if rx_ring is not None:
+            rx_ring.close()
+
+class FullDuplexEngine:
+    def __init__(self, uri: Optional[str]=None, tx_lo: float=1090e6, rx_lo: float=1090e6, sample_rate: float=10e6,
+                 rf_bandwidth: float=20e6, tx_gain: float=-10, rx_buffer_size: int=2**16, tx_chunk_size: int=2**16,
+                 ring_slots: int=32, tx_waveform: Optional[np.ndarray]=None) -> None:
+        self.uri = uri
+        self.settings = {
+            'sample_rate': int(sample_rate),
+            'tx_rf_bandwidth': int(rf_bandwidth),
+            'rx_rf_bandwidth': int(rf_bandwidth),
+            'tx_lo': int(tx_lo),
+            'rx_lo': int(rx_lo),
+            'tx_hardwaregain_chan0': tx_gain,
+            'rx_buffer_size': int(rx_buffer_size),
+        }
+        self.rx_buffer_size = int(rx_buffer_size)
+        self.tx_chunk_size = int(tx_chunk_size)
+        self.ring_slots = int(ring_slots)
+        self.tx_waveform = tx_waveform
+
+        self._mp = multiprocessing.get_context('spawn')
+        self._process = None
+        self._stop_event = None
+        self._error_queue = None
+        self._error = None
+        self.tx_ring = None
+        self.rx_ring = None
+        self._rx_lent = False
+        self._start_time = None
+        self._stop_time = None
+        self._final_stats = {}
+
+    def __enter__(self) -> "FullDuplexEngine":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def start(self, timeout: float=30.0) -> None:
+        if self._process is not None:
+            return
+        self.tx_ring = SharedRing(self.ring_slots, self.tx_chunk_size)
+        self.rx_ring = SharedRing(self.ring_slots, self.rx_buffer_size)
+        self._stop_event = self._mp.Event()
+        self._error_queue = self._mp.Queue()
+        self._error = None
+        ready_event = self._mp.Event()
+        self._process = self._mp.Process(
+            target=_device_worker, name="pluto_duplex",
+            args=(self.uri, self.settings, self.tx_ring.spec(), self.rx_ring.spec(), self.tx_waveform,
+                  self._stop_event, ready_event, self._error_queue))
+        self._process.start()
+        # Poll so a worker that dies during setup is reported at once, not after the timeout
+        deadline = time.monotonic() + timeout
+        while not ready_event.wait(0.05):
+            error = self._worker_error()
+            if error is None and not self._process.is_alive():
+                self._process.join()
+                error = self._worker_error()
+            if error is not None or not self._process.is_alive() or time.monotonic() >= deadline:
+                self.stop()
+                raise RuntimeError(f"Full-duplex worker did not come up: "
+                                   f"{error or 'check the device connection'}")
+        self._start_time = time.monotonic()
+        self._stop_time = None
+
+    def stop(self, timeout: float=10.0) -> None:
+        if self._process is None:
+            return
+        self._stop_event.set()
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+        self._process = None
+        self._rx_lent = False
+        self._stop_time = time.monotonic()
+        self._final_stats = self._ring_stats()
+        self._worker_error()
+        self._error_queue.close()
+        self._error_queue = None
+        self.tx_ring.close()
+        self.rx_ring.close()
+        self.tx_ring = self.rx_ring = None
+
+    def write_tx(self, samples: np.ndarray, timeout: Optional[float]=None) -> bool:
+        '''
+        Queue one TX chunk, waiting up to `timeout` for a free slot. Chunks shorter than
+        tx_chunk_size are zero padded since the device buffer length is fixed.
+        '''
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            slot = self.tx_ring.acquire_write()
+            if slot is not None:
+                break
+            error = self._worker_error()
+            if self._process is None or not self._process.is_alive() or error is not None:
+                raise RuntimeError("Full-duplex worker is not running" + (f": {error}" if error else ""))
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.0005)
+        length = min(len(samples), self.tx_chunk_size)
+        slot[:length] = samples[:length]
+        slot[length:] = 0
+        self.tx_ring.commit_write(self.tx_chunk_size)
+        return True
+
+    def read_rx(self, timeout: Optional[float]=None) -> Optional[np.ndarray]:
+        '''
+        View of the next RX buffer in shared memory, valid until the next read_rx() call.
+        Returns None if nothing arrived within `timeout`.
+        '''
+        if self._rx_lent:
+            self.rx_ring.release_read()
+            self._rx_lent = False
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            samples = self.rx_ring.acquire_read()
+            if samples is not None:
+                self._rx_lent = True
+                return samples
+            error = self._worker_error()
+            if self._process is None or not self._process.is_alive() or error is not None:
+                raise RuntimeError("Full-duplex worker is not running" + (f": {error}" if error else ""))
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(0.0005)
+
+    def rx_buffers(self) -> Iterator[np.ndarray]:
+        while self._process is not None:
+            try:
+                samples = self.read_rx(timeout=0.5)
+            except RuntimeError:
+                if self._process is None:
+                    return  # Stopped from another thread
+                raise
+            if samples is not None:
+                yield samples
+
+    def stats(self) -> dict:
+        if self.tx_ring is None:
+            return self._final_stats
+        return self._ring_stats()
 
+    # Private #
+    def _worker_error(self) -> Optional[str]:
+        # First error the worker reported, kept once read
+        if self._error is None and self._error_queue is not None:
+            try:
+                self._error = self._error_queue.get_nowait()
+            except queue.Empty:
+                pass
+        return self._error
 
+    def _ring_stats(self) -> dict:
+        end = self._stop_time if self._stop_time is not None else time.monotonic()
+        elapsed = end - self._start_time if self._start_time is not None else 0.0
+        rx_buffers = int(self.rx_ring.header[_WRITE_COUNT])
+        tx_buffers = int(self.tx_ring.header[_READ_COUNT])
+        return {
+            'elapsed_s': elapsed,
+            'tx_buffers_sent': tx_buffers,
+            'tx_queued': self.tx_ring.queued(),
+            'tx_underruns': int(self.tx_ring.header[_UNDERRUNS]),
+            'tx_sample_rate': tx_buffers * self.tx_chunk_size / elapsed if elapsed else 0.0,
+            'rx_buffers_received': rx_buffers,
+            'rx_queued': self.rx_ring.queued(),
+            'rx_overruns': int(self.rx_ring.header[_DROPPED]),
+            'rx_sample_rate': rx_buffers * self.rx_buffer_size / elapsed if elapsed else 0.0,
+        }
@@ -1,71 +1,255 @@
+from __future__ import annotations
+
 import time
-import adi
-from typing import Optional
+import threading
+from collections import OrderedDict
+from typing import Callable, Iterable, Iterator, Optional, Sequence
 import numpy as np
-from scipy.signal import chirp
-
 
-from Transmit.driver_config import UsbDriver # type: ignore
+try:
+    import adi
+except ImportError:
+    adi = None
+
+
+from Transmit.device_state import DeviceConfig
+from Transmit.instrumentation import instrument, span
+from Transmit.recording import CaptureReader
+from Transmit.sample_format import (ENCODE_CHUNK, FULL_SCALE, SAMPLE_FORMATS, allocate, encode, sample_slice,
+                                    tx_iq16, validate_full_scale)
+from Transmit.scheduler import TxScheduler, TxStep
+from Transmit.session_pool import DEFAULT_SESSION_POOL
+from Transmit.parallel_synth import DEFAULT_SYNTH_POOL, SynthesisPool
+from Transmit.tone_synth import plan_cyclic_tone, render_cyclic_tone, render_tone
+from Transmit.tx_stream import TxStream
+from Transmit.waveform_builder import LinearChirp, WaveformBuilder
+
+# Lowest LO the AD9364 tunes to
+TX_LO_MIN = int(70e6)
+
+class WaveformCache:
+    """
+    Bounded LRU cache of ready-to-send transmit buffers.
+
+    Entries are keyed by (kind, frequency, sample rate, length, dtype) so re-tuning
+    to a waveform that was already synthesized costs a dictionary lookup. The
+    least recently used buffers are evicted once the byte budget is exceeded.
+    Cached buffers are marked read-only since they are shared between callers.
+    """
+    def __init__(self, max_bytes: int=512 * 2**20) -> None:
+        self.max_bytes = int(max_bytes)
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(kind: str, freq: float, sample_rate: float, num_samples: int, dtype=np.complex128) -> tuple:
+        return (str(kind), float(freq), float(sample_rate), int(num_samples), np.dtype(dtype).str)
+
+    def get(self, key: tuple) -> Optional[np.ndarray]:
+        with self._lock:
+            buffer = self._entries.get(key)
+            if buffer is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return buffer
+
+    def put(self, key: tuple, buffer: np.ndarray) -> np.ndarray:
+        buffer.setflags(write=False)
+        if buffer.nbytes > self.max_bytes:
+            # Larger than the whole budget, hand it back without caching
+            return buffer
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old.nbytes
+            self._entries[key] = buffer
+            self.current_bytes += buffer.nbytes
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+                self.evictions += 1
+        return buffer
+
+    def get_or_create(self, kind: str, freq: float, sample_rate: float, num_samples: int,
+                      builder: Callable[[], np.ndarray], dtype=np.complex128) -> np.ndarray:
+        key = self.make_key(kind, freq, sample_rate, num_samples, dtype)
+        buffer = self.get(key)
+        if buffer is None:
+            buffer = self.put(key, np.asarray(builder(), dtype=dtype))
+        return buffer
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+# Shared by every Transmit instance in the process unless one is passed in
+DEFAULT_WAVEFORM_CACHE = WaveformCache()
 
 class Transmit:
-    def __init__(self, sdr: adi.Pluto=None, sample_rate: int=10e6) -> None:
+    def __init__(self, sdr: adi.Pluto=None, sample_rate: int=10e6, waveform_cache: WaveformCache=None, uri: Optional[str]=None,
+                 sample_format: str='int16', full_scale: float=FULL_SCALE, synth_pool: SynthesisPool=None) -> None:
+        self._pooled = sdr is None
         if sdr is None:
-            session = UsbDriver()
-            self.sdr = session.establish_AD9364_usb_connection()
-        else:
-            self.sdr = sdr
+            sdr = DEFAULT_SESSION_POOL.acquire('tx', self, uri=uri)
+        # Device calls go through the shared metrics proxy, a pass-through while metrics are disabled
+        self.sdr = instrument(sdr)
  
         self.sample_rate = sample_rate
+        if sample_format not in SAMPLE_FORMATS:
+            raise ValueError(f"Unknown sample format '{sample_format}', expected one of {list(SAMPLE_FORMATS)}")
+        self.sample_format = sample_format
+        self.full_scale = validate_full_scale(full_scale)
+        self.waveform_cache = DEFAULT_WAVEFORM_CACHE if waveform_cache is None else waveform_cache
+        self.synth_pool = DEFAULT_SYNTH_POOL if synth_pool is None else synth_pool
+        self.config = DeviceConfig.for_device(self.sdr)
+        self.scheduler = TxScheduler(self)
+        self._stop_event = threading.Event()
+
+    def apply_profile(self, profile, **overrides) -> dict:
+        """
+        Apply a named profile (see device_state.PROFILES) or a dict of attributes, writing only what changed.
+        """
+        result = self.config.apply(profile, **overrides)
+        print(f"Profile applied: {len(result['written'])} writes issued, {len(result['skipped'])} skipped")
+        return result
+
+    def stop(self) -> None:
+        """
+        Ask a running sweep or stream to finish. Safe to call from another thread: only the thread
+        pushing buffers touches the device, and it takes the transmitter off air as it exits.
+        """
+        self._stop_event.set()
+        self.scheduler.stop()
+
+    def __enter__(self) -> "Transmit":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Give TX ownership of a pooled device back. The device stays open for reuse.
+        """
+        if self._pooled:
+            DEFAULT_SESSION_POOL.release(self)
+            self._pooled = False
+
+    def stream_chunks(self, chunks: Iterable[np.ndarray], chunk_size: int=2**16, num_buffers: int=3) -> dict:
+        """
+        Non-cyclic transmit of complex chunks in +-1, encoding chunk N+1 while chunk N is sent.
+        Runs until the chunks run out or stop() is called, and returns underrun and throughput stats.
+        """
+        self._stop_event.clear()
+        stats = TxStream(self, chunk_size, num_buffers).run(chunks, self._stop_event)
+        print(f"Streamed {stats['samples_sent']} samples at {stats['throughput_sps']/1e6:.2f} MS/s, "
+              f"{stats['underruns']} underruns")
+        return stats
+
+    # Private #
+    def _get_waveform(self, kind: str, freq: float, num_samples: int, build: Callable[[], np.ndarray]) -> np.ndarray:
+        def timed_build() -> np.ndarray:
+            with span(self.sdr, 'synthesis'):
+                return build()
+        # The full scale is part of what was synthesized, so it is part of the cache key
+        return self.waveform_cache.get_or_create(f"{kind}@{self.full_scale:g}", freq, self.sample_rate, num_samples,
+                                                 timed_build, dtype=SAMPLE_FORMATS[self.sample_format])
+
+    def _encode(self, samples: np.ndarray, out: Optional[np.ndarray]=None) -> np.ndarray:
+        # Complex samples in +-1 to the device sample format, scaled to full_scale
+        out, clipped = encode(samples, out, self.sample_format, self.full_scale)
+        if clipped:
+            print(f"Warning: {clipped} I/Q components clipped at full scale")
+        return out
+
+    def _send(self, buffer: np.ndarray) -> None:
+        if buffer.dtype == np.int16:
+            tx_iq16(self.sdr, buffer)
+        else:
+            self.sdr.tx(buffer)
+
+    def _synthesize(self, num_samples: int, pieces: Sequence[tuple], render: Callable[[tuple, np.ndarray], None]) -> np.ndarray:
+        # Each piece (start, count, ...) is rendered and encoded into its slice of one output on the synthesis pool
+        out = allocate(num_samples, self.sample_format)
+        pool = self.synth_pool
+        def work(piece: tuple) -> int:
+            start, count = piece[0], piece[1]
+            chunk = pool.scratch('chunk', count, np.complex128)
+            render(piece, chunk)
+            return encode(chunk, sample_slice(out, start, start + count), self.sample_format, self.full_scale)[1]
+        clipped = sum(pool.map(work, pieces))
+        if clipped:
+            print(f"Warning: {clipped} I/Q components clipped at full scale")
+        return out
+
+    def _render_tone(self, freq: float, num_samples: int) -> np.ndarray:
+        pieces = [(start, min(ENCODE_CHUNK, num_samples - start)) for start in range(0, num_samples, ENCODE_CHUNK)]
+        cycles_per_sample = freq / self.sample_rate
+        def render(piece: tuple, chunk: np.ndarray) -> None:
+            render_tone(piece[0], cycles_per_sample, chunk, self.synth_pool.scratch('angle', len(chunk), np.float64))
+        return self._synthesize(num_samples, pieces, render)
+
+    def _tone(self, freq: float, num_samples: int) -> np.ndarray:
+        return self._get_waveform('tone', freq, num_samples, lambda: self._render_tone(freq, num_samples))
+
+    def _build(self, builder: WaveformBuilder) -> np.ndarray:
+        # Pieces carry their planned starting phase, so they render in any order
+        pieces = [(piece[4], piece[2], piece) for piece in builder.plan()]
+        def render(piece: tuple, chunk: np.ndarray) -> None:
+            builder.render(piece[2], chunk, self.synth_pool.scratch('phase', len(chunk), np.float64))
+        return self._synthesize(builder.num_samples, pieces, render)
+
+    def _cyclic_tone(self, freq: float) -> np.ndarray:
+        # Shortest buffer that wraps phase-continuously, for use with tx_cyclic_buffer
+        num_samples, cycles, freq_error = plan_cyclic_tone(freq, self.sample_rate)
+        if freq_error:
+            print(f"No exact period for {freq/1e6} MHz, tone is offset by {freq_error:.3f} Hz")
+        def build() -> np.ndarray:
+            pieces = [(start, min(ENCODE_CHUNK, num_samples - start)) for start in range(0, num_samples, ENCODE_CHUNK)]
+            return self._synthesize(num_samples, pieces,
+                                    lambda piece, chunk: render_cyclic_tone(piece[0], num_samples, cycles, chunk))
+        return self._get_waveform('cyclic_tone', freq, num_samples, build)
     
     def power_sweep_single_tone(self, freq: int, start_power: int=-50, stop_power: int=10, step_power:int=10, step_duration: int=5) -> None:
         '''
         Generate transmit power sweep from -80 to 0 dB
         '''
-        # Configure the transmitter parameters for power sweep
-        self.sdr.tx_lo = int(freq)
-        self.sdr.tx_cyclic_buffer = False
-        self.sdr.tx_rf_bandwidth = int(10e6)  # Set the transmit bandwidth to 20 MHz
-        self.sdr.tx_sample_rate = int(self.sample_rate)
-
-        # Generate the tone
-        num_samples = int(self.sample_rate * 1)  # Generate 1 second worth of samples
-        t = np.arange(num_samples) / self.sample_rate
-        tone = np.exp(2j * np.pi * freq * t)
-        #print(f"Transmitting a {freq/1e6} MHz tone indefinitely")
-
-        while True:
-            for tx_gain in range(start_power, stop_power, step_power):
-                #print(f"tx_gain = {tx_gain}")
-                self.sdr.tx_hardwaregain_chan0 = tx_gain # Increase to increase tx power, valid range is -80 to 0 dB
-                self.sdr.tx(tone)
-                print(f"TX Gain: {tx_gain} dB for {step_duration} seconds")
-                time.sleep(step_duration)
+        # One step per gain level, repeated until stopped. The tone only uploads once,
+        # later steps just change the gain (valid range is -80 to 0 dB)
+        steps = [TxStep(freq, tx_gain, step_duration, bandwidth=10e6)
+                 for tx_gain in range(start_power, stop_power, step_power)]
+        self.scheduler.run(steps, repeat=None)
 
     def freq_sweep_constant_gain(self, gain: int, start_freq: int=1050e6, stop_freq: int=1650e6, step_freq:int=50e6, step_duration: int=5) -> None:
         """
         TX sweeping frequency at single power level using ADALM-Pluto.
         """
 
-        # Configure the transmitter parameters
-        self.sdr.tx_cyclic_buffer = True
-        self.sdr.tx_rf_bandwidth = int(20e6)  # Set the transmit bandwidth to 20 MHz
-        self.sdr.tx_sample_rate = int(self.sample_rate)
-        self.sdr.tx_hardwaregain_chan0 = gain # Increase to increase tx power, valid range is -90 to 0 dB
-
-        num_samples = int(self.sample_rate * 1)  # Generate 1 second worth of samples
-        t = np.arange(num_samples) / self.sample_rate
-
-        for tx_freq in range(int(start_freq), int(stop_freq), int(step_freq)):
-            # Generate the tone from the frequency
-            tone = np.exp(2j * np.pi * int(tx_freq) * t)
-    
-            # Transmit the tone for the specified duration
-            print(f"Transmitting a {tx_freq/1e6} MHz tone for {step_duration} seconds")
-            self.sdr.tx_lo = int(tx_freq)
-            self.sdr.tx_destroy_buffer()
-            #time.sleep(1)
-            self.sdr.tx(tone)
-            time.sleep(step_duration)
+        # One step per frequency at 20 MHz bandwidth. Gain valid range is -90 to 0 dB
+        steps = [TxStep(tx_freq, gain, step_duration, bandwidth=20e6)
+                 for tx_freq in range(int(start_freq), int(stop_freq), int(step_freq))]
+        self.scheduler.run(steps)
 
     def jam_spectrum(self, bandwidth: int=20e6, center_freq: int=1325e6, gain: int=-10) -> None:
         '''
@@ -74,22 +258,26 @@ class Transmit:
         as wide as expected. TO-DO: Convolve mutliple frequencies
         '''
         # Configure the transmitter parameters
-        self.sdr.tx_lo = int(center_freq)
-        self.sdr.tx_cyclic_buffer = True
-        self.sdr.tx_rf_bandwidth = int(bandwidth)  # Set the transmit bandwidth to 20 MHz
-        self.sdr.tx_sample_rate = int(self.sample_rate)
-        self.sdr.tx_hardwaregain_chan0 = gain # Increase to increase tx power, valid range is -90 to 0 dB
+        self.config.apply({
+            'tx_lo': int(center_freq),
+            'tx_cyclic_buffer': True,
+            'tx_rf_bandwidth': int(bandwidth),
+            'sample_rate': int(self.sample_rate),
+            'tx_hardwaregain_chan0': gain,  # Increase to increase tx power, valid range is -90 to 0 dB
+        })
 
         num_samples = int(self.sample_rate * 1)  # Generate 1 second worth of samples
-        t = np.arange(num_samples) / self.sample_rate
 
         # Generate the tone from the frequency
-        tone = np.exp(2j * np.pi * int(center_freq) * t) * np.exp(2j * np.pi * int(1600e6) * t)
+        # exp(2j*pi*center*t) * exp(2j*pi*1600e6*t) is a single tone at their sum
+        def build() -> np.ndarray:
+            return self._render_tone(int(center_freq) + int(1600e6), num_samples)
+        tone = self._get_waveform('jam', center_freq, num_samples, build)
     
         # Transmit the tone for the specified duration
         print(f"Transmitting a {center_freq/1e6} MHz tone over {bandwidth/1e6} bandwidth")
         time.sleep(2)
-        self.sdr.tx(tone)
+        self._send(tone)
 
     def transmit_single_tone(self, freq: int, duration: int=None) -> None:
         """
@@ -102,26 +290,26 @@ class Transmit:
         """
 
         # Configure the transmitter parameters
-        self.sdr.tx_lo = int(freq)
-        self.sdr.tx_cyclic_buffer = True
-        self.sdr.tx_rf_bandwidth = int(20e6)  # Set the transmit bandwidth to 20 MHz
-        self.sdr.tx_sample_rate = int(self.sample_rate)
-        self.sdr.tx_hardwaregain_chan0 = -10 # Increase to increase tx power, valid range is -90 to 0 dB
+        self.config.apply({
+            'tx_lo': int(freq),
+            'tx_cyclic_buffer': True,
+            'tx_rf_bandwidth': int(20e6),  # Set the transmit bandwidth to 20 MHz
+            'sample_rate': int(self.sample_rate),
+            'tx_hardwaregain_chan0': -10,  # Increase to increase tx power, valid range is -90 to 0 dB
+        })
 
-        # Generate the tone        
-        num_samples = int(self.sample_rate * 1)  # Generate 1 second worth of samples
-        t = np.arange(num_samples) / self.sample_rate
-        tone = np.exp(2j * np.pi * freq * t)
+        # Generate the tone, one whole period is enough for a cyclic buffer
+        tone = self._cyclic_tone(freq)
 
         # Transmit the tone indefinitely if duration is None
         if duration is None:
             print(f"Transmitting a {freq/1e6} MHz tone indefinitely")
             #while True:
-            self.sdr.tx(tone)
+            self._send(tone)
         else:
             # Transmit the tone for the specified duration
             print(f"Transmitting a {freq/1e6} MHz tone for {duration} seconds")
-            self.sdr.tx(tone)
+            self._send(tone)
             time.sleep(duration)
 
     def transmit_sinc_tone(self, carrier_freq: int, duration=None) -> None:
@@ -131,6 +319,7 @@ class Transmit:
         self.sdr.tx_cyclic_buffer = True
         self.sdr.tx_hardwaregain_chan0 = int(-10)
         self.sdr.tx_buffer_size = int(2**18)
+        self.config.invalidate()  # Written directly, the shadow no longer matches
 
         def sinc(carrier_freq):
             N = 2**16
@@ -142,16 +331,20 @@ class Transmit:
 
             #(0.5 * np.pi * t * carrier_freq)
 
-            c1 = np.cos(2 * np.pi * t ) * 2**14
-            s1 = 1j * np.sin(2 * np.pi * t * carrier_freq) * 2**14
+            c1 = np.cos(2 * np.pi * t )
+            s1 = 1j * np.sin(2 * np.pi * t * carrier_freq)
 
-            c2 = np.cos(2 * np.pi * t * carrier_freq) * 2**14
-            s2 = 1j * np.sin(-2 * np.pi * t * carrier_freq) * 2**14
+            c2 = np.cos(2 * np.pi * t * carrier_freq)
+            s2 = 1j * np.sin(-2 * np.pi * t * carrier_freq)
 
             #return ((1 / (2j * (2 * np.pi * t * carrier_freq))) * ((c1 + s1) - (c2 - s2)))
-            return (((1 / (2j * (2 * np.pi * t * carrier_freq))) * 2**14) * ((c1 + s1) - (c2 - s2)))
+            signal = (1 / (2j * (2 * np.pi * t * carrier_freq))) * ((c1 + s1) - (c2 - s2))
             #(2 * np.pi * t * carrier_freq)
-        self.sdr.tx(sinc(carrier_freq))
+
+            # Normalize to +-1, the sample format layer applies the 2^14 full scale
+            peak = np.max(np.abs(signal), initial=0)
+            return signal / peak if peak else signal
+        self._send(self._encode(sinc(carrier_freq)))
         
 
         
@@ -241,12 +434,10 @@ class Transmit:
         bandwidth = 20000000 #20e6
 
         # Create transmit waveform
-        # Create axis for transmitted chirp
-        time_axis = np.linspace(0, pulse_duration, num_samps)
         f0 = - bandwidth / 2
         f1 = + bandwidth / 2
         c = 3e8 # Speed of light
-        alpha = bandwidth / pulse_duration
+        chirp_builder = WaveformBuilder(sample_rate, [LinearChirp(f0, f1, num_samps / sample_rate)])
 
         # Configure properties
         self.sdr.sample_rate = 60000000 #60e6
@@ -267,15 +458,14 @@ class Transmit:
         # Configuration data channels
         self.sdr.tx_enabled_channels = [0]
         self.sdr.rx_enabled_channels = [0]
+        self.config.invalidate()  # Written directly, the shadow no longer matches
 
         # Generation of transmitted signal
-        trans_chirp = np.exp(1j * 2 * np.pi * (f0 * time_axis + (alpha * time_axis ** 2) / 2))
-
-        trans_chirp = 2*14 # The PlutoSDR expects samples to be between -2^14 and +2^14, not -1 and +1 like some SDRs
+        trans_chirp = self._build(chirp_builder) # The PlutoSDR expects samples to be between -2^14 and +2^14, not -1 and +1 like some SDRs
         #print("The length of transmitted chirp.",len(trans_chirp))
 
         self.sdr.tx_cyclic_buffer = True # Enable cyclic buffers
-        self.sdr.tx(trans_chirp)
+        self._send(trans_chirp)
 
     #def test_sinc(self):
     #    sample_rate = 10e6  # 1 MSPS
@@ -341,38 +531,55 @@ class Transmit:
     def chirp_linear_sweep_constant_gain(self, gain: int, start_freq: int=1e6, stop_freq: int=1255e6, step_freq:int=0, step_duration: int=0) -> None:
         """
         TX sweeping frequency at single power level using ADALM-Pluto.
-        """
 
-        # Configure the transmitter parameters
-        self.sdr.tx_cyclic_buffer = False
-        self.sdr.tx_rf_bandwidth = int(20e6)  # Set the transmit bandwidth to 20 MHz
-        self.sdr.tx_sample_rate = int(20e6)
-        self.sdr.tx_hardwaregain_chan0 = gain # Increase to increase tx power, valid range is -90 to 0 dB
+        The LO steps across start_freq..stop_freq, step_freq apart (80% of the sample rate by default), and
+        at each step a baseband up/down chirp covers the band around it. Every step dwells step_duration
+        seconds (1 s by default) and the sweep repeats until stop() is called.
+        """
+        step_freq = step_freq or 0.8 * self.sample_rate
+        if step_freq > 0.8 * self.sample_rate:
+            raise ValueError(f"step_freq {step_freq/1e6} MHz does not fit inside the {self.sample_rate/1e6} MHz sample rate")
+        step_duration = step_duration or 1
+
+        # Triangular chirp over +-step_freq/2, frequency continuous when the cyclic buffer wraps
+        half = step_freq / 2
+        period = 1e-3
+        chirp = self._build(WaveformBuilder(self.sample_rate, [LinearChirp(-half, half, period / 2),
+                                                               LinearChirp(half, -half, period / 2)]))
+
+        # The AD9364 LO cannot tune below TX_LO_MIN, the lowest step is moved up to it
+        centers = np.arange(start_freq + half, stop_freq + half, step_freq)
+        centers = np.unique(np.maximum(centers, TX_LO_MIN)).tolist()
+        print(f"Transmitting a chirp sweep from {start_freq/1e6} to {stop_freq/1e6} MHz in {len(centers)} steps")
+
+        # Every step reuses the one chirp buffer, so only the LO is retuned between steps
+        steps = [TxStep(center, gain, step_duration, waveform=chirp, bandwidth=step_freq) for center in centers]
+        self.scheduler.run(steps, repeat=None)
+
+    def replay_recording(self, path: str, gain: int=-10, tx_lo: Optional[float]=None, chunk_size: int=2**16,
+                         loop: bool=False) -> None:
+        """
+        Transmit a capture made with recording.CaptureRecorder, streamed from disk chunk by chunk.
 
-        num_samples = int(self.sample_rate * 1)  # Generate 1 second worth of samples
-        t = np.arange(num_samples) / self.sample_rate
-        self.sdr.tx_lo = int(1227e6)
-        print(f"Transmitting a chirp tone")
-
-        Instantaneous_freq = start_freq
-        chirp = np.exp((2j * np.pi * t) / (self.sample_rate / Instantaneous_freq))
-        while True:
-            chirp = 0
-            Instantaneous_freq = start_freq
-            chirp = np.exp((2j * np.pi * t) / (self.sample_rate / Instantaneous_freq))
-            while Instantaneous_freq < stop_freq:
-                Instantaneous_freq = Instantaneous_freq * 10
-                waveform_at_NextFrequency = np.exp((2j * np.pi * t) / (self.sample_rate / Instantaneous_freq))
-                self.sdr.tx(waveform_at_NextFrequency)
-
-            #for tx_freq in range(int(start_freq), int(stop_freq), int(step_freq)):
-                # Generate the tone from the frequency
-                #tone = np.exp(2j * np.pi * int(tx_freq) * t)
-        
-                # Transmit the tone for the specified duration
-                
-                #self.sdr.tx_destroy_buffer()
-                #time.sleep(1)
-                #self.sdr.tx(tone)
-                #time.sleep(step_duration)
-            
\ No newline at end of file
+        The recording's sample rate and LO are used unless tx_lo is given. Samples are scaled from
+        the capture's full scale to +-1 on the stream worker, so only a few chunks are ever in memory.
+        """
+        recording = CaptureReader(path)
+        self.config.apply({
+            'tx_cyclic_buffer': False,
+            'tx_lo': int(recording.center_freq if tx_lo is None else tx_lo),
+            'tx_rf_bandwidth': int(recording.metadata.get('pluto:bandwidth') or recording.sample_rate),
+            'sample_rate': int(recording.sample_rate),
+            'tx_hardwaregain_chan0': gain,
+        })
+
+        scale = np.float32(1 / recording.full_scale)
+        print(f"Replaying {len(recording) / recording.sample_rate:.2f} s from {recording.base_path}")
+
+        def chunks() -> Iterator[np.ndarray]:
+            while True:
+                for chunk in recording.chunks(chunk_size):
+                    yield chunk * scale
+                if not loop or not len(recording):
+                    return
+        self.stream_chunks(chunks(), chunk_size)
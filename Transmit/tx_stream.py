@@ -0,0 +1,113 @@
+"""
+Double-buffered streaming transmit for long non-cyclic waveforms.
+
+A non-cyclic sdr.tx() blocks while the device takes the buffer. Synthesizing
+the next buffer only after that returns leaves a gap on air, and building a
+whole second of samples up front costs a lot of memory. TxStream pulls sample
+chunks from a generator on a worker thread and encodes each into one of a few
+preallocated device-format buffers while the previous chunk is being pushed.
+Buffers go back to the pool once sent, so memory stays at num_buffers chunks
+however long the stream runs.
+
+An underrun is counted whenever the sender has to wait for the worker, which
+means a gap went out on air.
+
+    stream = TxStream(transmit, chunk_size=2**16)
+    stats = stream.run(chunk_generator, stop_event)
+"""
+
+import queue
+import threading
+import time
+from typing import Iterable, Optional
+import numpy as np
+
+from Transmit.sample_format import allocate, num_samples_of, sample_slice
+
+_END = object()
+
+class TxStream:
+    def __init__(self, transmit, chunk_size: int=2**16, num_buffers: int=3) -> None:
+        if num_buffers < 2:
+            raise ValueError("TxStream needs at least 2 buffers to overlap synthesis and transmit")
+        self.transmit = transmit
+        self.chunk_size = int(chunk_size)
+        self.pool = [allocate(self.chunk_size, transmit.sample_format) for _ in range(num_buffers)]
+        self.last_stats = {}
+
+    def run(self, chunks: Iterable[np.ndarray], stop_event: Optional[threading.Event]=None) -> dict:
+        '''
+        Transmit complex chunks in +-1 until the generator is exhausted or stop_event is set.
+        Chunks shorter than chunk_size are zero padded since the device buffer length is fixed.
+        '''
+        stop_event = threading.Event() if stop_event is None else stop_event
+        free = queue.Queue()
+        ready = queue.Queue()
+        for buffer in self.pool:
+            free.put(buffer)
+        halt = threading.Event()
+        worker = threading.Thread(target=self._produce, args=(iter(chunks), free, ready, stop_event, halt),
+                                  name="TxStream", daemon=True)
+
+        chunks_sent = 0
+        underruns = 0
+        start = time.monotonic()
+        worker.start()
+        try:
+            while not stop_event.is_set():
+                try:
+                    item = ready.get_nowait()
+                except queue.Empty:
+                    item = ready.get()
+                    # Only a late chunk is starvation, the end of the stream or an error is not
+                    if chunks_sent and item is not _END and not isinstance(item, BaseException):
+                        underruns += 1
+                if item is _END:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                self.transmit._send(item)
+                free.put(item)
+                chunks_sent += 1
+        finally:
+            halt.set()
+            worker.join()
+            if stop_event.is_set():
+                # Stopped from another thread, which must not touch the buffer this thread pushes to
+                self.transmit.sdr.tx_destroy_buffer()
+
+        elapsed = time.monotonic() - start
+        samples_sent = chunks_sent * self.chunk_size
+        self.last_stats = {
+            'chunks_sent': chunks_sent,
+            'samples_sent': samples_sent,
+            'underruns': underruns,
+            'elapsed_s': elapsed,
+            'throughput_sps': samples_sent / elapsed if elapsed else 0.0,
+        }
+        return self.last_stats
+
+    # Private #
+    def _produce(self, chunks, free: queue.Queue, ready: queue.Queue, stop_event: threading.Event,
+                 halt: threading.Event) -> None:
+        try:
+            for samples in chunks:
+                buffer = None
+                while buffer is None:
+                    if halt.is_set() or stop_event.is_set():
+                        return
+                    try:
+                        buffer = free.get(timeout=0.1)
+                    except queue.Empty:
+                        pass
+                length = len(samples)
+                if length > self.chunk_size:
+                    raise ValueError(f"Chunk of {length} samples does not fit chunk_size {self.chunk_size}")
+                self.transmit._encode(samples, sample_slice(buffer, 0, length))
+                sample_slice(buffer, length, num_samples_of(buffer))[:] = 0
+                ready.put(buffer)
+        except BaseException as error:
+            ready.put(error)
+            return
+        finally:
+            ready.put(_END)
@@ -0,0 +1,267 @@
+"""
+Phase-accumulator waveform builder.
+
+Waveforms used to be computed as exp(2j*pi*f*t) from an absolute time vector,
+or from t**2 for chirps. Both lose precision as t grows, every frequency change
+restarted the phase, and each one needed several full-length float arrays.
+
+WaveformBuilder composes segments (Tone, LinearChirp, LogChirp, Pulse,
+Silence) into one output. The phase is carried from sample to sample in cycles
+and wrapped to [0, 1) at each chunk boundary, so the waveform stays phase
+continuous across segments. Inside a chunk the phase is computed from the
+offset relative to the chunk start, which is never larger than chunk_size, so
+precision does not degrade however long the waveform is. Work is done one chunk
+at a time in a few chunk-sized scratch arrays, writing cos and sin straight
+into the output.
+
+    builder = WaveformBuilder(20e6, [LinearChirp(-5e6, 5e6, 1e-3), Silence(1e-3)])
+    samples = builder.build()                 # one preallocated complex buffer
+    for chunk in builder.chunks(2**16):       # or stream it without a full-length buffer
+        ...
+
+Frequencies are in Hz relative to the LO and may be negative. A builder
+keeps scratch arrays of its own, so one builder must not be used from several
+threads at once. Pass a SynthesisPool to build() to render in parallel.
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional
+import numpy as np
+
+# Samples rendered per pass, keeps the scratch arrays inside the cache
+CHUNK_SIZE = 2**15
+
+def _num_samples(duration: float, sample_rate: float) -> int:
+    return int(round(duration * sample_rate))
+
+@dataclass
+class Tone:
+    freq: float
+    duration: float
+    amplitude: float = 1.0
+
+    def num_samples(self, sample_rate: float) -> int:
+        return _num_samples(self.duration, sample_rate)
+
+    def phase_offsets(self, k0: int, j: np.ndarray, sample_rate: float, out: np.ndarray) -> None:
+        np.multiply(j, self.freq / sample_rate, out=out)
+
+    def shape(self, k0: int, out: np.ndarray, sample_rate: float) -> None:
+        if self.amplitude != 1.0:
+            out *= self.amplitude
+
+@dataclass
+class LinearChirp:
+    f0: float
+    f1: float
+    duration: float
+    amplitude: float = 1.0
+
+    def num_samples(self, sample_rate: float) -> int:
+        return _num_samples(self.duration, sample_rate)
+
+    def phase_offsets(self, k0: int, j: np.ndarray, sample_rate: float, out: np.ndarray) -> None:
+        # f[k] = f0 + slope*k, phase after j samples from k0 is f[k0]*j + slope*j*(j-1)/2
+        slope = (self.f1 - self.f0) / max(self.num_samples(sample_rate), 1)
+        np.subtract(j, 1, out=out)
+        out *= slope / 2
+        out += self.f0 + slope * k0
+        out *= j
+        out /= sample_rate
+
+    def shape(self, k0: int, out: np.ndarray, sample_rate: float) -> None:
+        if self.amplitude != 1.0:
+            out *= self.amplitude
+
+@dataclass
+class LogChirp:
+    f0: float
+    f1: float
+    duration: float
+    amplitude: float = 1.0
+
+    def __post_init__(self) -> None:
+        if self.f0 == 0 or self.f1 == 0 or (self.f0 < 0) != (self.f1 < 0):
+            raise ValueError("LogChirp needs f0 and f1 non-zero with the same sign")
+
+    def num_samples(self, sample_rate: float) -> int:
+        return _num_samples(self.duration, sample_rate)
+
+    def phase_offsets(self, k0: int, j: np.ndarray, sample_rate: float, out: np.ndarray) -> None:
+        # f[k] = f0*g**k, phase after j samples from k0 is f[k0]*(g**j - 1)/(g - 1)
+        log_ratio = math.log(self.f1 / self.f0) / max(self.num_samples(sample_rate), 1)
+        f_k0 = self.f0 * math.exp(log_ratio * k0)
+        if log_ratio == 0:
+            np.multiply(j, f_k0 / sample_rate, out=out)
+            return
+        np.multiply(j, log_ratio, out=out)
+        np.expm1(out, out=out)
+        out *= f_k0 / (math.expm1(log_ratio) * sample_rate)
+
+    def shape(self, k0: int, out: np.ndarray, sample_rate: float) -> None:
+        if self.amplitude != 1.0:
+            out *= self.amplitude
+
+@dataclass
+class Pulse:
+    '''
+    `count` pulses of a carrier at freq, on for `width` out of every `period` seconds.
+    The carrier phase keeps running through the off time, so the pulses are coherent.
+    '''
+    freq: float
+    width: float
+    period: float
+    count: int = 1
+    amplitude: float = 1.0
+
+    def num_samples(self, sample_rate: float) -> int:
+        return self.count * _num_samples(self.period, sample_rate)
+
+    def phase_offsets(self, k0: int, j: np.ndarray, sample_rate: float, out: np.ndarray) -> None:
+        np.multiply(j, self.freq / sample_rate, out=out)
+
+    def shape(self, k0: int, out: np.ndarray, sample_rate: float) -> None:
+        if self.amplitude != 1.0:
+            out *= self.amplitude
+        period = _num_samples(self.period, sample_rate)
+        width = _num_samples(self.width, sample_rate)
+        # Zero the off part of every period the chunk overlaps
+        start = k0 - k0 % period
+        while start < k0 + len(out):
+            out[max(start + width - k0, 0):max(start + period - k0, 0)] = 0
+            start += period
+
+@dataclass
+class Silence:
+    duration: float
+
+    def num_samples(self, sample_rate: float) -> int:
+        return _num_samples(self.duration, sample_rate)
+
+    def phase_offsets(self, k0: int, j: np.ndarray, sample_rate: float, out: np.ndarray) -> None:
+        out[:] = 0
+
+    def shape(self, k0: int, out: np.ndarray, sample_rate: float) -> None:
+        out[:] = 0
+
+class WaveformBuilder:
+    def __init__(self, sample_rate: float, segments: Iterable=(), chunk_size: int=CHUNK_SIZE) -> None:
+        self.sample_rate = float(sample_rate)
+        self.segments: List = list(segments)
+        self.chunk_size = int(chunk_size)
+        self._offsets = np.arange(self.chunk_size, dtype=np.float64)
+        self._phase = np.empty(self.chunk_size, dtype=np.float64)
+
+    def add(self, segment) -> "WaveformBuilder":
+        self.segments.append(segment)
+        return self
+
+    @property
+    def num_samples(self) -> int:
+        return sum(segment.num_samples(self.sample_rate) for segment in self.segments)
+
+    def build(self, out: Optional[np.ndarray]=None, dtype=np.complex128, pool=None) -> np.ndarray:
+        '''
+        Render every segment into `out`, allocated here if not given. With a SynthesisPool the
+        pieces of plan() render in parallel, bit-for-bit identical to rendering them in order.
+        A builder is not thread-safe: without a pool, build() and chunks() share its scratch arrays.
+        '''
+        if out is None:
+            out = np.empty(self.num_samples, dtype=dtype)
+        elif len(out) != self.num_samples:
+            raise ValueError(f"Output holds {len(out)} samples, waveform has {self.num_samples}")
+        pieces = self.plan()
+        if pool is None:
+            for piece in pieces:
+                self.render(piece, out[piece[4]:piece[4] + piece[2]], self._phase)
+        else:
+            def work(piece: tuple) -> None:
+                self.render(piece, out[piece[4]:piece[4] + piece[2]], pool.scratch('phase', piece[2], np.float64))
+            pool.map(work, pieces)
+        return out
+
+    def plan(self) -> List[tuple]:
+        '''
+        Split the waveform into pieces of at most chunk_size samples within one segment, each
+        (segment_index, k0, count, phase0, start) with its starting phase worked out in order.
+        '''
+        pieces = []
+        phase = 0.0
+        start = 0
+        for index, segment in enumerate(self.segments):
+            length = segment.num_samples(self.sample_rate)
+            for k0 in range(0, length, self.chunk_size):
+                count = min(self.chunk_size, length - k0)
+                pieces.append((index, k0, count, phase, start))
+                phase = (phase + self._advance(segment, k0, count)) % 1.0
+                start += count
+        return pieces
+
+    def render(self, piece: tuple, out: np.ndarray, phase: np.ndarray) -> None:
+        '''
+        Render one piece of plan() into `out`, using `phase` (at least count float64s) as scratch.
+        '''
+        index, k0, count, phase0, _ = piece
+        self._render(self.segments[index], k0, phase0, out[:count], phase)
+
+    def chunks(self, chunk_size: int=CHUNK_SIZE, repeat: Optional[int]=1, dtype=np.complex128) -> Iterator[np.ndarray]:
+        '''
+        Yield the waveform as views of one reused chunk_size buffer, valid until the next
+        chunk. The phase runs on across repeats, repeat=None loops forever. The final chunk
+        is shorter when the total length is not a multiple of chunk_size.
+        '''
+        if self.num_samples == 0:
+            return
+        buffer = np.empty(chunk_size, dtype=dtype)
+        state = [0, 0, 0.0]
+        passes = 0
+        while True:
+            filled = 0
+            while filled < chunk_size:
+                filled += self._fill(buffer[filled:], state)
+                if state[0] < len(self.segments):
+                    break
+                # End of the segment list, start the next pass with the phase carried over
+                passes += 1
+                if repeat is not None and passes >= repeat:
+                    break
+                state[0] = 0
+            if filled:
+                yield buffer[:filled]
+            if filled < chunk_size:
+                return
+
+    # Private #
+    def _fill(self, out: np.ndarray, state: list) -> int:
+        # state is [segment index, sample within segment, phase in cycles], advanced in place
+        written = 0
+        while written < len(out) and state[0] < len(self.segments):
+            segment = self.segments[state[0]]
+            length = segment.num_samples(self.sample_rate)
+            count = min(length - state[1], len(out) - written, self.chunk_size)
+            if count > 0:
+                self._render(segment, state[1], state[2], out[written:written + count], self._phase)
+                state[2] = (state[2] + self._advance(segment, state[1], count)) % 1.0
+                written += count
+                state[1] += count
+            if state[1] >= length:
+                state[0] += 1
+                state[1] = 0
+        return written
+
+    def _advance(self, segment, k0: int, count: int) -> float:
+        # Phase gained over `count` samples, the same arithmetic as one element of _render
+        phase = np.empty(1, dtype=np.float64)
+        segment.phase_offsets(k0, np.array([count], dtype=np.float64), self.sample_rate, phase)
+        return float(phase[0])
+
+    def _render(self, segment, k0: int, phase0: float, out: np.ndarray, phase: np.ndarray) -> None:
+        count = len(out)
+        phase = phase[:count]
+        segment.phase_offsets(k0, self._offsets[:count], self.sample_rate, phase)
+        phase += phase0
+        phase *= 2 * np.pi
+        np.cos(phase, out=out.real, casting='same_kind')
+        np.sin(phase, out=out.imag, casting='same_kind')
+        segment.shape(k0, out, self.sample_rate)
@@ -0,0 +1,19 @@
+import asyncio
+
+from Transmit.async_control import RadioController
+
+def test_cancel_and_stop_with_every_worker_busy():
+    # Two endless sweeps hold both workers, stopping must not need a third
+    async def main():
+        async with RadioController(max_workers=2) as controller:
+            radios = [await controller.open_radio(uri=f'sim:serial=async-{i}') for i in range(2)]
+            tasks = [asyncio.ensure_future(radio.power_sweep(1575e6, -50, 0, 10, 0.05)) for radio in radios]
+            await asyncio.sleep(0.3)
+
+            tasks[0].cancel()
+            results = await asyncio.wait_for(asyncio.gather(tasks[0], return_exceptions=True), 5)
+            assert isinstance(results[0], asyncio.CancelledError)
+
+            await asyncio.wait_for(controller.stop_all(), 5)
+            await asyncio.wait_for(tasks[1], 5)
+    asyncio.run(main())
@@ -0,0 +1,106 @@
+import numpy as np
+
+from Transmit.burst_detector import BurstDetector
+
+SAMPLE_RATE = 1e6
+
+def _stream(length: int, bursts=(), amplitude: float=1.0) -> np.ndarray:
+    # Low noise with constant-envelope bursts at (start, length)
+    rng = np.random.default_rng(0)
+    samples = 1e-3 * (rng.standard_normal(length) + 1j * rng.standard_normal(length))
+    for start, size in bursts:
+        samples[start:start + size] += amplitude * np.exp(2j * np.pi * 0.01 * np.arange(size))
+    return samples.astype(np.complex64)
+
+def _detector(**kwargs) -> BurstDetector:
+    options = dict(threshold_dbfs=-20, window=16, pre_trigger=256, post_trigger=1024)
+    options.update(kwargs)
+    return BurstDetector(SAMPLE_RATE, **options)
+
+def _run(detector: BurstDetector, samples: np.ndarray, lengths) -> list:
+    events, position = [], 0
+    for length in lengths:
+        events += detector.process(samples[position:position + length], timestamp=position / SAMPLE_RATE)
+        position += length
+    assert position == len(samples)
+    return events
+
+def test_event_records_stream_around_trigger():
+    samples = _stream(10000, bursts=[(3000, 500)])
+    events = _run(_detector(), samples, [len(samples)])
+
+    assert len(events) == 1
+    event = events[0]
+    assert 3000 <= event.sample_index < 3016
+    assert event.pre_trigger == 256
+    assert len(event.samples) == 256 + 1024
+    assert np.array_equal(event.samples, samples[event.sample_index - 256:event.sample_index + 1024])
+    assert event.timestamp == event.sample_index / SAMPLE_RATE
+
+def test_pre_and_post_trigger_carry_across_buffers():
+    samples = _stream(10000, bursts=[(3000, 500), (7000, 200)])
+    whole = _run(_detector(), samples, [len(samples)])
+
+    # The trigger lands 10 samples into a buffer, so most of the pre-trigger comes from
+    # the history and the post-trigger spans several short buffers
+    split = _run(_detector(), samples, [2990, 100, 0, 7, 300, 1, 1600, 5002])
+    assert [event.sample_index for event in split] == [event.sample_index for event in whole]
+    for a, b in zip(split, whole):
+        assert a.pre_trigger == b.pre_trigger
+        assert np.array_equal(a.samples, b.samples)
+
+def test_pre_trigger_truncated_at_stream_start():
+    samples = _stream(3000, bursts=[(100, 300)])
+    events = _run(_detector(), samples, [50, 2950])
+    assert len(events) == 1
+    assert events[0].pre_trigger == events[0].sample_index
+    assert np.array_equal(events[0].samples, samples[:events[0].sample_index + 1024])
+
+def test_event_left_open_until_post_trigger_filled():
+    detector = _detector()
+    samples = _stream(4000, bursts=[(1000, 200)])
+    assert detector.process(samples[:1500]) == []
+    assert detector.process(samples[1500:1800]) == []
+    assert len(detector.process(samples[1800:])) == 1
+
+def test_holdoff_suppresses_retrigger():
+    bursts = [(1000, 2000), (3100, 100)]
+    samples = _stream(8000, bursts=bursts)
+
+    # A long burst retriggers once the post-trigger record is full
+    retrigger = _run(_detector(), samples, [len(samples)])
+    assert len(retrigger) == 3
+
+    held = _run(_detector(holdoff=4000), samples, [len(samples)])
+    assert len(held) == 1
+    assert held[0].sample_index == retrigger[0].sample_index
+
+def test_noise_floor_ignores_bursts():
+    detector = _detector(threshold_dbfs=None, snr_db=20)
+    quiet = _stream(4096)
+    assert detector.process(quiet) == []
+    floor = detector.noise_floor
+    assert floor is not None
+
+    loud = _stream(4096, bursts=[(0, 4096)])
+    detector.process(loud)
+    assert detector.noise_floor == floor
+
+def test_no_trigger_before_noise_floor():
+    detector = _detector(threshold_dbfs=None)
+    assert detector.threshold() is None
+    assert detector.process(_stream(2000, bursts=[(500, 500)])) == []
+    assert detector.threshold() is not None
+
+def test_empty_buffers():
+    detector = _detector()
+    assert detector.process(np.zeros(0, dtype=np.complex64)) == []
+    assert detector.samples_seen == 0
+
+def test_reset_drops_event_and_history():
+    detector = _detector()
+    samples = _stream(4000, bursts=[(1000, 50)])
+    detector.process(samples[:1100])
+    detector.reset()
+    assert detector.process(samples[1100:]) == []
+    assert detector.events_detected == 0
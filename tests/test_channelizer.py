@@ -0,0 +1,28 @@
+import numpy as np
+
+from Transmit.channelizer import PolyphaseChannelizer
+
+def _stream(length: int) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return (rng.standard_normal(length) + 1j * rng.standard_normal(length)).astype(np.complex64)
+
+def test_split_buffers_match_one_shot():
+    samples = _stream(4000)
+    whole = PolyphaseChannelizer(64, 1e6).process(samples)
+
+    channelizer = PolyphaseChannelizer(64, 1e6)
+    pieces, position = [], 0
+    for length in (100, 10, 5, 63, 1, 700, 0, 3121):
+        pieces.append(channelizer.process(samples[position:position + length]))
+        position += length
+    assert position == len(samples)
+    assert np.allclose(np.concatenate(pieces, axis=1), whole)
+
+def test_odd_channel_count():
+    samples = _stream(1000)
+    whole = PolyphaseChannelizer(7, 1e6).process(samples)
+
+    channelizer = PolyphaseChannelizer(7, 1e6)
+    split = np.concatenate([channelizer.process(samples[i:i + 3]) for i in range(0, len(samples), 3)], axis=1)
+    assert split.shape == whole.shape
+    assert np.allclose(split, whole)
@@ -0,0 +1,95 @@
+import gc
+
+import pytest
+
+from Transmit.device_state import APPLY_ORDER, DeviceConfig
+from Transmit.sim_pluto import SimulatedPluto
+
+class RecordingPluto(SimulatedPluto):
+    # Remembers the order attributes were written in
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._order = []
+
+    def __setattr__(self, name, value) -> None:
+        if not name.startswith('_'):
+            self._order.append(name)
+        super().__setattr__(name, value)
+
+def _profile(**overrides) -> dict:
+    settings = {
+        'tx_cyclic_buffer': True,
+        'tx_hardwaregain_chan0': -20,
+        'tx_lo': int(915e6),
+        'rx_lo': int(915e6),
+        'tx_rf_bandwidth': int(5e6),
+        'sample_rate': int(4e6),
+    }
+    settings.update(overrides)
+    return settings
+
+def test_writes_follow_apply_order():
+    sdr = RecordingPluto(realtime=False)
+    result = DeviceConfig(sdr).apply(_profile())
+    assert sdr._order == result['written']
+    assert sdr._order == sorted(sdr._order, key=APPLY_ORDER.index)
+    assert sdr._order[0] == 'sample_rate'
+    assert sdr._order[-1] == 'tx_cyclic_buffer'
+
+def test_unchanged_attributes_skipped():
+    sdr = RecordingPluto(realtime=False)
+    config = DeviceConfig(sdr)
+    config.apply(_profile())
+    writes = sdr.stats()['attribute_writes']
+
+    result = config.apply(_profile(tx_lo=int(433e6)))
+    assert result['written'] == ['tx_lo']
+    assert sorted(result['skipped']) == sorted(name for name in _profile() if name != 'tx_lo')
+    assert sdr.stats()['attribute_writes'] == writes + 1
+    assert config.set('tx_lo', int(433e6)) is False
+
+def test_gain_reduction_before_lo_move():
+    sdr = RecordingPluto(realtime=False)
+    config = DeviceConfig(sdr)
+    config.apply(_profile())
+
+    sdr._order.clear()
+    config.apply(_profile(tx_lo=int(2.4e9), tx_hardwaregain_chan0=-60))
+    assert sdr._order == ['tx_hardwaregain_chan0', 'tx_lo']
+
+    # An increase waits until the LO has moved
+    sdr._order.clear()
+    config.apply(_profile(tx_lo=int(915e6), tx_hardwaregain_chan0=-10))
+    assert sdr._order == ['tx_lo', 'tx_hardwaregain_chan0']
+
+def test_unknown_attributes_written_last():
+    sdr = RecordingPluto(realtime=False)
+    DeviceConfig(sdr).apply({'rx_buffer_size': 4096, 'zz_custom': 1, 'tx_lo': int(1e9)})
+    assert sdr._order == ['tx_lo', 'rx_buffer_size', 'zz_custom']
+
+def test_invalidate_rewrites():
+    sdr = RecordingPluto(realtime=False)
+    config = DeviceConfig(sdr)
+    config.apply(_profile())
+
+    config.invalidate('rx_lo')
+    assert config.apply(_profile())['written'] == ['rx_lo']
+    config.invalidate()
+    assert sorted(config.apply(_profile())['written']) == sorted(_profile())
+
+def test_named_profile_with_overrides():
+    sdr = RecordingPluto(realtime=False)
+    result = DeviceConfig(sdr).apply('adsb', tx_hardwaregain_chan0=-30)
+    assert set(result['written']) == {'sample_rate', 'tx_rf_bandwidth', 'tx_lo', 'tx_hardwaregain_chan0'}
+    assert sdr.tx_lo == int(1090e6)
+    assert sdr.sample_rate == int(10e6)
+
+def test_for_device_shared_and_weak():
+    sdr = RecordingPluto(realtime=False)
+    config = DeviceConfig.for_device(sdr)
+    assert DeviceConfig.for_device(sdr) is config
+
+    del sdr
+    gc.collect()
+    with pytest.raises(ReferenceError):
+        config.sdr
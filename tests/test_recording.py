@@ -0,0 +1,93 @@
+import json
+
+import numpy as np
+import pytest
+
+from Transmit.recording import DATA_SUFFIX, META_SUFFIX, CaptureReader, CaptureRecorder
+from Transmit.sim_pluto import SimulatedPluto
+from Transmit.tx_single_tone import Transmit, WaveformCache
+
+def _samples(length: int) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return (1000 * (rng.standard_normal(length) + 1j * rng.standard_normal(length))).astype(np.complex64)
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'capture')
+    samples = _samples(3000)
+    with CaptureRecorder(path, 10000, 2e6, 915e6, bandwidth=1e6, gain=30, description='test') as recorder:
+        for start in range(0, 3000, 1000):
+            assert recorder.write(samples[start:start + 1000], timestamp=1e9) == 1000
+
+    reader = CaptureReader(path + META_SUFFIX)
+    assert len(reader) == 3000
+    assert np.array_equal(reader.read(0, 3000), samples)
+    assert np.array_equal(np.concatenate(list(reader.chunks(700))), samples)
+    assert (reader.sample_rate, reader.center_freq, reader.full_scale) == (2e6, 915e6, 2**11)
+    assert reader.metadata['core:datatype'] == 'cf32_le'
+    assert reader.metadata['pluto:gain'] == 30
+    assert reader.metadata['pluto:start_time'] == '2001-09-09T01:46:40Z'
+    assert len(reader.captures) == 1
+    # Unwritten preallocation is trimmed
+    assert (tmp_path / ('capture' + DATA_SUFFIX)).stat().st_size == 3000 * 8
+
+def test_gaps_start_segments(tmp_path):
+    path = str(tmp_path / 'capture')
+    recorder = CaptureRecorder(path, 10000, 1e6, 100e6)
+    recorder.write(_samples(100))
+    recorder.write(_samples(100))
+    recorder.write(_samples(50), gap=True)
+    recorder.close()
+
+    with open(path + META_SUFFIX) as f:
+        captures = json.load(f)['captures']
+    assert [capture['core:sample_start'] for capture in captures] == [0, 200]
+
+def test_stops_when_full(tmp_path):
+    recorder = CaptureRecorder(str(tmp_path / 'capture'), 150, 1e6, 100e6)
+    assert recorder.write(_samples(100)) == 100
+    assert recorder.write(_samples(100)) == 50
+    assert recorder.full
+    assert recorder.write(_samples(100)) == 0
+    recorder.close()
+    assert len(CaptureReader(str(tmp_path / 'capture'))) == 150
+
+def test_empty_capture(tmp_path):
+    path = str(tmp_path / 'capture')
+    CaptureRecorder(path, 1000, 1e6, 100e6).close()
+    reader = CaptureReader(path)
+    assert len(reader) == 0
+    assert list(reader.chunks(100)) == []
+    assert reader.metadata['pluto:start_time'] is None
+
+def test_complex128_and_bad_dtype(tmp_path):
+    path = str(tmp_path / 'capture')
+    samples = _samples(10).astype(np.complex128)
+    with CaptureRecorder(path + DATA_SUFFIX, 10, 1e6, 100e6, dtype=np.complex128) as recorder:
+        recorder.write(samples)
+    reader = CaptureReader(path)
+    assert reader.samples.dtype == np.complex128
+    assert np.array_equal(reader.read(0, 10), samples)
+
+    with pytest.raises(ValueError):
+        CaptureRecorder(str(tmp_path / 'other'), 10, 1e6, 100e6, dtype=np.int16)
+
+def test_write_after_close(tmp_path):
+    recorder = CaptureRecorder(str(tmp_path / 'capture'), 10, 1e6, 100e6)
+    recorder.close()
+    recorder.close()
+    with pytest.raises(ValueError):
+        recorder.write(_samples(1))
+
+@pytest.mark.parametrize('length', [0, 5000])
+def test_replay(tmp_path, length):
+    path = str(tmp_path / 'capture')
+    with CaptureRecorder(path, 5000, 2e6, 433e6, bandwidth=1e6) as recorder:
+        recorder.write(_samples(length))
+
+    sdr = SimulatedPluto(realtime=False)
+    transmit = Transmit(sdr, sample_rate=int(1e6), waveform_cache=WaveformCache())
+    transmit.replay_recording(path, gain=-20, chunk_size=1024, loop=not length)
+    assert sdr.tx_lo == int(433e6)
+    assert sdr.sample_rate == int(2e6)
+    assert sdr.tx_rf_bandwidth == int(1e6)
+    assert sdr.stats()['tx_calls'] == -(-length // 1024)
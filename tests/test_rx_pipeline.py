@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from Transmit.rx_pipeline import (CICDecimator, DCRemover, FirDecimator, FrequencyShift, HalfBandDecimator,
+                                  RxPipeline)
+
+SAMPLE_RATE = 1e6
+PARTITION = [1000, 37, 0, 5, 2958, 6000, 10000]
+
+STAGES = {
+    'shift': lambda: FrequencyShift(1e5, SAMPLE_RATE),
+    'dc': lambda: DCRemover(),
+    'cic': lambda: CICDecimator(8),
+    'half_band': lambda: HalfBandDecimator(),
+    'fir': lambda: FirDecimator(3),
+    'pipeline': lambda: RxPipeline([FrequencyShift(1e5, SAMPLE_RATE), DCRemover(), CICDecimator(8),
+                                    HalfBandDecimator(), FirDecimator(3)]),
+}
+
+def _stream(length: int) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return (rng.standard_normal(length) + 1j * rng.standard_normal(length) + 0.3).astype(np.complex64)
+
+def _run(stage, samples: np.ndarray, partition) -> np.ndarray:
+    outputs, position = [], 0
+    for length in partition:
+        # Outputs are views of the stage workspace, copy before the next call
+        outputs.append(stage.process(samples[position:position + length]).copy())
+        position += length
+    return np.concatenate(outputs)
+
+@pytest.mark.parametrize('name', list(STAGES))
+def test_output_does_not_depend_on_buffer_split(name):
+    samples = _stream(sum(PARTITION))
+    whole = STAGES[name]().process(samples).copy()
+    split = _run(STAGES[name](), samples, PARTITION)
+    assert split.shape == whole.shape
+    # The NCO wraps its phase at each buffer, which may move the last float32 bit
+    np.testing.assert_allclose(split, whole, rtol=0, atol=1e-6)
+
+@pytest.mark.parametrize('name', list(STAGES))
+def test_tiny_buffers(name):
+    samples = _stream(2000)
+    whole = STAGES[name]().process(samples).copy()
+    split = _run(STAGES[name](), samples, [1, 7, 333, 0] * 5 + [2000 - 5 * 341])
+    np.testing.assert_allclose(split, whole, rtol=0, atol=1e-6)
+
+def test_dc_remover_converges_on_the_offset():
+    remover = DCRemover(alpha=1e-3)
+    samples = _stream(50000)
+    remover.process(samples)
+    assert abs(remover.dc - 0.3) < 0.05
+
+def test_pipeline_rates():
+    pipeline = STAGES['pipeline']()
+    assert pipeline.decimation == 48
+    assert pipeline.output_rate(SAMPLE_RATE) == SAMPLE_RATE / 48
+    assert pipeline.output_center(1e9) == 1e9 + 1e5
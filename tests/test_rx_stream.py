@@ -0,0 +1,100 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from Transmit.rx_stream import RxStream
+
+class Exhausted(Exception):
+    pass
+
+class FakeRx:
+    # Hands out numbered buffers, one per permit released on `gate`, then raises Exhausted
+    def __init__(self, count: int, length: int=100) -> None:
+        self.buffers = [np.full(length, index, dtype=np.complex128) for index in range(count)]
+        self.gate = threading.Semaphore(0)
+        self.calls = 0
+
+    def rx(self) -> np.ndarray:
+        if self.calls == len(self.buffers):
+            raise Exhausted()
+        if not self.gate.acquire(timeout=5):
+            raise TimeoutError("Test did not release the next buffer")
+        self.calls += 1
+        return self.buffers[self.calls - 1]
+
+def _wait(condition, timeout: float=5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Timed out waiting for the reader"
+        time.sleep(0.001)
+
+def _handled(stream: RxStream) -> int:
+    return stream.buffers_received + stream.overruns
+
+def test_overruns_counted_when_ring_full():
+    sdr = FakeRx(5)
+    stream = RxStream(sdr, 100, num_buffers=2)
+    stream.start()
+    for _ in range(5):
+        sdr.gate.release()
+    _wait(lambda: _handled(stream) == 5)
+
+    stats = stream.stats()
+    assert stats['buffers_received'] == 2
+    assert stats['overruns'] == 3
+    assert stats['dropped_samples'] == 300
+    assert stats['queued_buffers'] == 2
+
+    # The consumer still gets the buffers that fit, in order, then the reader's error
+    assert stream.read(timeout=5)[0] == 0
+    assert stream.read(timeout=5)[0] == 1
+    with pytest.raises(Exhausted):
+        stream.read(timeout=5)
+    stream.stop()
+
+def test_lent_view_not_overwritten():
+    sdr = FakeRx(4)
+    stream = RxStream(sdr, 100, num_buffers=2)
+    stream.start()
+    sdr.gate.release()
+    view = stream.read(timeout=5)
+    assert view[0] == 0
+
+    # The lent slot still counts as full, so the reader drops rather than reuse it
+    for _ in range(3):
+        sdr.gate.release()
+    _wait(lambda: _handled(stream) == 4)
+    assert stream.overruns == 2
+    assert np.all(view == 0)
+
+    assert stream.read(timeout=5)[0] == 1
+    stream.stop()
+
+def test_oversized_buffers_truncated():
+    sdr = FakeRx(2, length=150)
+    stream = RxStream(sdr, 100, num_buffers=4)
+    stream.start()
+    sdr.gate.release()
+    sdr.gate.release()
+    assert len(stream.read(timeout=5)) == 100
+    assert len(stream.read(timeout=5)) == 100
+    assert stream.truncated_buffers == 2
+    assert stream.samples_received == 200
+    stream.stop()
+
+def test_read_timeout_and_stop():
+    sdr = FakeRx(1)
+    stream = RxStream(sdr, 100)
+    stream.start()
+    with pytest.raises(TimeoutError):
+        stream.read(timeout=0.05)
+    sdr.gate.release()
+    assert stream.read(timeout=5)[0] == 0
+    stream.stop()
+    assert stream.stats()['buffers_received'] == 1
+
+def test_needs_two_buffers():
+    with pytest.raises(ValueError):
+        RxStream(FakeRx(0), 100, num_buffers=1)
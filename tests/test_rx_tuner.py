@@ -0,0 +1,78 @@
+import pytest
+
+from Transmit.device_state import DeviceConfig
+from Transmit.rx_tuner import RxTuner, apply_rx_tuning, load_rx_tuning, save_rx_tuning
+from Transmit.sim_pluto import SimulatedPluto
+
+def _result(buffer_size: int, kernel_buffers: int, achieved_rate: float, gaps: int=0, p99: float=1e-3) -> dict:
+    buffered = kernel_buffers * buffer_size / 1e6
+    return {
+        'rx_buffer_size': buffer_size,
+        'kernel_buffers': kernel_buffers,
+        'sample_rate': 1e6,
+        'achieved_rate': achieved_rate,
+        'sustained': achieved_rate >= 0.98e6 and gaps == 0,
+        'gaps': gaps,
+        'latency_median_s': p99 / 2,
+        'latency_p99_s': p99,
+        'buffered_s': buffered,
+    }
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / 'cache' / 'rx_tuning.json')
+    assert load_rx_tuning(1e6, path=path) is None
+    save_rx_tuning(1e6, 'throughput', {'rx_buffer_size': 4096, 'kernel_buffers': 4}, path)
+    save_rx_tuning(2e6, 'latency', {'rx_buffer_size': 1024, 'kernel_buffers': 2}, path)
+    assert load_rx_tuning(1e6, path=path)['rx_buffer_size'] == 4096
+    assert load_rx_tuning(2e6, 'latency', path)['kernel_buffers'] == 2
+    assert load_rx_tuning(2e6, 'throughput', path) is None
+
+    with open(path, 'w') as f:
+        f.write('not json')
+    assert load_rx_tuning(1e6, path=path) is None
+
+def test_apply_saved_tuning(tmp_path):
+    path = str(tmp_path / 'rx_tuning.json')
+    sdr = SimulatedPluto(realtime=False)
+    sdr.sample_rate = int(1e6)
+    assert apply_rx_tuning(sdr, path=path) is None
+
+    save_rx_tuning(1e6, 'throughput', {'rx_buffer_size': 4096, 'kernel_buffers': 8}, path)
+    assert apply_rx_tuning(sdr, path=path)['rx_buffer_size'] == 4096
+    assert sdr.rx_buffer_size == 4096
+    assert sdr._rxadc.kernel_buffers_count == 8
+    assert DeviceConfig.for_device(sdr).stats()['shadow']['rx_buffer_size'] == 4096
+
+def test_best_per_objective():
+    tuner = RxTuner(None)
+    tuner.results = [
+        _result(1024, 1, 0.90e6, gaps=5),
+        _result(4096, 2, 0.999e6, p99=2e-3),
+        _result(16384, 4, 1.0e6, p99=1e-3),
+        _result(65536, 4, 0.9998e6),
+    ]
+    # Rates within 0.1% tie, the one with the most headroom wins
+    assert tuner.best('throughput')['rx_buffer_size'] == 65536
+    assert tuner.best('latency')['rx_buffer_size'] == 4096
+    with pytest.raises(ValueError):
+        tuner.best('power')
+
+    tuner.results = [_result(1024, 1, 0.5e6, gaps=3)]
+    assert tuner.best('latency') is None
+    assert tuner.best('throughput')['rx_buffer_size'] == 1024
+
+def test_run_on_simulator(tmp_path):
+    path = str(tmp_path / 'rx_tuning.json')
+    sdr = SimulatedPluto()
+    sdr.sample_rate = int(1e6)
+    sdr.rx_buffer_size = 2048
+    tuner = RxTuner(sdr, buffer_sizes=[1024, 8192], kernel_buffers=[1, 4], duration=0.05, path=path)
+    best = tuner.run(verbose=False)
+
+    assert [(r['rx_buffer_size'], r['kernel_buffers']) for r in tuner.results] == \
+        [(1024, 1), (8192, 1), (1024, 4), (8192, 4)]
+    assert all(r['calls'] > 0 for r in tuner.results)
+    assert load_rx_tuning(1e6, 'throughput', path)['rx_buffer_size'] == best['throughput']['rx_buffer_size']
+    # The device is left as it was found
+    assert sdr.rx_buffer_size == 2048
+    assert 'rx_buffer_size' not in DeviceConfig.for_device(sdr).stats()['shadow']
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from Transmit.sample_format import (FULL_SCALE, ClippingError, decode_iq16, encode, sample_slice,
+                                    tx_iq16)
+
+class FakeAdi:
+    '''
+    The parts of pyadi-iio's rx_tx class tx_iq16 relies on.
+    '''
+    def __init__(self, cyclic: bool=False) -> None:
+        self.tx_cyclic_buffer = cyclic
+        self.tx_enabled_channels = [0]
+        self._txbuf = None
+        self._tx_buffer_size = None
+        self.pushed = []
+        self.tx_calls = []
+
+    def disable_dds(self) -> None:
+        pass
+
+    def _tx_init_channels(self) -> None:
+        self._txbuf = object()
+
+    def _tx_buffer_push(self, data) -> None:
+        self.pushed.append(np.array(data))
+
+    def tx(self, data) -> None:
+        self.tx_calls.append(data)
+
+def test_encode_interleaves_at_full_scale():
+    samples = np.array([1 + 0j, -1j, 0.5 - 0.25j])
+    iq, clipped = encode(samples)
+    assert clipped == 0
+    assert iq.dtype == np.int16
+    assert list(iq) == [FULL_SCALE, 0, 0, -FULL_SCALE, FULL_SCALE // 2, -FULL_SCALE // 4]
+    assert np.allclose(decode_iq16(iq), samples)
+
+def test_encode_counts_and_clips_components():
+    samples = np.array([1.5 + 0j, -2 - 2j, 0.1 + 0.1j])
+    iq, clipped = encode(samples)
+    assert clipped == 3
+    assert iq.max() == FULL_SCALE and iq.min() == -FULL_SCALE
+
+def test_encode_can_raise_on_clipping():
+    with pytest.raises(ClippingError):
+        encode(np.array([0.5, 1.01j]), on_clip='raise')
+
+def test_encode_into_a_slice_and_complex64():
+    out = np.zeros(8, dtype=np.int16)
+    encode(np.array([1j, 1]), sample_slice(out, 1, 3))
+    assert list(out) == [0, 0, 0, FULL_SCALE, FULL_SCALE, 0, 0, 0]
+
+    samples, _ = encode(np.array([0.5 + 0.5j]), sample_format='complex64', full_scale=1000)
+    assert samples.dtype == np.complex64 and samples[0] == 500 + 500j
+
+def test_encode_rejects_bad_full_scale():
+    with pytest.raises(ValueError):
+        encode(np.ones(4), full_scale=2**15)
+
+def test_tx_iq16_pushes_int16_through_the_pyadi_hook():
+    sdr = FakeAdi()
+    iq, _ = encode(np.ones(16, dtype=np.complex128))
+    tx_iq16(sdr, iq)
+    tx_iq16(sdr, iq)
+    assert sdr._tx_buffer_size == 16
+    assert len(sdr.pushed) == 2 and not sdr.tx_calls
+    assert np.array_equal(sdr.pushed[0], iq)
+
+    # A length change is left to sdr.tx(), which rejects it
+    tx_iq16(sdr, iq[:16])
+    assert len(sdr.tx_calls) == 1
+
+def test_tx_iq16_cyclic_upload_once_then_defers_to_tx():
+    sdr = FakeAdi(cyclic=True)
+    iq, _ = encode(np.ones(8, dtype=np.complex128))
+    tx_iq16(sdr, iq)
+    assert len(sdr.pushed) == 1
+    tx_iq16(sdr, iq)
+    assert len(sdr.pushed) == 1 and len(sdr.tx_calls) == 1
@@ -0,0 +1,59 @@
+import threading
+
+import numpy as np
+
+from Transmit.scheduler import TxStep
+from Transmit.sim_pluto import SimulatedPluto
+from Transmit.tx_single_tone import Transmit, WaveformCache
+
+def _transmit(**options) -> Transmit:
+    return Transmit(SimulatedPluto(realtime=False, **options), sample_rate=int(1e6), waveform_cache=WaveformCache())
+
+def test_deadlines_do_not_drift():
+    # Each attribute write takes 5 ms; the setup is absorbed by the dwell instead of adding to it
+    transmit = _transmit(attr_latency=0.005)
+    steps = [TxStep(int(900e6 + 1e6 * n), -30, 0.05) for n in range(6)]
+    timings = transmit.scheduler.run(steps, verbose=False)
+
+    assert [t['step'] for t in timings] == list(range(6))
+    assert np.allclose([t['planned'] for t in timings], 0.05 * np.arange(6))
+    assert all(t['setup'] >= 0.005 for t in timings)
+    # Sleeping after the setup would put step 5 at least 5 setups behind
+    assert all(0 <= t['error'] < 0.05 for t in timings)
+    assert transmit.scheduler.jitter()['steps'] == 6
+
+def test_gain_only_steps_keep_loaded_buffer():
+    transmit = _transmit()
+    steps = [TxStep(int(915e6), gain, 0.01) for gain in (-40, -30, -20)]
+    transmit.scheduler.run(steps, verbose=False)
+    stats = transmit.sdr.stats()
+    assert stats['tx_calls'] == 1
+    assert transmit.sdr.tx_hardwaregain_chan0 == -20
+    assert transmit.sdr.tx_cyclic_buffer is True
+    assert transmit.sdr.sample_rate == int(1e6)
+
+def test_new_waveform_reloads():
+    transmit = _transmit()
+    tone = np.exp(2j * np.pi * 0.01 * np.arange(1024))
+    steps = [TxStep(int(915e6), -30, 0.01), TxStep(int(915e6), -30, 0.01, waveform=lambda: tone, bandwidth=2e6)]
+    transmit.scheduler.run(steps, repeat=2, verbose=False)
+    assert transmit.sdr.stats()['tx_calls'] == 4
+    assert transmit.sdr.tx_rf_bandwidth == int(2e6)
+
+def test_stop_cancels_endless_run():
+    transmit = _transmit()
+    steps = [TxStep(int(915e6), -30, 0.01), TxStep(int(916e6), -30, 0.01)]
+    timer = threading.Timer(0.1, transmit.scheduler.stop)
+    timer.start()
+    try:
+        timings = transmit.scheduler.run(steps, repeat=None, verbose=False)
+    finally:
+        timer.cancel()
+    assert len(timings) >= 2
+    # Off air once cancelled
+    assert transmit.sdr._tx_buffer is None
+
+def test_empty_step_list():
+    transmit = _transmit()
+    assert transmit.scheduler.run([], verbose=False) == []
+    assert transmit.sdr.stats()['tx_calls'] == 0
@@ -0,0 +1,58 @@
+import gc
+
+import pytest
+
+from Transmit.session_pool import SessionPool
+from Transmit.tx_single_tone import Transmit
+
+class Owner:
+    pass
+
+def test_roles_are_shared_per_device():
+    with SessionPool() as pool:
+        tx_owner, rx_owner = Owner(), Owner()
+        tx_sdr = pool.acquire('tx', tx_owner, uri='sim:serial=pool-a')
+        rx_sdr = pool.acquire('rx', rx_owner, uri='sim:serial=pool-a')
+        assert tx_sdr is rx_sdr
+        assert len(pool.sessions()) == 1
+
+def test_second_owner_conflicts_until_release():
+    with SessionPool() as pool:
+        first, second = Owner(), Owner()
+        sdr = pool.acquire('tx', first, uri='sim:serial=pool-b')
+        assert pool.acquire('tx', first, uri='sim:serial=pool-b') is sdr
+        with pytest.raises(RuntimeError):
+            pool.acquire('tx', second, uri='sim:serial=pool-b')
+        pool.release(first)
+        assert pool.acquire('tx', second, uri='sim:serial=pool-b') is sdr
+
+def test_release_can_close_idle_devices():
+    with SessionPool() as pool:
+        owner = Owner()
+        pool.acquire('tx', owner, uri='sim:serial=pool-c')
+        pool.release(owner, close_idle=True)
+        assert pool.sessions() == []
+
+def test_collected_owner_gives_the_role_back():
+    with SessionPool() as pool:
+        owner = Owner()
+        sdr = pool.acquire('tx', owner, uri='sim:serial=pool-d')
+        del owner
+        gc.collect()
+        assert pool.acquire('tx', Owner(), uri='sim:serial=pool-d') is sdr
+
+def test_anonymous_owner_holds_the_role():
+    with SessionPool() as pool:
+        pool.acquire('tx', uri='sim:serial=pool-e')
+        with pytest.raises(RuntimeError):
+            pool.acquire('tx', Owner(), uri='sim:serial=pool-e')
+
+def test_transmit_releases_on_exit_and_on_collection():
+    uri = 'sim:serial=pool-transmit'
+    with Transmit(uri=uri) as transmit:
+        sdr = transmit.sdr
+    transmit = Transmit(uri=uri)
+    assert transmit.sdr is sdr
+    del transmit
+    gc.collect()
+    Transmit(uri=uri).close()
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from Transmit.tone_synth import (TX_BUFFER_MIN, plan_cyclic_tone, render_cyclic_tone, render_tone,
+                                 synthesize_cyclic_tone)
+
+def test_exact_period():
+    # 1 MHz at 10 MS/s repeats every 10 samples; the length is padded to the minimum and to a multiple of 4
+    num_samples, cycles, error = plan_cyclic_tone(1e6, 10e6)
+    assert (num_samples, cycles, error) == (1040, 104, 0.0)
+
+def test_aliases_and_negative_frequencies():
+    assert plan_cyclic_tone(11e6, 10e6) == plan_cyclic_tone(1e6, 10e6)
+    num_samples, cycles, error = plan_cyclic_tone(-1e6, 10e6)
+    assert error == 0.0
+    assert cycles / num_samples == pytest.approx(0.9)
+
+@pytest.mark.parametrize('freq, sample_rate', [(0, 1e6), (123456.789, 10e6), (2.5e6, 30.72e6), (1e3, 3e6)])
+def test_plan_satisfies_constraints(freq, sample_rate):
+    num_samples, cycles, error = plan_cyclic_tone(freq, sample_rate)
+    assert TX_BUFFER_MIN <= num_samples and num_samples % 4 == 0
+    assert error <= 1.0
+    assert abs(cycles / num_samples * sample_rate - freq % sample_rate) == pytest.approx(error, abs=1e-6)
+
+def test_snapped_when_period_too_long():
+    freq, sample_rate = 1234.567, 10e6
+    num_samples, cycles, error = plan_cyclic_tone(freq, sample_rate, max_samples=8192, max_error_hz=1000)
+    assert num_samples <= 8192
+    assert 0 < error <= 1000
+    assert abs(cycles / num_samples * sample_rate - freq) == pytest.approx(error)
+
+def test_bad_constraints():
+    with pytest.raises(ValueError):
+        plan_cyclic_tone(1e6, 10e6, min_samples=4096, max_samples=1024)
+
+def test_cyclic_tone_wraps_without_phase_jump():
+    num_samples, cycles, _ = plan_cyclic_tone(123456.789, 10e6)
+    tone = synthesize_cyclic_tone(num_samples, cycles)
+    step = np.exp(2j * np.pi * cycles / num_samples)
+    assert np.allclose(tone[1:], tone[:-1] * step, atol=1e-9)
+    assert np.allclose(tone[0], tone[-1] * step, atol=1e-9)
+
+def test_rendered_chunks_match_whole():
+    whole = synthesize_cyclic_tone(4000, 37)
+    out = np.empty(4000, dtype=np.complex128)
+    for start in range(0, 4000, 999):
+        render_cyclic_tone(start, 4000, 37, out[start:start + 999])
+    assert np.array_equal(out, whole)
+
+    angle = np.empty(4000, dtype=np.float64)
+    tone = np.empty(4000, dtype=np.complex64)
+    render_tone(0, 0.0123, tone, angle)
+    chunk = np.empty(500, dtype=np.complex64)
+    render_tone(3000, 0.0123, chunk, angle)
+    assert np.array_equal(chunk, tone[3000:3500])
@@ -0,0 +1,93 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from Transmit.sample_format import decode_iq16, encode
+from Transmit.tx_stream import TxStream
+
+class FakeTransmit:
+    '''
+    The parts of Transmit that TxStream uses, keeping a copy of every buffer sent.
+    '''
+    def __init__(self, sample_format: str='int16', send_time: float=0.0) -> None:
+        self.sample_format = sample_format
+        self.full_scale = 2**14
+        self.send_time = send_time
+        self.sent = []
+        self.sent_ids = set()
+        self.sdr = self
+        self.destroyed = False
+
+    def _encode(self, samples: np.ndarray, out: np.ndarray) -> np.ndarray:
+        return encode(samples, out, self.sample_format, self.full_scale)[0]
+
+    def _send(self, buffer: np.ndarray) -> None:
+        time.sleep(self.send_time)
+        self.sent.append(buffer.copy())
+        self.sent_ids.add(id(buffer))
+
+    def tx_destroy_buffer(self) -> None:
+        self.destroyed = True
+
+def _chunks(count: int, length: int, delay: float=0.0):
+    rng = np.random.default_rng(0)
+    for _ in range(count):
+        time.sleep(delay)
+        yield 0.5 * np.exp(2j * np.pi * rng.random(length))
+
+def test_chunks_sent_in_order_and_padded():
+    transmit = FakeTransmit()
+    chunks = [chunk.copy() for chunk in _chunks(5, 256)] + [np.full(100, 0.25 + 0j)]
+    stats = TxStream(transmit, chunk_size=256, num_buffers=2).run(iter(chunks))
+
+    assert stats['chunks_sent'] == 6
+    assert stats['samples_sent'] == 6 * 256
+    sent = [decode_iq16(buffer, transmit.full_scale) for buffer in transmit.sent]
+    for chunk, buffer in zip(chunks, sent):
+        assert np.allclose(buffer[:len(chunk)], chunk, atol=1e-4)
+    assert np.all(sent[-1][100:] == 0)
+    assert not transmit.destroyed
+
+def test_buffers_reused_from_pool():
+    transmit = FakeTransmit(sample_format='complex64')
+    stream = TxStream(transmit, chunk_size=128, num_buffers=3)
+    stream.run(_chunks(20, 128))
+    assert len(transmit.sent) == 20
+    assert transmit.sent_ids <= {id(buffer) for buffer in stream.pool}
+
+def test_no_underruns_when_producer_keeps_up():
+    transmit = FakeTransmit(send_time=0.005)
+    stats = TxStream(transmit, chunk_size=1024).run(_chunks(10, 1024))
+    assert stats['underruns'] == 0
+
+def test_underruns_counted_when_producer_late():
+    transmit = FakeTransmit()
+    stats = TxStream(transmit, chunk_size=1024).run(_chunks(5, 1024, delay=0.02))
+    # The first chunk is not an underrun, nothing was on air yet
+    assert stats['chunks_sent'] == 5
+    assert stats['underruns'] == 4
+
+def test_producer_error_raised():
+    transmit = FakeTransmit()
+    with pytest.raises(ValueError):
+        TxStream(transmit, chunk_size=128).run(iter([np.zeros(128), np.zeros(129)]))
+    assert len(transmit.sent) == 1
+
+def test_stop_event_ends_endless_stream():
+    transmit = FakeTransmit(send_time=0.001)
+    def endless():
+        while True:
+            yield np.zeros(64)
+    stop = threading.Event()
+    timer = threading.Timer(0.05, stop.set)
+    timer.start()
+    stats = TxStream(transmit, chunk_size=64).run(endless(), stop)
+    timer.cancel()
+    assert stats['chunks_sent'] > 0
+    assert transmit.destroyed
+
+def test_needs_two_buffers():
+    with pytest.raises(ValueError):
+        TxStream(FakeTransmit(), num_buffers=1)
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from Transmit.parallel_synth import SynthesisPool
+from Transmit.waveform_builder import LinearChirp, LogChirp, Pulse, Silence, Tone, WaveformBuilder
+
+SAMPLE_RATE = 1e6
+
+def _increments(samples: np.ndarray) -> np.ndarray:
+    # Phase step from each sample to the next, in cycles
+    return np.angle(samples[1:] * np.conj(samples[:-1])) / (2 * np.pi)
+
+def _segments() -> list:
+    return [Tone(100e3, 3e-3), LinearChirp(-200e3, 200e3, 5e-3), Tone(-50e3, 2e-3, amplitude=0.5),
+            LogChirp(10e3, 300e3, 4e-3)]
+
+def test_phase_continuous_across_segments():
+    builder = WaveformBuilder(SAMPLE_RATE, [Tone(100e3, 1e-3), Tone(-250e3, 1e-3), Tone(10e3, 1e-3)])
+    samples = builder.build()
+    expected = np.repeat([0.1, -0.25, 0.01], 1000)[:-1]
+    # The step into a new segment still advances at the old frequency, there is no phase jump
+    assert np.allclose(_increments(samples), expected, atol=1e-9)
+
+def test_split_tone_matches_one_tone():
+    whole = WaveformBuilder(SAMPLE_RATE, [Tone(123.4e3, 10e-3)]).build()
+    split = WaveformBuilder(SAMPLE_RATE, [Tone(123.4e3, 3e-3), Tone(123.4e3, 7e-3)]).build()
+    assert np.allclose(split, whole, atol=1e-9)
+
+def test_long_tone_stays_exact():
+    # The phase is wrapped per chunk, so far from the start a tone still matches exp(2j*pi*f*k/fs)
+    builder = WaveformBuilder(SAMPLE_RATE, [Tone(1e3, 0.5)], chunk_size=1024)
+    samples = builder.build()
+    k = np.arange(len(samples) - 100, len(samples))
+    assert np.allclose(samples[-100:], np.exp(2j * np.pi * (1e3 * k % SAMPLE_RATE) / SAMPLE_RATE), atol=1e-9)
+
+def test_linear_chirp_frequency_ramp():
+    samples = WaveformBuilder(SAMPLE_RATE, [LinearChirp(-100e3, 100e3, 2e-3)]).build()
+    steps = _increments(samples) * SAMPLE_RATE
+    assert np.allclose(np.diff(steps), 200e3 / 2000, atol=1e-3)
+    assert abs(steps[0] + 100e3) < 1e3 and abs(steps[-1] - 100e3) < 1e3
+
+def test_chunks_match_build():
+    builder = WaveformBuilder(SAMPLE_RATE, _segments(), chunk_size=1000)
+    whole = builder.build()
+    for chunk_size in (1, 7, 999, 4096, len(whole) + 5):
+        chunks = np.concatenate([chunk.copy() for chunk in builder.chunks(chunk_size)])
+        assert np.allclose(chunks, whole, atol=1e-9)
+
+def test_chunks_repeat_continues_phase():
+    builder = WaveformBuilder(SAMPLE_RATE, [Tone(30e3, 1.05e-3)])
+    twice = np.concatenate([chunk.copy() for chunk in builder.chunks(512, repeat=2)])
+    assert len(twice) == 2 * builder.num_samples
+    assert np.allclose(_increments(twice), 0.03, atol=1e-9)
+
+def test_pool_matches_serial():
+    builder = WaveformBuilder(SAMPLE_RATE, _segments(), chunk_size=777)
+    serial = builder.build()
+    pool = SynthesisPool(max_workers=4)
+    try:
+        parallel = WaveformBuilder(SAMPLE_RATE, _segments(), chunk_size=777).build(pool=pool)
+    finally:
+        pool.shutdown()
+    assert np.array_equal(parallel, serial)
+
+def test_silence_and_pulse_gate():
+    builder = WaveformBuilder(SAMPLE_RATE, [Pulse(10e3, 100e-6, 250e-6, count=4), Silence(100e-6)])
+    samples = builder.build()
+    assert len(samples) == 1100
+    on = np.abs(samples) > 0.5
+    assert np.array_equal(on[:1000], np.arange(1000) % 250 < 100)
+    assert not on[1000:].any()
+
+def test_build_output_length_checked():
+    builder = WaveformBuilder(SAMPLE_RATE, [Tone(0, 1e-3)])
+    with pytest.raises(ValueError):
+        builder.build(out=np.empty(10, dtype=np.complex128))
@@ -0,0 +1,64 @@
+import numpy as np
+
+from Transmit.tx_single_tone import WaveformCache
+
+def _buffer(num_samples: int) -> np.ndarray:
+    return np.zeros(num_samples, dtype=np.complex128)
+
+def _key(freq: float, num_samples: int=1000) -> tuple:
+    return WaveformCache.make_key('tone', freq, 1e6, num_samples)
+
+def test_lru_eviction_within_budget():
+    cache = WaveformCache(max_bytes=3 * 16000)
+    for freq in (1, 2, 3):
+        cache.put(_key(freq), _buffer(1000))
+    assert cache.get(_key(1)) is not None  # 1 is now the most recently used
+
+    cache.put(_key(4), _buffer(1000))
+    assert cache.get(_key(2)) is None
+    assert all(cache.get(_key(freq)) is not None for freq in (1, 3, 4))
+    stats = cache.stats()
+    assert stats['entries'] == 3
+    assert stats['bytes'] == 3 * 16000 <= stats['max_bytes']
+    assert stats['evictions'] == 1
+
+def test_oversized_buffer_not_cached():
+    cache = WaveformCache(max_bytes=1000)
+    buffer = cache.put(_key(1), _buffer(1000))
+    assert not buffer.flags.writeable
+    assert cache.get(_key(1)) is None
+    assert cache.stats()['bytes'] == 0
+
+def test_replacing_key_keeps_byte_count():
+    cache = WaveformCache(max_bytes=10 * 16000)
+    cache.put(_key(1), _buffer(1000))
+    cache.put(_key(1), _buffer(500))
+    assert cache.stats()['bytes'] == 8000
+    assert len(cache.get(_key(1))) == 500
+
+def test_get_or_create_builds_once():
+    cache = WaveformCache()
+    calls = []
+    def build() -> np.ndarray:
+        calls.append(1)
+        return np.ones(100, dtype=np.complex64)
+
+    first = cache.get_or_create('tone', 1e3, 1e6, 100, build)
+    second = cache.get_or_create('tone', 1e3, 1e6, 100, build)
+    assert second is first
+    assert len(calls) == 1
+    assert first.dtype == np.complex128
+    assert not first.flags.writeable
+
+    # The dtype is part of the key
+    cache.get_or_create('tone', 1e3, 1e6, 100, build, dtype=np.complex64)
+    assert len(calls) == 2
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (1, 2)
+
+def test_clear():
+    cache = WaveformCache()
+    cache.put(_key(1), _buffer(10))
+    cache.clear()
+    assert cache.get(_key(1)) is None
+    assert cache.stats()['bytes'] == 0